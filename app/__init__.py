@@ -2,6 +2,7 @@ from flask import Flask
 from flask_restful import Api
 from flask_cors import CORS
 from app.config.config import Config
+from app.utils.metrics import init_metrics
 
 def create_app(config_class=Config):
     """Create and configure the Flask application."""
@@ -11,6 +12,13 @@ def create_app(config_class=Config):
     # Initialize extensions
     CORS(app)
     api = Api(app)
+    init_metrics(app)
+
+    # Heavy libraries load on first use unless preloading is on (gunicorn
+    # preload_app), in which case the master imports them once for all workers
+    if app.config.get('PRELOAD_MODULES'):
+        from app.utils.startup import preload_modules
+        preload_modules(app)
 
     # Register blueprints/resources
     from app.api.v1 import bp as api_v1
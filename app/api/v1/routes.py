@@ -1,16 +1,23 @@
-from flask import request, current_app, jsonify
+from flask import request, current_app, jsonify, Response, stream_with_context, redirect, send_file
 from flask_restful import Resource
 from app.api.v1 import api
 from app.utils.helpers import rate_limit
+from app.utils.job_queue import job_queue, QueueFullError, JOB_COMPLETED, JOB_FAILED
+from app.services.summarizer import get_pipeline, SummaryError
+from app.services.batch import SummaryBatch, BatchItem, expand_archive, file_extension
+from app.utils.ai_router import AIRouter
+from app.utils.uploads import SpooledUpload
+from app.utils.storage import storage, safe_key
+from app.utils.metrics import current_trace, use_trace
 from datetime import datetime
-from app.utils.file_processor import FileProcessor
-from app.utils.pdf_generator import PDFGenerator
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
+import json
 import logging
 
 class HealthCheck(Resource):
-    @rate_limit
+    @rate_limit(scope='health')
     def get(self):
         """Health check endpoint."""
         environment = current_app.config['FLASK_ENV']
@@ -22,19 +29,30 @@ class HealthCheck(Resource):
         }, 200
 
 class Summarize(Resource):
+    # Shared with the ASGI /summarize endpoint (app/asgi.py)
+    allowed_extensions = {
+        'pdf', 'docx', 'doc', 'xlsx', 'xls', 'csv', 'pptx', 'ppt',
+        'txt', 'md', 'png', 'jpg', 'jpeg'
+    }
+
     def __init__(self):
-        self.file_processor = FileProcessor()
-        self.pdf_generator = PDFGenerator()
-        self.allowed_extensions = {
-            'pdf', 'docx', 'doc', 'xlsx', 'xls', 'pptx', 'ppt',
-            'txt', 'md', 'png', 'jpg', 'jpeg'
-        }
-
-    def allowed_file(self, filename):
+        self.pipeline = get_pipeline()
+
+    @classmethod
+    def allowed_file(cls, filename):
         return '.' in filename and \
-               filename.rsplit('.', 1)[1].lower() in self.allowed_extensions
+               filename.rsplit('.', 1)[1].lower() in cls.allowed_extensions
 
-    @rate_limit
+    @staticmethod
+    def spool(file):
+        """Spool the request file, keeping only small uploads in memory."""
+        return SpooledUpload.from_stream(
+            file.stream,
+            threshold=current_app.config['UPLOAD_SPOOL_THRESHOLD'],
+            spool_dir=current_app.config.get('UPLOAD_SPOOL_DIR') or None
+        )
+
+    @rate_limit(scope='summarize', per_user=True)
     def post(self):
         try:
             if 'file' not in request.files:
@@ -47,55 +65,296 @@ class Summarize(Resource):
             if not self.allowed_file(file.filename):
                 return {'error': f'File type not supported. Allowed types: {", ".join(sorted(self.allowed_extensions))}'}, 400
 
-            summary_depth = float(request.form.get('summary_depth', 2.0))
+            try:
+                summary_depth = float(request.form.get('summary_depth', 2.0))
+            except ValueError:
+                return {'error': 'Summary depth must be a number'}, 400
             user_id = request.form.get('user_id', 'default_user')
+            run_async = request.args.get('async', 'false').lower() in ('true', '1', 't')
             
             if not 0.0 <= summary_depth <= 4.0:
                 return {'error': 'Summary depth must be between 0.0 and 4.0'}, 400
 
-            try:
-                file_content = file.read()
-                file_type = file.filename.rsplit('.', 1)[1].lower()
-                
-                logging.info(f"Processing file: {file.filename}, type: {file_type}, size: {len(file_content)} bytes")
-                
-                result = self.file_processor.process_file(
-                    file_content,
-                    file_type,
-                    summary_depth
-                )
-
-                if not result:
-                    return {'error': 'Failed to process file with Gemini'}, 500
+            upload = self.spool(file)
+            file_type = file.filename.rsplit('.', 1)[1].lower()
 
-                pdf_url = self.pdf_generator.create_pdf(
-                    summary_content=result['summary'],
-                    display_format=result['display_format'],
-                    title=result['title'] 
-                )
+            if run_async:
+                # The job owns the upload from here and closes it when done
+                try:
+                    job_id = job_queue.submit(
+                        run_summary_job,
+                        upload, file_type, summary_depth, user_id, file.filename,
+                        base_url=request.host_url,
+                        meta={'filename': file.filename, 'user_id': user_id}
+                    )
+                except QueueFullError as e:
+                    upload.close()
+                    return {'error': str(e)}, 503
 
-                if not pdf_url:
-                    return {'error': 'Failed to generate or upload PDF'}, 500
+                return {
+                    'status': 'accepted',
+                    'job_id': job_id,
+                    'status_url': f"{request.script_root}/api/v1/jobs/{job_id}",
+                    'result_url': f"{request.script_root}/api/v1/jobs/{job_id}/result"
+                }, 202, {'Location': f"{request.script_root}/api/v1/jobs/{job_id}"}
 
-                response_data = {
-                    'status': 'success',
-                    'pdf_url': pdf_url,
-                    'title': result['title'],
-                    'summary_length': len(result['summary'].split()),
-                    'user_id': user_id
-                }
-                
-                logging.info(f"Successfully processed file for user {user_id}: {result['title']}")
+            try:
+                response_data = self.pipeline.run(
+                    upload,
+                    file_type,
+                    summary_depth,
+                    user_id,
+                    filename=file.filename,
+                    base_url=request.host_url
+                )
                 return response_data, 200
 
-            except Exception as e:
+            except SummaryError as e:
                 logging.error(f"Error processing file: {str(e)}")
-                return {'error': f'Error processing file: {str(e)}'}, 500
+                if e.retry_after:
+                    return {'error': str(e)}, e.status_code, {'Retry-After': str(e.retry_after)}
+                return {'error': str(e)}, e.status_code
+
+            finally:
+                upload.close()
+
+        except RequestEntityTooLarge:
+            return {'error': f"File exceeds the {current_app.config['MAX_UPLOAD_MB']} MB upload limit"}, 413
 
         except Exception as e:
             logging.error(f"Error in summarize endpoint: {str(e)}")
             return {'error': str(e)}, 500
 
+class SummarizeStream(Summarize):
+    """
+    Server-sent events variant of /summarize.
+
+    Emits `stage` events as the pipeline advances, `token` events with the
+    summary text as the provider streams it, then `title`, `sections`,
+    `pdf_url` and a final `done` event carrying the usual JSON payload.
+    Failures after the stream has started arrive as an `error` event.
+    """
+
+    @rate_limit(scope='summarize', per_user=True)
+    def post(self):
+        if 'file' not in request.files:
+            return {'error': 'No file provided'}, 400
+
+        file = request.files['file']
+        if file.filename == '':
+            return {'error': 'No file selected'}, 400
+
+        if not self.allowed_file(file.filename):
+            return {'error': f'File type not supported. Allowed types: {", ".join(sorted(self.allowed_extensions))}'}, 400
+
+        try:
+            summary_depth = float(request.form.get('summary_depth', 2.0))
+        except ValueError:
+            return {'error': 'Summary depth must be a number'}, 400
+        user_id = request.form.get('user_id', 'default_user')
+
+        if not 0.0 <= summary_depth <= 4.0:
+            return {'error': 'Summary depth must be between 0.0 and 4.0'}, 400
+
+        upload = self.spool(file)
+        file_type = file.filename.rsplit('.', 1)[1].lower()
+        filename = file.filename
+        pipeline = self.pipeline
+        base_url = request.host_url
+        trace = current_trace()
+
+        def generate():
+            # The body is streamed after the request hooks have run, so
+            # re-enter the trace to keep the trace id on pipeline log lines
+            try:
+                with use_trace(trace):
+                    for event, data in pipeline.stream(
+                        upload, file_type, summary_depth, user_id, filename=filename, base_url=base_url
+                    ):
+                        yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            finally:
+                upload.close()
+
+        response = Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        # Covers clients that disconnect before the first event
+        response.call_on_close(upload.close)
+        return response
+
+class SummarizeBatch(Summarize):
+    """
+    Summarize many files (several `files` fields and/or zip archives) in one
+    request.
+
+    Identical files are summarized once. Results stream back as
+    newline-delimited JSON in completion order: one `file` event per
+    upload, a `combined` event with a merged PDF when `combined=true`,
+    then a final `done` event with counts and skipped files.
+    """
+
+    @rate_limit(scope='summarize', per_user=True)
+    def post(self):
+        try:
+            files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+            if not files:
+                return {'error': 'No files provided'}, 400
+
+            try:
+                summary_depth = float(request.form.get('summary_depth', 2.0))
+            except ValueError:
+                return {'error': 'Summary depth must be a number'}, 400
+            user_id = request.form.get('user_id', 'default_user')
+            combined = request.form.get('combined', 'false').lower() in ('true', '1', 't')
+
+            if not 0.0 <= summary_depth <= 4.0:
+                return {'error': 'Summary depth must be between 0.0 and 4.0'}, 400
+
+            items, skipped = self.collect(files)
+        except RequestEntityTooLarge:
+            return {'error': f"Upload exceeds the {current_app.config['MAX_UPLOAD_MB']} MB limit"}, 413
+        except SummaryError as e:
+            return {'error': str(e)}, e.status_code
+
+        max_files = current_app.config['BATCH_MAX_FILES']
+        if not items or len(items) > max_files:
+            for item in items:
+                item.upload.close()
+            if not items:
+                return {'error': 'No supported files provided', 'skipped': skipped}, 400
+            return {'error': f'Too many files: {len(items)} (limit {max_files})'}, 400
+
+        batch = SummaryBatch(
+            items, summary_depth, user_id, combined=combined, skipped=skipped,
+            pipeline=self.pipeline, base_url=request.host_url
+        )
+        trace = current_trace()
+
+        def generate():
+            with use_trace(trace):
+                for event in batch.events():
+                    yield json.dumps(event) + '\n'
+
+        response = Response(
+            stream_with_context(generate()),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        # Covers clients that disconnect before the first result
+        response.call_on_close(batch.close)
+        return response
+
+    def collect(self, files):
+        """Spool the uploaded files, expanding zip archives, into BatchItems."""
+        config = current_app.config
+        items, skipped = [], []
+        try:
+            for file in files:
+                file_type = file_extension(file.filename)
+                if file_type == 'zip':
+                    archive = self.spool(file)
+                    try:
+                        expanded, archive_skipped = expand_archive(
+                            archive,
+                            self.allowed_extensions,
+                            max_bytes=config['BATCH_MAX_EXPANDED_MB'] * 1024 * 1024,
+                            threshold=config['UPLOAD_SPOOL_THRESHOLD'],
+                            spool_dir=config.get('UPLOAD_SPOOL_DIR') or None
+                        )
+                    finally:
+                        archive.close()
+                    items.extend(expanded)
+                    skipped.extend(archive_skipped)
+                elif file_type in self.allowed_extensions:
+                    items.append(BatchItem(file.filename, file_type, self.spool(file)))
+                else:
+                    skipped.append({'filename': file.filename, 'error': 'File type not supported'})
+        except Exception:
+            for item in items:
+                item.upload.close()
+            raise
+        return items, skipped
+
+def run_summary_job(upload, file_type, summary_depth, user_id, filename, on_stage=None, base_url=None):
+    """Background entry point for ?async=true summarize requests."""
+    try:
+        return get_pipeline().run(
+            upload,
+            file_type,
+            summary_depth,
+            user_id,
+            filename=filename,
+            on_stage=on_stage,
+            base_url=base_url
+        )
+    finally:
+        upload.close()
+
+class JobStatus(Resource):
+    @rate_limit
+    def get(self, job_id):
+        job = job_queue.get(job_id)
+        if not job:
+            return {'error': 'Job not found'}, 404
+
+        return {
+            'job_id': job['id'],
+            'status': job['status'],
+            'stage': job['stage'],
+            'stages': job['stages'],
+            'error': job['error'],
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at'],
+            'result_url': f"{request.script_root}/api/v1/jobs/{job_id}/result"
+        }, 200
+
+class JobResult(Resource):
+    @rate_limit
+    def get(self, job_id):
+        job = job_queue.get(job_id)
+        if not job:
+            return {'error': 'Job not found'}, 404
+
+        if job['status'] == JOB_COMPLETED:
+            result = job['result']
+            # The upload may have finished since the job did
+            pdf_url = result.get('pdf_url') and storage.refresh_url(result['pdf_url'])
+            return dict(result, pdf_url=pdf_url or result.get('pdf_url')), 200
+
+        if job['status'] == JOB_FAILED:
+            return {'error': job['error'], 'job_id': job_id}, job['status_code'] or 500
+
+        return {'status': job['status'], 'stage': job['stage'], 'job_id': job_id}, 202
+
+class ProviderStats(Resource):
+    @rate_limit
+    def get(self):
+        """Routing statistics and circuit state for this worker's providers."""
+        return {
+            'pid': os.getpid(),
+            'adaptive': current_app.config.get('AI_ROUTER_ADAPTIVE', True),
+            'providers': AIRouter().provider_stats()
+        }, 200
+
+class StoredFile(Resource):
+    @rate_limit
+    def get(self, key):
+        """
+        Stable PDF URL: serves the local copy until the background upload
+        finishes, then redirects to the storage backend's URL.
+        """
+        if safe_key(key) != key:
+            return {'error': 'File not found'}, 404
+        location = storage.resolve(key)
+        if location is None:
+            return {'error': 'File not found'}, 404
+        kind, target = location
+        if kind == 'redirect':
+            return redirect(target, code=302)
+        return send_file(target, mimetype='application/pdf', download_name=f"{key}.pdf", max_age=60)
+
 class Feedback(Resource):
     @rate_limit
     def get(self):
@@ -109,4 +368,10 @@ class Feedback(Resource):
 # Register routes
 api.add_resource(HealthCheck, '/health')
 api.add_resource(Summarize, '/summarize')
+api.add_resource(SummarizeStream, '/summarize/stream')
+api.add_resource(SummarizeBatch, '/summarize/batch')
+api.add_resource(JobStatus, '/jobs/<string:job_id>')
+api.add_resource(JobResult, '/jobs/<string:job_id>/result')
+api.add_resource(ProviderStats, '/providers/stats')
+api.add_resource(StoredFile, '/files/<string:key>.pdf')
 api.add_resource(Feedback, '/feedback')
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+Optional ASGI serving mode (`uvicorn asgi:app`, see asgi.py at the root).
+
+POST /api/v1/summarize is served natively on the event loop by
+AsyncSummaryPipeline. Provider calls, the Unsplash lookup and the storage
+upload use async HTTP clients. Extraction and PDF rendering go to the
+offload process pool. A worker then keeps hundreds of summaries in flight
+without a thread per request.
+
+Every other route is handed to the Flask app through a2wsgi on a thread
+pool, so URLs and behaviour match `gunicorn run:app`. That includes
+?async=true background jobs, streaming, batch, job status, files and
+/metrics.
+
+Requires the packages in requirements-asgi.txt.
+"""
+import logging
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route, Mount
+from app.api.v1.routes import Summarize
+from app.services.async_summarizer import get_async_pipeline
+from app.services.summarizer import SummaryError
+from app.utils.ai_clients import aclose_async_clients
+from app.utils.helpers import run_in_thread
+from app.utils.metrics import request_trace, use_trace, observe_request
+from app.utils.offload import shutdown_offload_pool
+from app.utils.rate_limiter import rate_limiter
+from app.utils.uploads import SpooledUpload
+
+SUMMARIZE_PATH = '/api/v1/summarize'
+
+
+class SummarizeEndpoint:
+    """
+    ASGI app for /api/v1/summarize: the event-loop version of
+    Summarize.post, with the same validation, rate limit and responses.
+    Requests it does not handle natively go to `fallback` (Flask).
+    """
+
+    def __init__(self, flask_app, fallback):
+        self.flask_app = flask_app
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        run_async = request.query_params.get('async', 'false').lower() in ('true', '1', 't')
+        if request.method != 'POST' or run_async:
+            await self.fallback(scope, receive, send)
+            return
+
+        trace = request_trace(request.headers.get('x-request-id', ''))
+        with self.flask_app.app_context(), use_trace(trace):
+            try:
+                status, payload, headers = await self.summarize(request)
+            except Exception as e:
+                logging.error(f"Error in summarize endpoint: {str(e)}")
+                status, payload, headers = 500, {'error': str(e)}, {}
+
+        headers['X-Request-ID'] = trace.trace_id
+        if self.flask_app.config['SERVER_TIMING_ENABLED']:
+            headers['Server-Timing'] = trace.server_timing()
+        observe_request('api.summarize', 'POST', status, trace)
+        await JSONResponse(payload, status_code=status, headers=headers)(scope, receive, send)
+
+    async def summarize(self, request):
+        """Returns (status, payload, headers)."""
+        config = self.flask_app.config
+        if int(request.headers.get('content-length') or 0) > config['MAX_CONTENT_LENGTH']:
+            return 413, {'error': f"File exceeds the {config['MAX_UPLOAD_MB']} MB upload limit"}, {}
+
+        form = await request.form()
+        try:
+            ip = request.client.host if request.client else None
+            limit = await run_in_thread(
+                rate_limiter.check, 'summarize', ip, user_id=rate_limiter.trusted_user_id(request.headers)
+            )
+            if not limit.allowed:
+                return 429, {
+                    'error': 'Rate limit exceeded',
+                    'retry_after': limit.retry_after
+                }, {
+                    'Retry-After': str(limit.retry_after),
+                    'X-RateLimit-Limit': str(limit.limit),
+                    'X-RateLimit-Remaining': '0'
+                }
+
+            file = form.get('file')
+            if file is None or isinstance(file, str):
+                return 400, {'error': 'No file provided'}, {}
+            if not file.filename:
+                return 400, {'error': 'No file selected'}, {}
+            if not Summarize.allowed_file(file.filename):
+                allowed = ", ".join(sorted(Summarize.allowed_extensions))
+                return 400, {'error': f'File type not supported. Allowed types: {allowed}'}, {}
+
+            try:
+                summary_depth = float(form.get('summary_depth', 2.0))
+            except ValueError:
+                return 400, {'error': 'Summary depth must be a number'}, {}
+            if not 0.0 <= summary_depth <= 4.0:
+                return 400, {'error': 'Summary depth must be between 0.0 and 4.0'}, {}
+
+            upload = await run_in_thread(
+                SpooledUpload.from_stream,
+                file.file,
+                threshold=config['UPLOAD_SPOOL_THRESHOLD'],
+                spool_dir=config.get('UPLOAD_SPOOL_DIR') or None
+            )
+        finally:
+            await form.close()
+
+        try:
+            response_data = await get_async_pipeline().run(
+                upload,
+                file.filename.rsplit('.', 1)[1].lower(),
+                summary_depth,
+                form.get('user_id', 'default_user'),
+                filename=file.filename,
+                base_url=str(request.base_url)
+            )
+            return 200, response_data, {}
+        except SummaryError as e:
+            logging.error(f"Error processing file: {str(e)}")
+            if e.retry_after:
+                return e.status_code, {'error': str(e)}, {'Retry-After': str(e.retry_after)}
+            return e.status_code, {'error': str(e)}, {}
+        finally:
+            upload.close()
+
+
+def create_asgi_app(flask_app):
+    """Wrap a Flask app created by create_app() for uvicorn."""
+    wsgi = WSGIMiddleware(flask_app, workers=flask_app.config.get('ASGI_WSGI_THREADS', 10))
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        # Uploads still queued on the loop stay pending in the outbox and
+        # are resumed by the next worker (UploadOutbox.claim_orphaned)
+        with flask_app.app_context():
+            await aclose_async_clients()
+        shutdown_offload_pool()
+
+    return Starlette(
+        routes=[
+            Route(SUMMARIZE_PATH, SummarizeEndpoint(flask_app, wsgi)),
+            Mount('/', app=wsgi)
+        ],
+        lifespan=lifespan
+    )
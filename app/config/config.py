@@ -14,6 +14,9 @@ class Config:
     DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() in ('true', '1', 't')
     HOST = os.getenv('FLASK_HOST', '0.0.0.0')
     PORT = int(os.getenv('FLASK_PORT', 5000))
+    # Import document parsers, reportlab and provider SDKs in create_app instead
+    # of on first use; gunicorn.conf.py turns this on with GUNICORN_PRELOAD
+    PRELOAD_MODULES = os.getenv('PRELOAD_MODULES', 'False').lower() in ('true', '1', 't')
     
     # API Configuration
     SECRET_KEY = os.getenv('SECRET_KEY', secrets.token_hex(32))
@@ -21,6 +24,18 @@ class Config:
     API_VERSION = os.getenv('API_VERSION', 'v1')
     RATE_LIMIT = int(os.getenv('RATE_LIMIT', 1000))
     RATE_LIMIT_PERIOD = timedelta(minutes=int(os.getenv('RATE_LIMIT_PERIOD', 15)))
+    # Per-route budgets per IP, "scope=limit[/minutes],..."; other routes share RATE_LIMIT
+    RATE_LIMIT_ROUTES = os.getenv('RATE_LIMIT_ROUTES', 'summarize=100,health=3000').strip()
+    # Per-user budget on /summarize routes (0 disables). Only applies to the
+    # identity an authenticating proxy puts in RATE_LIMIT_USER_HEADER; the
+    # user_id form field is client-chosen and never counted
+    RATE_LIMIT_USER = int(os.getenv('RATE_LIMIT_USER', 60))
+    RATE_LIMIT_USER_HEADER = os.getenv('RATE_LIMIT_USER_HEADER', '').strip()
+    # Counter store: sqlite (shared by workers on the host), redis (shared across hosts) or memory
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'sqlite').strip().lower()
+    RATE_LIMIT_PATH = os.getenv('RATE_LIMIT_PATH', '/tmp/sycx/rate_limits.sqlite3')
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0')
+    RATE_LIMIT_SHARDS = int(os.getenv('RATE_LIMIT_SHARDS', 16))
 
     # Model Configuration
     MODEL_PATH = os.getenv('MODEL_PATH', 'app/models/trained_models')
@@ -32,13 +47,222 @@ class Config:
     HUGGINGFACE_API_KEY = os.getenv('HUGGINGFACE_API_KEY', '').strip()
     UNSPLASH_ACCESS_KEY = os.getenv('UNSPLASH_ACCESS_KEY', '').strip()
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '').strip()
+    # OpenAI-compatible endpoint override (e.g. scripts/stub_llm_server.py); empty = api.openai.com
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', '').strip()
     GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY', '').strip()
     
+    # AI Provider HTTP Clients (one keep-alive pool per provider per worker)
+    AI_HTTP_MAX_CONNECTIONS = int(os.getenv('AI_HTTP_MAX_CONNECTIONS', 20))
+    AI_HTTP_MAX_KEEPALIVE = int(os.getenv('AI_HTTP_MAX_KEEPALIVE', 10))
+    AI_HTTP_KEEPALIVE_EXPIRY = float(os.getenv('AI_HTTP_KEEPALIVE_EXPIRY', 60))
+    AI_HTTP_TIMEOUT = float(os.getenv('AI_HTTP_TIMEOUT', 90))
+    AI_HTTP_CONNECT_TIMEOUT = float(os.getenv('AI_HTTP_CONNECT_TIMEOUT', 10))
+    AI_HTTP_MAX_RETRIES = int(os.getenv('AI_HTTP_MAX_RETRIES', 2))
+
+    # Cap on in-flight provider calls per worker, shared by all requests (0 = unlimited)
+    AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', 8))
+
+    # Prompt size limits in estimated tokens, by provider name prefix, e.g.
+    # "gemini=100000,openai=30000,huggingface=6000"; unlisted providers are unlimited
+    AI_TOKEN_BUDGETS = os.getenv('AI_TOKEN_BUDGETS', '')
+    # Tokens kept free for instructions when sizing chunks against those budgets
+    AI_PROMPT_RESERVE_TOKENS = int(os.getenv('AI_PROMPT_RESERVE_TOKENS', 1000))
+
+    # Adaptive Provider Routing
+    # Order providers/models by smoothed latency and skip open circuit breakers
+    AI_ROUTER_ADAPTIVE = os.getenv('AI_ROUTER_ADAPTIVE', 'True').lower() in ('true', '1', 't')
+    AI_ROUTER_EWMA_ALPHA = float(os.getenv('AI_ROUTER_EWMA_ALPHA', 0.3))
+    AI_ROUTER_WINDOW = int(os.getenv('AI_ROUTER_WINDOW', 200))
+    # Assumed latency (s) of a provider with no samples yet
+    AI_ROUTER_PRIOR_LATENCY = float(os.getenv('AI_ROUTER_PRIOR_LATENCY', 5))
+    # Seconds added to expected latency per unit of smoothed error rate
+    AI_ROUTER_FAILURE_PENALTY = float(os.getenv('AI_ROUTER_FAILURE_PENALTY', 30))
+    AI_BREAKER_FAILURE_THRESHOLD = int(os.getenv('AI_BREAKER_FAILURE_THRESHOLD', 3))
+    AI_BREAKER_COOLDOWN = float(os.getenv('AI_BREAKER_COOLDOWN', 60))
+    # Per-model timeout on the HuggingFace router
+    AI_HF_TIMEOUT = float(os.getenv('AI_HF_TIMEOUT', 90))
+
+    # Hedged Requests
+    # Race the next provider when the current one is slower than its usual
+    # AI_HEDGE_PERCENTILE latency; AI_HEDGE_BUDGET caps extra in-flight calls
+    AI_HEDGING_ENABLED = os.getenv('AI_HEDGING_ENABLED', 'False').lower() in ('true', '1', 't')
+    AI_HEDGE_PERCENTILE = float(os.getenv('AI_HEDGE_PERCENTILE', 95))
+    AI_HEDGE_MIN_SAMPLES = int(os.getenv('AI_HEDGE_MIN_SAMPLES', 10))
+    AI_HEDGE_DEFAULT_DELAY = float(os.getenv('AI_HEDGE_DEFAULT_DELAY', 10))
+    AI_HEDGE_MIN_DELAY = float(os.getenv('AI_HEDGE_MIN_DELAY', 1))
+    AI_HEDGE_BUDGET = int(os.getenv('AI_HEDGE_BUDGET', 4))
+    AI_HEDGE_MAX_WORKERS = int(os.getenv('AI_HEDGE_MAX_WORKERS', 32))
+
     # Cloudinary Configuration
     CLOUDINARY_CLOUD_NAME = os.getenv('CLOUDINARY_CLOUD_NAME', '').strip()
     CLOUDINARY_API_KEY = os.getenv('CLOUDINARY_API_KEY', '').strip()
     CLOUDINARY_API_SECRET = os.getenv('CLOUDINARY_API_SECRET', '').strip()
+
+    # PDF Storage Configuration
+    # Backend: cloudinary, or local (served by this API from STORAGE_LOCAL_DIR)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'cloudinary').strip().lower()
+    STORAGE_LOCAL_DIR = os.getenv('STORAGE_LOCAL_DIR', '/tmp/sycx/files')
+    # Base for stable /api/v1/files URLs; defaults to the request's host
+    STORAGE_PUBLIC_URL = os.getenv('STORAGE_PUBLIC_URL', '').strip()
+    # Return the stable URL immediately and upload in the background; only
+    # safe when the outbox below lives on a persistent disk
+    STORAGE_ASYNC_UPLOAD = os.getenv('STORAGE_ASYNC_UPLOAD', 'False').lower() in ('true', '1', 't')
+    # Staged PDFs and the upload outbox survive worker restarts
+    STORAGE_STAGING_DIR = os.getenv('STORAGE_STAGING_DIR', '/tmp/sycx/outbox')
+    STORAGE_OUTBOX_PATH = os.getenv('STORAGE_OUTBOX_PATH', '/tmp/sycx/outbox.sqlite3')
+    STORAGE_OUTBOX_TTL = int(os.getenv('STORAGE_OUTBOX_TTL', 30 * 24 * 3600))
+    STORAGE_UPLOAD_WORKERS = int(os.getenv('STORAGE_UPLOAD_WORKERS', 2))
+    # Seconds between sweeps for uploads orphaned by a dead worker (0: only at start)
+    STORAGE_ORPHAN_SWEEP_INTERVAL = float(os.getenv('STORAGE_ORPHAN_SWEEP_INTERVAL', 300))
+    # Exponential backoff: base * 2^(attempt-1) seconds with jitter, capped
+    STORAGE_MAX_ATTEMPTS = int(os.getenv('STORAGE_MAX_ATTEMPTS', 8))
+    STORAGE_RETRY_BASE = float(os.getenv('STORAGE_RETRY_BASE', 2.0))
+    STORAGE_RETRY_MAX_DELAY = float(os.getenv('STORAGE_RETRY_MAX_DELAY', 300))
+    # PDFs above this many bytes are uploaded in STORAGE_CHUNK_SIZE chunks
+    STORAGE_CHUNK_THRESHOLD = int(os.getenv('STORAGE_CHUNK_THRESHOLD', 20 * 1024 * 1024))
+    STORAGE_CHUNK_SIZE = int(os.getenv('STORAGE_CHUNK_SIZE', 6 * 1024 * 1024))
+
+    # Header Image Configuration
+    # Render-ready (6x4 in at IMAGE_RENDER_DPI) images cached on disk by normalized query
+    IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', '/tmp/sycx/images').strip()
+    IMAGE_CACHE_MAX_ENTRIES = int(os.getenv('IMAGE_CACHE_MAX_ENTRIES', 500))
+    IMAGE_CACHE_MAX_MB = int(os.getenv('IMAGE_CACHE_MAX_MB', 200))
+    IMAGE_RENDER_DPI = int(os.getenv('IMAGE_RENDER_DPI', 150))
+    IMAGE_PREFETCH_WORKERS = int(os.getenv('IMAGE_PREFETCH_WORKERS', 4))
+    # Image queries come from the structured draft's image keywords; without
+    # them (AI_STRUCTURED_OUTPUT off, streaming) from this much document text
+    IMAGE_QUERY_SAMPLE_CHARS = int(os.getenv('IMAGE_QUERY_SAMPLE_CHARS', 20000))
+    # Seconds create_pdf waits for the prefetch before using a bundled image
+    IMAGE_WAIT_SECONDS = float(os.getenv('IMAGE_WAIT_SECONDS', 5.0))
+    # Bundled fallback images; defaults to assets/images
+    IMAGE_FALLBACK_DIR = os.getenv('IMAGE_FALLBACK_DIR', '').strip()
+    UNSPLASH_TIMEOUT = float(os.getenv('UNSPLASH_TIMEOUT', 3.0))
+    # Seconds to skip the Unsplash API after a failure
+    UNSPLASH_COOLDOWN = float(os.getenv('UNSPLASH_COOLDOWN', 60))
     
+    # Summarization Configuration
+    # Ask the provider for title, sections and image keywords in one JSON call
+    AI_STRUCTURED_OUTPUT = os.getenv('AI_STRUCTURED_OUTPUT', 'True').lower() in ('true', '1', 't')
+    # Documents above this estimated token count are summarized chunk by chunk
+    SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', 6000))
+    SUMMARY_MAX_WORKERS = int(os.getenv('SUMMARY_MAX_WORKERS', 4))
+    SUMMARY_MAX_WORDS = int(os.getenv('SUMMARY_MAX_WORDS', 2000))
+    # Extra LLM call for section markers: auto (only when the summary has no headings), always or never
+    SECTION_MARKERS_LLM = os.getenv('SECTION_MARKERS_LLM', 'auto').strip().lower()
+
+    # Text Extraction Configuration
+    # Stop extracting once either budget is reached (0 disables the limit)
+    EXTRACT_MAX_PAGES = int(os.getenv('EXTRACT_MAX_PAGES', 500))
+    EXTRACT_MAX_CHARS = int(os.getenv('EXTRACT_MAX_CHARS', 2000000))
+    # PDFs with at least this many pages are split across a process pool
+    EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv('EXTRACT_PARALLEL_MIN_PAGES', 40))
+    EXTRACT_PAGES_PER_TASK = int(os.getenv('EXTRACT_PAGES_PER_TASK', 10))
+    # Process pool size per gunicorn worker; every process is a separate
+    # interpreter, so keep it small on low-memory plans. 0 means one per CPU
+    # (cgroup quota aware)
+    EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', 2))
+
+    # Spreadsheets and CSV are described per sheet (column statistics plus
+    # sampled rows) instead of dumped cell by cell
+    TABLE_PROFILE_MAX_CHARS = int(os.getenv('TABLE_PROFILE_MAX_CHARS', 12000))
+    TABLE_SAMPLE_ROWS = int(os.getenv('TABLE_SAMPLE_ROWS', 20))
+    # Rows read and profiled per batch; bounds memory for very large sheets
+    TABLE_CHUNK_ROWS = int(os.getenv('TABLE_CHUNK_ROWS', 5000))
+    TABLE_MAX_COLUMNS = int(os.getenv('TABLE_MAX_COLUMNS', 60))
+
+    # Text Compaction (before the text reaches a prompt)
+    # Drops running headers/footers, page numbers and duplicate paragraphs,
+    # normalizes whitespace and samples tables longer than COMPACT_TABLE_MAX_ROWS
+    COMPACT_ENABLED = os.getenv('COMPACT_ENABLED', 'True').lower() in ('true', '1', 't')
+    COMPACT_TABLE_MAX_ROWS = int(os.getenv('COMPACT_TABLE_MAX_ROWS', 60))
+    # Share of pages an edge line must repeat on to count as a header/footer
+    COMPACT_HEADER_MIN_SHARE = float(os.getenv('COMPACT_HEADER_MIN_SHARE', 0.5))
+    COMPACT_DEDUPE = os.getenv('COMPACT_DEDUPE', 'True').lower() in ('true', '1', 't')
+
+    # OCR Configuration (images and scanned PDF pages)
+    OCR_ENABLED = os.getenv('OCR_ENABLED', 'True').lower() in ('true', '1', 't')
+    OCR_DPI = int(os.getenv('OCR_DPI', 300))
+    # PDF pages with fewer extracted characters are treated as scanned
+    OCR_MIN_PAGE_CHARS = int(os.getenv('OCR_MIN_PAGE_CHARS', 20))
+    OCR_MAX_SIDE = int(os.getenv('OCR_MAX_SIDE', 4000))
+    OCR_TILE_HEIGHT = int(os.getenv('OCR_TILE_HEIGHT', 3000))
+    OCR_LANG = os.getenv('OCR_LANG', 'eng')
+    # Per-page OCR results keyed by image hash, shared across workers
+    OCR_CACHE_PATH = os.getenv('OCR_CACHE_PATH', '/tmp/sycx/ocr_cache.sqlite3')
+
+    # Summary Cache Configuration
+    # Backend: memory (per worker), sqlite (shared on host), tiered (both) or none
+    SUMMARY_CACHE_BACKEND = os.getenv('SUMMARY_CACHE_BACKEND', 'tiered').strip().lower()
+    SUMMARY_CACHE_PATH = os.getenv('SUMMARY_CACHE_PATH', '/tmp/sycx/summary_cache.sqlite3')
+    SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES', 512))
+    SUMMARY_CACHE_TTL = int(os.getenv('SUMMARY_CACHE_TTL', 7 * 24 * 3600))
+
+    # Document Cache Configuration
+    # Extracted text and depth-independent partial summaries per document,
+    # so a new summary depth only re-runs the final reduce call
+    DOCUMENT_CACHE_BACKEND = os.getenv('DOCUMENT_CACHE_BACKEND', 'tiered').strip().lower()
+    DOCUMENT_CACHE_PATH = os.getenv('DOCUMENT_CACHE_PATH', '/tmp/sycx/document_cache.sqlite3')
+    DOCUMENT_CACHE_MAX_ENTRIES = int(os.getenv('DOCUMENT_CACHE_MAX_ENTRIES', 2000))
+    DOCUMENT_CACHE_TTL = int(os.getenv('DOCUMENT_CACHE_TTL', 7 * 24 * 3600))
+    # Size budgets per tier; least recently used entries are evicted first
+    DOCUMENT_CACHE_MEMORY_MB = int(os.getenv('DOCUMENT_CACHE_MEMORY_MB', 64))
+    DOCUMENT_CACHE_DISK_MB = int(os.getenv('DOCUMENT_CACHE_DISK_MB', 1024))
+    # Partial (map) summaries keep this share of each chunk's words, at every depth
+    SUMMARY_PARTIAL_RATIO = float(os.getenv('SUMMARY_PARTIAL_RATIO', 0.6))
+
+    # Background Job Configuration (?async=true on /summarize)
+    # Store: sqlite (status visible to every worker on the host) or memory
+    JOB_STORE_BACKEND = os.getenv('JOB_STORE_BACKEND', 'sqlite').strip().lower()
+    JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', '/tmp/sycx/jobs.sqlite3')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+    JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', 100))
+    JOB_TTL = int(os.getenv('JOB_TTL', 3600))
+
+    # Upload and Memory Configuration
+    # Requests larger than MAX_UPLOAD_MB are rejected with 413 by Flask
+    MAX_UPLOAD_MB = int(os.getenv('MAX_UPLOAD_MB', 100))
+    MAX_CONTENT_LENGTH = MAX_UPLOAD_MB * 1024 * 1024
+    # Uploads above this many bytes are spooled to a temp file instead of RAM
+    UPLOAD_SPOOL_THRESHOLD = int(os.getenv('UPLOAD_SPOOL_THRESHOLD', 5 * 1024 * 1024))
+    UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR', '').strip()
+    # MAX_MEMORY_MB is the host budget; each of this many worker processes
+    # (gunicorn/uvicorn --workers) admits work against an equal share of it
+    MEMORY_WORKERS = int(os.getenv('MEMORY_WORKERS', os.getenv('GUNICORN_WORKERS', 1)))
+    # New work waits (then gets 503) once RSS + reservations pass this share of a worker's budget
+    MEMORY_HIGH_WATERMARK = float(os.getenv('MEMORY_HIGH_WATERMARK', 0.85))
+    MEMORY_REQUEST_BASE_MB = float(os.getenv('MEMORY_REQUEST_BASE_MB', 50))
+    MEMORY_UPLOAD_FACTOR = float(os.getenv('MEMORY_UPLOAD_FACTOR', 4.0))
+    MEMORY_ADMISSION_WAIT = float(os.getenv('MEMORY_ADMISSION_WAIT', 10.0))
+
+    # Batch Summarization Configuration (/summarize/batch)
+    BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 50))
+    # Documents of one batch summarized concurrently (pool shared per worker)
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+    # Uncompressed size limit for zip uploads
+    BATCH_MAX_EXPANDED_MB = int(os.getenv('BATCH_MAX_EXPANDED_MB', 500))
+
+    # Stage Graph Configuration
+    # Shared pool running independent pipeline stages concurrently
+    STAGE_WORKERS = int(os.getenv('STAGE_WORKERS', 16))
+    # Per-stage timeouts in seconds, "stage=seconds,..."; others use STAGE_TIMEOUT_DEFAULT (0 = none)
+    STAGE_TIMEOUTS = os.getenv('STAGE_TIMEOUTS', 'title=45,markers=45,image=15,render=120').strip()
+    STAGE_TIMEOUT_DEFAULT = float(os.getenv('STAGE_TIMEOUT_DEFAULT', 600))
+
+    # Observability Configuration
+    # /metrics aggregates all gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() in ('true', '1', 't')
+    SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'True').lower() in ('true', '1', 't')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').strip().upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', '%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s')
+
+    # ASGI Serving Mode (uvicorn asgi:app; see app/asgi.py)
+    # In-flight provider calls per event loop; a waiting call holds no thread
+    AI_ASYNC_MAX_CONCURRENCY = int(os.getenv('AI_ASYNC_MAX_CONCURRENCY', 200))
+    # Processes running extraction and PDF rendering off the event loop; 0 means one per CPU core
+    OFFLOAD_WORKERS = int(os.getenv('OFFLOAD_WORKERS', 0))
+    # Threads serving the routes handed to the Flask app
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', 10))
+
     # Common Configuration
     TESTING = False
 
@@ -50,6 +274,10 @@ class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     DEBUG = True
+    SUMMARY_CACHE_BACKEND = 'memory'
+    DOCUMENT_CACHE_BACKEND = 'memory'
+    JOB_STORE_BACKEND = 'memory'
+    RATE_LIMIT_BACKEND = 'memory'
 
 class ProductionConfig(Config):
     """Production configuration."""
@@ -1,10 +1,12 @@
-from transformers import Pipeline  # or your preferred ML library
-
 class MyModel:
     def __init__(self):
         self.model = None
         
     def load_model(self, model_path):
+        # Imported here: transformers (and torch) take seconds and hundreds of
+        # MB to load, and live in requirements-ml.txt rather than the API image
+        from transformers import Pipeline  # or your preferred ML library
+
         # Load your model here
         self.model = Pipeline.from_pretrained(model_path)
         
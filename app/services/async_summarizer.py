@@ -0,0 +1,83 @@
+import logging
+import threading
+from io import BytesIO
+from app.services.summarizer import SummaryPipeline, SummaryError
+from app.utils.async_file_processor import AsyncFileProcessor
+from app.utils.helpers import run_in_thread
+from app.utils.images import image_service
+from app.utils.memory_guard import memory_guard, MemoryPressureError
+from app.utils.metrics import stage
+from app.utils.offload import offload
+from app.utils.pdf_generator import render_pdf, storage_name
+from app.utils.storage import storage
+
+
+class AsyncSummaryPipeline(SummaryPipeline):
+    """
+    SummaryPipeline for the ASGI serving mode (see app/asgi.py).
+
+    Provider calls, the Unsplash lookup and the storage upload are awaited
+    on the event loop; extraction and PDF rendering run on the offload
+    process pool. The summary cache and response payload are shared with
+    the synchronous pipeline, so either server can answer from the other's
+    cache entries.
+    """
+
+    def __init__(self):
+        # Rendering happens in the offload processes, so no PDFGenerator here
+        self.file_processor = AsyncFileProcessor()
+
+    async def run(self, upload, file_type, summary_depth, user_id, filename=None, base_url=None):
+        upload = self._as_upload(upload)
+        file_hash = upload.sha256
+
+        cached = await run_in_thread(self._cached_response, file_hash, summary_depth, user_id, filename or file_type)
+        if cached:
+            return cached
+
+        logging.info(f"Processing file: {filename}, type: {file_type}, size: {upload.size} bytes")
+
+        try:
+            async with memory_guard.admit_async(memory_guard.estimate_mb(upload.size)):
+                result = await self.file_processor.aprocess_file(upload, file_type, summary_depth)
+        except MemoryPressureError as e:
+            raise SummaryError(str(e), status_code=e.status_code, retry_after=e.retry_after)
+        except Exception as e:
+            raise SummaryError(f'Error processing file: {str(e)}')
+
+        pdf_url = await self._publish(result, base_url)
+        if not pdf_url:
+            raise SummaryError('Failed to generate or upload PDF')
+
+        return await run_in_thread(self._finish, file_hash, summary_depth, user_id, result, pdf_url)
+
+    async def _publish(self, result, base_url):
+        """Render in the offload pool and store; returns the URL or None, like PDFGenerator._publish."""
+        display_format = result['display_format']
+        try:
+            image = await image_service.aresolve(result.get('image'), display_format.get('image_query', 'document'))
+            with stage('offload_render'):
+                pdf = await offload(render_pdf, result['summary'], display_format, result['title'], image)
+        except Exception as e:
+            logging.error(f"PDF generation error: {e}")
+            return None
+
+        try:
+            return await storage.asave(BytesIO(pdf), storage_name(result['title']), base_url=base_url)
+        except Exception as e:
+            logging.error(f"PDF storage error: {e}")
+            return None
+
+
+_pipeline_lock = threading.Lock()
+_pipeline = None
+
+
+def get_async_pipeline():
+    """Process-wide AsyncSummaryPipeline, shared by every request on the event loop."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = AsyncSummaryPipeline()
+    return _pipeline
@@ -0,0 +1,235 @@
+import os
+import zipfile
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from app.services.summarizer import get_pipeline, SummaryError
+from app.utils.uploads import SpooledUpload
+from app.utils.helpers import with_app_context
+
+# Shared by every batch in the worker; created on first batch
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def get_batch_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('BATCH_WORKERS', 4),
+                    thread_name_prefix='sycx-batch'
+                )
+    return _pool
+
+
+def file_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+
+
+class BatchItem:
+    """One document of a batch: its name, type and spooled content."""
+
+    __slots__ = ('index', 'filename', 'file_type', 'upload', 'state')
+
+    def __init__(self, filename, file_type, upload):
+        self.index = None
+        self.filename = filename
+        self.file_type = file_type
+        self.upload = upload
+        self.state = 'queued'
+
+
+def expand_archive(upload, allowed_extensions, max_bytes, threshold, spool_dir=None):
+    """
+    Spool the supported members of a zip upload into BatchItems.
+
+    Returns (items, skipped) where skipped lists {'filename', 'error'} for
+    members that were left out. Member sizes come from the archive's
+    central directory, which zipfile also enforces while reading, so the
+    expanded total is bounded by `max_bytes` before anything is written.
+    """
+    items, skipped = [], []
+    total = 0
+    try:
+        with upload.open() as handle, zipfile.ZipFile(handle) as archive:
+            for info in archive.infolist():
+                name = os.path.basename(info.filename)
+                if info.is_dir() or not name or name.startswith('.') or '__MACOSX' in info.filename:
+                    continue
+                if file_extension(name) not in allowed_extensions:
+                    skipped.append({'filename': name, 'error': 'File type not supported'})
+                    continue
+                total += info.file_size
+                if total > max_bytes:
+                    raise SummaryError(
+                        f"Archive expands beyond the {max_bytes // (1024 * 1024)} MB batch limit",
+                        status_code=413
+                    )
+                try:
+                    with archive.open(info) as member:
+                        member_upload = SpooledUpload.from_stream(member, threshold=threshold, spool_dir=spool_dir)
+                except (RuntimeError, NotImplementedError, zipfile.BadZipFile) as e:
+                    # Encrypted or unsupported compression
+                    skipped.append({'filename': name, 'error': f'Unreadable archive member: {str(e)}'})
+                    continue
+                items.append(BatchItem(name, file_extension(name), member_upload))
+    except zipfile.BadZipFile:
+        for item in items:
+            item.upload.close()
+        raise SummaryError('Invalid zip archive', status_code=400)
+    except Exception:
+        for item in items:
+            item.upload.close()
+        raise
+    return items, skipped
+
+
+class SummaryBatch:
+    """
+    Summarize several documents for one request.
+
+    Identical files (same SHA-256) are summarized once and reported for
+    every name they were uploaded under. Unique documents run through the
+    shared SummaryPipeline concurrently on the batch pool (BATCH_WORKERS);
+    LLM calls across all of them are capped worker-wide by
+    AI_MAX_CONCURRENCY, and each document still passes the memory guard.
+
+    events() yields one dict per file as it completes, an optional
+    'combined' event with the merged PDF, then 'done'. The batch owns the
+    uploads: each is closed once processed, and close() releases any that
+    never started (e.g. when the client disconnects).
+    """
+
+    def __init__(self, items, summary_depth, user_id, combined=False, skipped=None, pipeline=None, base_url=None):
+        self.summary_depth = summary_depth
+        self.user_id = user_id
+        self.combined = combined
+        self.skipped = list(skipped or [])
+        self.pipeline = pipeline or get_pipeline()
+        self.base_url = base_url
+        self.items = list(items)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # sha256 -> [primary item, duplicates...]
+        self.groups = OrderedDict()
+        for index, item in enumerate(self.items):
+            item.index = index
+            self.groups.setdefault(item.upload.sha256, []).append(item)
+        for group in self.groups.values():
+            for duplicate in group[1:]:
+                duplicate.state = 'duplicate'
+                duplicate.upload.close()
+
+    def events(self):
+        pool = get_batch_pool()
+        summarize = with_app_context(self._summarize)
+        futures = {}
+        contents = {}
+        counts = {'succeeded': 0, 'failed': 0}
+
+        try:
+            for group in self.groups.values():
+                futures[pool.submit(summarize, group[0])] = group
+
+            for future in as_completed(futures):
+                group = futures[future]
+                primary = group[0]
+                try:
+                    result, content = future.result()
+                except Exception as e:
+                    error = {'error': str(e)}
+                    if isinstance(e, SummaryError) and e.retry_after:
+                        error['retry_after'] = e.retry_after
+                    for item in group:
+                        counts['failed'] += 1
+                        yield self._event(item, primary, 'error', error)
+                    continue
+
+                contents[primary.index] = (result, content)
+                for item in group:
+                    counts['succeeded'] += 1
+                    yield self._event(item, primary, 'success', {'result': result})
+
+            if self.combined and contents:
+                yield self._combined_event(contents)
+
+            yield {
+                'event': 'done',
+                'files': len(self.items),
+                'unique': len(self.groups),
+                'succeeded': counts['succeeded'],
+                'failed': counts['failed'],
+                'skipped': self.skipped
+            }
+        finally:
+            for future in futures:
+                future.cancel()
+            self.close()
+
+    def close(self):
+        """Release uploads of documents that were never handed to a worker."""
+        with self._lock:
+            self._closed = True
+            for item in self.items:
+                if item.state == 'queued':
+                    item.state = 'cancelled'
+                    item.upload.close()
+
+    def _summarize(self, item):
+        with self._lock:
+            if self._closed:
+                raise SummaryError('Batch cancelled')
+            item.state = 'running'
+
+        content = {}
+        try:
+            result = self.pipeline.run(
+                item.upload,
+                item.file_type,
+                self.summary_depth,
+                self.user_id,
+                filename=item.filename,
+                on_result=content.update if self.combined else None,
+                base_url=self.base_url
+            )
+            return result, content
+        finally:
+            item.state = 'done'
+            item.upload.close()
+
+    @staticmethod
+    def _event(item, primary, status, payload):
+        event = {'event': 'file', 'index': item.index, 'filename': item.filename, 'status': status}
+        if item is not primary:
+            event['duplicate_of'] = primary.filename
+        event.update(payload)
+        return event
+
+    def _combined_event(self, contents):
+        """Merge the successful summaries, in upload order, into one PDF."""
+        documents = []
+        for index in sorted(contents):
+            result, content = contents[index]
+            if content:
+                documents.append({
+                    'title': content['title'],
+                    'summary': content['summary'],
+                    'display_format': content['display_format']
+                })
+            else:
+                documents.append({'title': result['title'], 'pdf_url': result['pdf_url']})
+
+        title = documents[0]['title'] if len(documents) == 1 else f"Combined_Summary_{len(documents)}_Documents"
+        try:
+            pdf_url = self.pipeline.pdf_generator.create_combined_pdf(documents, title, base_url=self.base_url)
+        except Exception as e:
+            logging.error(f"Combined PDF failed: {str(e)}")
+            pdf_url = None
+        if not pdf_url:
+            return {'event': 'combined', 'status': 'error', 'error': 'Failed to generate or upload combined PDF'}
+        return {'event': 'combined', 'status': 'success', 'pdf_url': pdf_url, 'documents': len(documents)}
@@ -0,0 +1,216 @@
+import logging
+import threading
+from app.utils.cache import summary_cache
+from app.utils.storage import storage
+from app.utils.file_processor import FileProcessor
+from app.utils.uploads import SpooledUpload
+from app.utils.memory_guard import memory_guard, MemoryPressureError
+
+
+# Processing stats reported with every summary, cached or not, with the
+# value returned for cache entries that predate them
+CACHED_STATS = {
+    'chunk_count': 0,
+    'chunk_timings': [],
+    'page_count': 0,
+    'page_timings': [],
+    'extraction_truncated': False
+}
+
+
+class SummaryError(Exception):
+    """Pipeline failure that maps onto an HTTP error response."""
+
+    def __init__(self, message, status_code=500, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class SummaryPipeline:
+    """
+    Extract → summarize → render → upload for a single uploaded file.
+
+    Shared by the synchronous /summarize endpoint and background jobs.
+    `on_stage` is called with the name of each stage as it starts:
+    extracting, summarizing, rendering, uploading.
+
+    `on_result`, if given, receives the processor result (summary, title,
+    display_format) before rendering; it is not called on cache hits.
+    `base_url` is the request's host URL, captured by the route so PDF
+    URLs stay absolute when the pipeline runs on a worker thread.
+
+    `upload` is a SpooledUpload (raw bytes are wrapped in one). Work is
+    admitted through the memory guard using an estimate based on the
+    upload size, so bursts of large files queue instead of exhausting RAM.
+    """
+
+    def __init__(self):
+        # reportlab is only loaded once a summary is actually rendered
+        from app.utils.pdf_generator import PDFGenerator
+
+        self.file_processor = FileProcessor()
+        self.pdf_generator = PDFGenerator()
+
+    def run(self, upload, file_type, summary_depth, user_id, filename=None, on_stage=None, on_result=None,
+            base_url=None):
+        upload = self._as_upload(upload)
+        file_hash = upload.sha256
+
+        cached = self._cached_response(file_hash, summary_depth, user_id, filename or file_type)
+        if cached:
+            return cached
+
+        logging.info(f"Processing file: {filename}, type: {file_type}, size: {upload.size} bytes")
+
+        try:
+            with memory_guard.admit(memory_guard.estimate_mb(upload.size)):
+                result = self.file_processor.process_file(
+                    upload,
+                    file_type,
+                    summary_depth,
+                    on_stage=on_stage
+                )
+        except MemoryPressureError as e:
+            raise SummaryError(str(e), status_code=e.status_code, retry_after=e.retry_after)
+        except Exception as e:
+            raise SummaryError(f'Error processing file: {str(e)}')
+
+        if not result:
+            raise SummaryError('Failed to process file with Gemini')
+
+        if on_result:
+            on_result(result)
+
+        pdf_url = self.pdf_generator.create_pdf(
+            summary_content=result['summary'],
+            display_format=result['display_format'],
+            title=result['title'],
+            on_stage=on_stage,
+            image=result.get('image'),
+            base_url=base_url
+        )
+
+        if not pdf_url:
+            raise SummaryError('Failed to generate or upload PDF')
+
+        return self._finish(file_hash, summary_depth, user_id, result, pdf_url)
+
+    def stream(self, upload, file_type, summary_depth, user_id, filename=None, base_url=None):
+        """
+        Generator form of run() for server-sent events.
+
+        Yields (event, data) tuples: stage, token, title, sections, pdf_url
+        and finally done with the same payload run() returns. Failures are
+        reported as a final error event instead of being raised.
+        """
+        try:
+            upload = self._as_upload(upload)
+            file_hash = upload.sha256
+            cached = self._cached_response(file_hash, summary_depth, user_id, filename or file_type)
+            if cached:
+                yield 'title', cached['title']
+                yield 'pdf_url', cached['pdf_url']
+                yield 'done', cached
+                return
+
+            logging.info(f"Streaming file: {filename}, type: {file_type}, size: {upload.size} bytes")
+
+            result = None
+            with memory_guard.admit(memory_guard.estimate_mb(upload.size)):
+                for event, data in self.file_processor.stream_file(upload, file_type, summary_depth):
+                    if event == 'result':
+                        result = data
+                    else:
+                        yield event, data
+
+            yield 'stage', 'rendering'
+            pdf_url = self.pdf_generator.create_pdf(
+                summary_content=result['summary'],
+                display_format=result['display_format'],
+                title=result['title'],
+                image=result.get('image'),
+                base_url=base_url
+            )
+            if not pdf_url:
+                yield 'error', {'error': 'Failed to generate or upload PDF'}
+                return
+
+            yield 'pdf_url', pdf_url
+            yield 'done', self._finish(file_hash, summary_depth, user_id, result, pdf_url)
+
+        except MemoryPressureError as e:
+            yield 'error', {'error': str(e), 'retry_after': e.retry_after}
+        except Exception as e:
+            logging.error(f"Error streaming summary: {str(e)}")
+            yield 'error', {'error': f'Error processing file: {str(e)}'}
+
+    @staticmethod
+    def _as_upload(upload):
+        if isinstance(upload, (bytes, bytearray)):
+            return SpooledUpload.from_bytes(bytes(upload))
+        return upload
+
+    def _cached_response(self, file_hash, summary_depth, user_id, label):
+        cached = summary_cache.get(file_hash, summary_depth)
+        if not cached:
+            return None
+
+        pdf_url = storage.refresh_url(cached['pdf_url'])
+        if pdf_url is None:
+            logging.info(f"Cached PDF for {label} ({file_hash[:12]}) is gone, regenerating")
+            return None
+        if pdf_url != cached['pdf_url']:
+            summary_cache.set(file_hash, summary_depth, dict(cached, pdf_url=pdf_url))
+
+        logging.info(f"Summary cache hit for {label} ({file_hash[:12]})")
+        return {
+            'status': 'success',
+            'pdf_url': pdf_url,
+            'title': cached['title'],
+            'summary_length': cached['summary_length'],
+            'user_id': user_id,
+            'cached': True,
+            # Entries written before the stats were cached report them empty
+            **{name: cached.get(name, default) for name, default in CACHED_STATS.items()}
+        }
+
+    def _finish(self, file_hash, summary_depth, user_id, result, pdf_url):
+        """Build the success payload and remember it in the summary cache."""
+        response_data = {
+            'status': 'success',
+            'pdf_url': pdf_url,
+            'title': result['title'],
+            'summary_length': len(result['summary'].split()),
+            'user_id': user_id,
+            'cached': False,
+            **{name: result['stats'][name] for name in CACHED_STATS}
+        }
+
+        summary_cache.set(file_hash, summary_depth, {
+            'pdf_url': pdf_url,
+            'title': result['title'],
+            'summary_length': response_data['summary_length'],
+            **{name: response_data[name] for name in CACHED_STATS}
+        })
+
+        logging.info(f"Successfully processed file for user {user_id}: {result['title']}")
+        return response_data
+
+
+_pipeline_lock = threading.Lock()
+_pipeline = None
+
+
+def get_pipeline():
+    """
+    Process-wide SummaryPipeline. The processor, router and PDF generator
+    hold no per-request state, so requests and background jobs share one
+    instead of rebuilding them (and re-reading fonts) every time.
+    """
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = SummaryPipeline()
+    return _pipeline
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import inspect
+import logging
+import threading
+import weakref
+import httpx
+from flask import current_app
+
+_registry_lock = threading.Lock()
+
+
+def client_settings(config):
+    """Connection pool and timeout settings for provider clients."""
+    return {
+        'max_connections': config.get('AI_HTTP_MAX_CONNECTIONS', 20),
+        'max_keepalive': config.get('AI_HTTP_MAX_KEEPALIVE', 10),
+        'keepalive_expiry': config.get('AI_HTTP_KEEPALIVE_EXPIRY', 60.0),
+        'timeout': config.get('AI_HTTP_TIMEOUT', 90.0),
+        'connect_timeout': config.get('AI_HTTP_CONNECT_TIMEOUT', 10.0),
+        'max_retries': config.get('AI_HTTP_MAX_RETRIES', 2),
+    }
+
+
+class ClientRegistry:
+    """
+    Per-app cache of provider SDK clients.
+
+    Each client owns a keep-alive connection pool, so reusing it across
+    requests avoids a fresh TLS handshake for every LLM call. Clients are
+    thread-safe and shared by all request threads of a worker. A client is
+    rebuilt when its API key, base URL or pool settings change; the old one
+    may still be mid-call on another thread, so its pool is closed once it
+    is garbage-collected rather than straight away.
+    """
+
+    def __init__(self, config):
+        self.settings = client_settings(config)
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def configure(self, config):
+        """Pick up changed pool settings; affected clients are rebuilt on next use."""
+        self.settings = client_settings(config)
+
+    def _fingerprint(self, key, base_url):
+        raw = f"{key}|{base_url}|{sorted(self.settings.items())}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=self.settings['max_connections'],
+            max_keepalive_connections=self.settings['max_keepalive'],
+            keepalive_expiry=self.settings['keepalive_expiry'],
+        )
+
+    def _get(self, name, key, base_url, factory):
+        fingerprint = self._fingerprint(key, base_url)
+        entry = self._clients.get(name)
+        if entry and entry[0] == fingerprint:
+            return entry[1]
+
+        with self._lock:
+            entry = self._clients.get(name)
+            if entry and entry[0] == fingerprint:
+                return entry[1]
+            if entry:
+                logging.info(f"Settings for {name} changed, rebuilding client")
+                self._retire(entry)
+            client, closer = factory()
+            self._clients[name] = (fingerprint, client, closer)
+            return client
+
+    def _close(self, entry):
+        closer = entry[2]
+        try:
+            if closer:
+                closer()
+        except Exception as e:
+            logging.warning(f"Error closing AI client: {str(e)}")
+
+    def _retire(self, entry):
+        """Close a replaced client's pool once the last thread using it lets go."""
+        _, client, closer = entry
+        # A closer bound to the client itself would keep it alive forever;
+        # such clients release their pool when collected anyway
+        if closer is not None and getattr(closer, '__self__', None) is not client:
+            weakref.finalize(client, self._close, (None, None, closer))
+
+    def openai(self, key, base_url=None, name='openai'):
+        def factory():
+            # Provider SDKs are slow to import; load them with the first client
+            from openai import OpenAI
+
+            http_client = httpx.Client(
+                limits=self._limits(),
+                timeout=httpx.Timeout(
+                    self.settings['timeout'],
+                    connect=self.settings['connect_timeout']
+                ),
+            )
+            client = OpenAI(
+                api_key=key,
+                base_url=base_url,
+                http_client=http_client,
+                max_retries=self.settings['max_retries'],
+            )
+            return client, http_client.close
+        return self._get(name, key, base_url, factory)
+
+    def gemini(self, key, name='gemini'):
+        def factory():
+            from google import genai
+            from google.genai import types as genai_types
+
+            client = genai.Client(
+                api_key=key,
+                http_options=genai_types.HttpOptions(
+                    timeout=int(self.settings['timeout'] * 1000),
+                    client_args={'limits': self._limits()},
+                ),
+            )
+            return client, getattr(client, 'close', None)
+        return self._get(name, key, None, factory)
+
+    def close_all(self):
+        with self._lock:
+            for entry in self._clients.values():
+                self._close(entry)
+            self._clients.clear()
+
+
+def get_client_registry():
+    """Return the ClientRegistry of the current app, creating it once."""
+    registry = current_app.extensions.get('sycx_ai_clients')
+    if registry is None:
+        with _registry_lock:
+            registry = current_app.extensions.get('sycx_ai_clients')
+            if registry is None:
+                registry = ClientRegistry(current_app.config)
+                current_app.extensions['sycx_ai_clients'] = registry
+    registry.configure(current_app.config)
+    return registry
+
+
+class AsyncClientRegistry(ClientRegistry):
+    """
+    asyncio counterpart of ClientRegistry for the ASGI serving mode.
+
+    Holds AsyncOpenAI clients, Gemini clients (used through `.aio`) and a
+    plain httpx.AsyncClient for Unsplash and Cloudinary. Async connection
+    pools belong to the event loop that created them, so there is one
+    registry per loop; aclose_all() must run on that loop.
+    """
+
+    def _timeout(self):
+        return httpx.Timeout(self.settings['timeout'], connect=self.settings['connect_timeout'])
+
+    def _close(self, entry):
+        closer = entry[2]
+        try:
+            result = closer() if closer else None
+            if inspect.isawaitable(result):
+                asyncio.get_running_loop().create_task(result)
+        except Exception as e:
+            logging.warning(f"Error closing AI client: {str(e)}")
+
+    def _retire(self, entry):
+        # Async closers need the loop and a finalizer cannot await them;
+        # the replaced client's connections are dropped when it is collected
+        pass
+
+    def openai(self, key, base_url=None, name='openai'):
+        def factory():
+            from openai import AsyncOpenAI
+
+            http_client = httpx.AsyncClient(limits=self._limits(), timeout=self._timeout())
+            client = AsyncOpenAI(
+                api_key=key,
+                base_url=base_url,
+                http_client=http_client,
+                max_retries=self.settings['max_retries'],
+            )
+            return client, http_client.aclose
+        return self._get(name, key, base_url, factory)
+
+    def gemini(self, key, name='gemini'):
+        def factory():
+            from google import genai
+            from google.genai import types as genai_types
+
+            client = genai.Client(
+                api_key=key,
+                http_options=genai_types.HttpOptions(
+                    timeout=int(self.settings['timeout'] * 1000),
+                    async_client_args={'limits': self._limits()},
+                ),
+            )
+            return client, getattr(client.aio, 'aclose', None)
+        return self._get(name, key, None, factory)
+
+    def http(self, name='http'):
+        """Shared httpx.AsyncClient for plain HTTP APIs (Unsplash, Cloudinary)."""
+        def factory():
+            client = httpx.AsyncClient(limits=self._limits(), timeout=self._timeout())
+            return client, client.aclose
+        return self._get(name, None, None, factory)
+
+    async def aclose_all(self):
+        with self._lock:
+            entries = list(self._clients.values())
+            self._clients.clear()
+        for _, _, closer in entries:
+            try:
+                result = closer() if closer else None
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logging.warning(f"Error closing AI client: {str(e)}")
+
+
+def get_async_client_registry():
+    """Return the AsyncClientRegistry of the current app for the running event loop."""
+    loop = asyncio.get_running_loop()
+    registries = current_app.extensions.get('sycx_async_ai_clients')
+    if registries is None:
+        with _registry_lock:
+            registries = current_app.extensions.setdefault('sycx_async_ai_clients', weakref.WeakKeyDictionary())
+    registry = registries.get(loop)
+    if registry is None:
+        registry = registries.setdefault(loop, AsyncClientRegistry(current_app.config))
+    registry.configure(current_app.config)
+    return registry
+
+
+async def aclose_async_clients():
+    """Close the async clients bound to the running loop (ASGI lifespan shutdown)."""
+    registries = current_app.extensions.get('sycx_async_ai_clients')
+    registry = registries.pop(asyncio.get_running_loop(), None) if registries is not None else None
+    if registry is not None:
+        await registry.aclose_all()
@@ -1,16 +1,133 @@
+import time
+import asyncio
 import logging
+import threading
+import weakref
+from functools import partial
+from contextlib import contextmanager, asynccontextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from flask import current_app
-from google import genai
-from openai import OpenAI
+from app.utils.ai_clients import get_client_registry, get_async_client_registry
+from app.utils.provider_stats import get_provider_stats
+from app.utils.helpers import with_app_context, run_in_thread
+from app.utils.metrics import observe_provider, observe_stage
+from app.utils.text_chunker import estimate_tokens
 
 # Custom Exceptions
 class AIProviderError(Exception):
     pass
 
+# Shared by every router in the worker; created on first hedged call
+_hedge_lock = threading.Lock()
+_hedge_pool = None
+_hedge_budget = None
+
+
+def _get_hedge_resources():
+    global _hedge_pool, _hedge_budget
+    if _hedge_pool is None:
+        with _hedge_lock:
+            if _hedge_pool is None:
+                config = current_app.config
+                _hedge_budget = threading.BoundedSemaphore(config.get('AI_HEDGE_BUDGET', 4))
+                _hedge_pool = ThreadPoolExecutor(
+                    max_workers=config.get('AI_HEDGE_MAX_WORKERS', 32),
+                    thread_name_prefix='sycx-hedge'
+                )
+    return _hedge_pool, _hedge_budget
+
+
+_slots_lock = threading.Lock()
+_provider_slots = None
+
+
+def _get_provider_slots():
+    """
+    Worker-wide cap on in-flight provider calls (AI_MAX_CONCURRENCY), so a
+    batch of documents queues for the providers instead of flooding them.
+    """
+    global _provider_slots
+    if _provider_slots is None:
+        with _slots_lock:
+            if _provider_slots is None:
+                limit = current_app.config.get('AI_MAX_CONCURRENCY', 0)
+                _provider_slots = threading.BoundedSemaphore(limit) if limit > 0 else nullcontext()
+    return _provider_slots
+
+
+@contextmanager
+def _provider_slot():
+    slots = _get_provider_slots()
+    started = time.perf_counter()
+    with slots:
+        observe_stage('llm_queue', time.perf_counter() - started)
+        yield
+
+
+# asyncio.Semaphore per event loop, for the ASGI serving mode
+_async_slots = weakref.WeakKeyDictionary()
+
+
+class _NoAsyncLimit:
+    """`async with` no-op for an unlimited AI_ASYNC_MAX_CONCURRENCY (nullcontext is sync-only before 3.10)."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@asynccontextmanager
+async def _async_provider_slot():
+    """
+    Event-loop cap on in-flight provider calls (AI_ASYNC_MAX_CONCURRENCY).
+    Waiting costs no thread, so it can be far higher than AI_MAX_CONCURRENCY.
+    """
+    loop = asyncio.get_running_loop()
+    slots = _async_slots.get(loop)
+    if slots is None:
+        limit = current_app.config.get('AI_ASYNC_MAX_CONCURRENCY', 200)
+        slots = _async_slots.setdefault(loop, asyncio.Semaphore(limit) if limit > 0 else _NoAsyncLimit())
+    started = time.perf_counter()
+    async with slots:
+        observe_stage('llm_queue', time.perf_counter() - started)
+        yield
+
+
+def parse_token_budgets(spec):
+    """Parse AI_TOKEN_BUDGETS, e.g. "gemini=100000,openai=30000", into {prefix: tokens}."""
+    budgets = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        name, value = item.split('=', 1)
+        try:
+            budgets[name.strip()] = int(value)
+        except ValueError:
+            logging.warning(f"Ignoring malformed token budget: {item!r}")
+    return budgets
+
+
+def _record_attempt(stats, name, seconds, ok, error=None):
+    """Feed one provider/model attempt to the router stats and metrics."""
+    stats.record(name, seconds, ok, error)
+    observe_provider(name, seconds, ok)
+
 class AIRouter:
-    def __init__(self):
-        # Clients are not initialised here because current_app may not be ready
-        pass
+    def __init__(self, providers=None):
+        # Clients are not initialised here because current_app may not be ready.
+        # They live in the app's ClientRegistry and are shared across routers.
+        #
+        # `providers` overrides the configured providers, e.g. with local stubs:
+        # [{'name': 'stub', 'func': fn(prompt, key, json_mode=False), 'key': None}]
+        # An optional 'stream': fn(prompt, key) -> iterator of text pieces
+        # enables token streaming for that provider, and an optional
+        # 'afunc': async fn(prompt, key, json_mode=False) serves
+        # agenerate_content without a thread.
+        self._static_providers = providers
+        self._providers = None
+        self._providers_key = None
 
     # ---------------------------------------------------------------------------
     # HuggingFace Inference Router — OpenAI-compatible endpoint:
@@ -24,7 +141,8 @@ class AIRouter:
     # NOTE: ":hf-inference" is now CPU-only (BERT/GPT-2 era models) and does NOT
     # support modern instruct LLMs.  Use :fastest for free-tier chat completions.
     #
-    # Tried in order; first successful response wins.
+    # Each model is routed as its own candidate ("huggingface/<model>") so
+    # it gets its own latency statistics and circuit breaker.
     # ---------------------------------------------------------------------------
     HF_ROUTER_BASE = "https://router.huggingface.co/v1"
 
@@ -41,6 +159,18 @@ class AIRouter:
     # ------------------------------------------------------------------
 
     def _init_providers(self):
+        if self._static_providers is not None:
+            return self._static_providers
+
+        config = current_app.config
+        providers_key = (
+            config.get('GOOGLE_API_KEY'),
+            config.get('OPENAI_API_KEY'),
+            config.get('HUGGINGFACE_API_KEY'),
+        )
+        if self._providers is not None and self._providers_key == providers_key:
+            return self._providers
+
         providers = []
 
         google_key = current_app.config.get('GOOGLE_API_KEY')
@@ -48,6 +178,8 @@ class AIRouter:
             providers.append({
                 'name': 'gemini',
                 'func': self._generate_with_gemini,
+                'afunc': self._agenerate_with_gemini,
+                'stream': self._stream_with_gemini,
                 'key': google_key
             })
 
@@ -56,24 +188,32 @@ class AIRouter:
             providers.append({
                 'name': 'openai',
                 'func': self._generate_with_openai,
+                'afunc': self._agenerate_with_openai,
+                'stream': self._stream_with_openai,
                 'key': openai_key
             })
 
         hf_key = current_app.config.get('HUGGINGFACE_API_KEY')
         if hf_key:
-            providers.append({
-                'name': 'huggingface',
-                'func': self._generate_with_huggingface,
-                'key': hf_key
-            })
+            for model_id in self.HF_MODELS:
+                providers.append({
+                    'name': f'huggingface/{model_id}',
+                    'func': partial(self._generate_with_huggingface, model=model_id),
+                    'afunc': partial(self._agenerate_with_huggingface, model=model_id),
+                    'stream': partial(self._stream_with_huggingface, model=model_id),
+                    'key': hf_key
+                })
 
+        self._providers = providers
+        self._providers_key = providers_key
         return providers
 
     # ------------------------------------------------------------------
     # Public interface
     # ------------------------------------------------------------------
 
-    def generate_content(self, prompt: str) -> str:
+    def _candidates(self, prompt):
+        """Providers in try order for `prompt`, plus the stats and adaptive flag."""
         providers = self._init_providers()
 
         if not providers:
@@ -82,48 +222,497 @@ class AIRouter:
                 "OPENAI_API_KEY, or HUGGINGFACE_API_KEY."
             )
 
+        stats = get_provider_stats()
+        adaptive = current_app.config.get('AI_ROUTER_ADAPTIVE', True)
+        if adaptive:
+            by_name = {provider['name']: provider for provider in providers}
+            providers = [by_name[name] for name in stats.order(list(by_name))]
+        return self._within_budget(providers, prompt), stats, adaptive
+
+    def generate_content(self, prompt: str, json_mode: bool = False) -> str:
+        """
+        Generate a completion, falling back across providers.
+
+        Providers are tried cheapest expected latency first, skipping any
+        whose circuit breaker is open (see AI_ROUTER_ADAPTIVE).
+
+        With json_mode=True providers that support it are asked to return a
+        bare JSON object; callers must still validate the result.
+        """
+        providers, stats, adaptive = self._candidates(prompt)
+
+        if current_app.config.get('AI_HEDGING_ENABLED', False) and len(providers) > 1:
+            return self._generate_hedged(providers, prompt, json_mode, adaptive)
+
         errors = []
+        attempted = False
         for provider in providers:
+            if adaptive and not stats.allow(provider['name']):
+                logging.info(f"Skipping {provider['name']}: circuit open")
+                continue
+            attempted = True
             try:
-                logging.info(f"Attempting generation with: {provider['name']}")
-                result = provider['func'](prompt, provider['key'])
-                if result:
-                    logging.info(f"Success with provider: {provider['name']}")
-                    return result
+                return self._attempt(provider, prompt, json_mode)
             except Exception as e:
-                msg = f"{provider['name']} failed: {str(e)}"
-                logging.warning(msg)
-                errors.append(msg)
+                errors.append(f"{provider['name']} failed: {str(e)}")
+
+        if not attempted:
+            # Every breaker is open; trying is still better than failing outright
+            logging.warning("All provider circuits open, trying every provider")
+            for provider in providers:
+                try:
+                    return self._attempt(provider, prompt, json_mode)
+                except Exception as e:
+                    errors.append(f"{provider['name']} failed: {str(e)}")
 
         logging.error("All AI providers failed. Errors: " + " | ".join(errors))
         raise AIProviderError(
             f"Generation failed across all available providers. Errors: {errors}"
         )
 
+    def _generate_hedged(self, providers, prompt, json_mode, adaptive):
+        """
+        Start the best provider; if it has not answered by its hedge deadline
+        (a latency percentile), race the next one as well. The first valid
+        response wins. Extra in-flight calls are capped worker-wide by
+        AI_HEDGE_BUDGET so hedging cannot multiply spend.
+
+        A provider call that is already running cannot be interrupted, so
+        the budget units taken for hedges are held until every call of the
+        race has finished, winner or not. Losers still waiting for a
+        provider slot see `abandoned` and give up without calling.
+        """
+        pool, budget = _get_hedge_resources()
+        attempt = with_app_context(self._attempt)
+        stats = get_provider_stats()
+        remaining = list(providers)
+        pending = {}
+        errors = []
+        hedge_at = None
+        abandoned = threading.Event()
+        race = {'running': 0, 'held': 0}
+        race_lock = threading.Lock()
+
+        def finished(_):
+            with race_lock:
+                race['running'] -= 1
+                held = race['held'] if race['running'] == 0 else 0
+                race['held'] -= held
+            for _ in range(held):
+                budget.release()
+
+        def launch_next(is_hedge):
+            while remaining:
+                provider = remaining.pop(0)
+                if adaptive and not stats.allow(provider['name']):
+                    logging.info(f"Skipping {provider['name']}: circuit open")
+                    continue
+                with race_lock:
+                    race['running'] += 1
+                    race['held'] += 1 if is_hedge else 0
+                if is_hedge:
+                    logging.info(f"Hedging with {provider['name']}")
+                future = pool.submit(attempt, provider, prompt, json_mode, abandoned)
+                future.add_done_callback(finished)
+                pending[future] = provider
+                return time.monotonic() + self._hedge_delay(provider['name'])
+            return None
+
+        hedge_at = launch_next(is_hedge=False)
+        if hedge_at is None:
+            # Every breaker is open; fall back to the plain sequential path
+            remaining, adaptive = list(providers), False
+            hedge_at = launch_next(is_hedge=False)
+
+        while pending:
+            timeout = None
+            if remaining and hedge_at is not None:
+                timeout = max(0.0, hedge_at - time.monotonic())
+
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(f"{provider['name']} failed: {str(e)}")
+                    continue
+                abandoned.set()
+                for loser in pending:
+                    loser.cancel()
+                return result
+
+            if not done:
+                # Deadline passed: hedge only if the budget allows it
+                if budget.acquire(blocking=False):
+                    hedge_at = launch_next(is_hedge=True)
+                    if hedge_at is None:
+                        budget.release()
+                else:
+                    hedge_at = None
+            elif not pending:
+                hedge_at = launch_next(is_hedge=False)
+
+        logging.error("All AI providers failed. Errors: " + " | ".join(errors))
+        raise AIProviderError(
+            f"Generation failed across all available providers. Errors: {errors}"
+        )
+
+    def _hedge_delay(self, name):
+        """Seconds to wait on `name` before racing the next provider."""
+        config = current_app.config
+        delay = None
+        stats = get_provider_stats()
+        if stats.sample_count(name) >= config.get('AI_HEDGE_MIN_SAMPLES', 10):
+            delay = stats.percentile(name, config.get('AI_HEDGE_PERCENTILE', 95))
+        if delay is None:
+            delay = config.get('AI_HEDGE_DEFAULT_DELAY', 10.0)
+        return max(delay, config.get('AI_HEDGE_MIN_DELAY', 1.0))
+
+    async def agenerate_content(self, prompt: str, json_mode: bool = False) -> str:
+        """
+        asyncio form of generate_content for the ASGI serving mode.
+
+        Same ordering, circuit breakers, budgets and hedging. Providers with
+        an 'afunc' are awaited on the event loop through the async clients;
+        any others run on a thread.
+        """
+        providers, stats, adaptive = self._candidates(prompt)
+
+        if current_app.config.get('AI_HEDGING_ENABLED', False) and len(providers) > 1:
+            return await self._agenerate_hedged(providers, prompt, json_mode, adaptive)
+
+        errors = []
+        attempted = False
+        for provider in providers:
+            if adaptive and not stats.allow(provider['name']):
+                logging.info(f"Skipping {provider['name']}: circuit open")
+                continue
+            attempted = True
+            try:
+                return await self._aattempt(provider, prompt, json_mode)
+            except Exception as e:
+                errors.append(f"{provider['name']} failed: {str(e)}")
+
+        if not attempted:
+            logging.warning("All provider circuits open, trying every provider")
+            for provider in providers:
+                try:
+                    return await self._aattempt(provider, prompt, json_mode)
+                except Exception as e:
+                    errors.append(f"{provider['name']} failed: {str(e)}")
+
+        logging.error("All AI providers failed. Errors: " + " | ".join(errors))
+        raise AIProviderError(
+            f"Generation failed across all available providers. Errors: {errors}"
+        )
+
+    async def _agenerate_hedged(self, providers, prompt, json_mode, adaptive):
+        """_generate_hedged on the event loop; losing calls are cancelled, not abandoned."""
+        _, budget = _get_hedge_resources()
+        stats = get_provider_stats()
+        remaining = list(providers)
+        pending = {}
+        errors = []
+
+        def launch_next(is_hedge):
+            while remaining:
+                provider = remaining.pop(0)
+                if adaptive and not stats.allow(provider['name']):
+                    logging.info(f"Skipping {provider['name']}: circuit open")
+                    continue
+                task = asyncio.ensure_future(self._aattempt(provider, prompt, json_mode))
+                if is_hedge:
+                    logging.info(f"Hedging with {provider['name']}")
+                    task.add_done_callback(lambda _: budget.release())
+                pending[task] = provider
+                return time.monotonic() + self._hedge_delay(provider['name'])
+            return None
+
+        hedge_at = launch_next(is_hedge=False)
+        if hedge_at is None:
+            remaining, adaptive = list(providers), False
+            hedge_at = launch_next(is_hedge=False)
+
+        try:
+            while pending:
+                timeout = None
+                if remaining and hedge_at is not None:
+                    timeout = max(0.0, hedge_at - time.monotonic())
+
+                done, _ = await asyncio.wait(list(pending), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        return task.result()
+                    except Exception as e:
+                        errors.append(f"{provider['name']} failed: {str(e)}")
+
+                if not done:
+                    if budget.acquire(blocking=False):
+                        hedge_at = launch_next(is_hedge=True)
+                        if hedge_at is None:
+                            budget.release()
+                    else:
+                        hedge_at = None
+                elif not pending:
+                    hedge_at = launch_next(is_hedge=False)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        logging.error("All AI providers failed. Errors: " + " | ".join(errors))
+        raise AIProviderError(
+            f"Generation failed across all available providers. Errors: {errors}"
+        )
+
+    def stream_content(self, prompt: str):
+        """
+        Yield text pieces of a completion as the provider produces them.
+
+        Providers are ordered and skipped exactly as in generate_content,
+        including trying every provider when all circuits are open. A
+        provider that fails before its first token falls back to the next
+        one; once tokens have been yielded a failure is raised to the caller,
+        since the partial output cannot be retracted. Providers without a
+        'stream' function yield their full response as a single piece.
+        """
+        providers, stats, adaptive = self._candidates(prompt)
+
+        errors = []
+        attempted = False
+        for provider in providers:
+            if adaptive and not stats.allow(provider['name']):
+                logging.info(f"Skipping {provider['name']}: circuit open")
+                continue
+            attempted = True
+            if (yield from self._stream_attempt(provider, prompt, stats, errors)):
+                return
+
+        if not attempted:
+            logging.warning("All provider circuits open, trying every provider")
+            for provider in providers:
+                if (yield from self._stream_attempt(provider, prompt, stats, errors)):
+                    return
+
+        logging.error("All AI providers failed to stream. Errors: " + " | ".join(errors))
+        raise AIProviderError(
+            f"Streaming failed across all available providers. Errors: {errors}"
+        )
+
+    def _stream_attempt(self, provider, prompt, stats, errors):
+        """
+        Stream one provider, returning True once it has finished. A failure
+        before the first piece is added to `errors` and returns False.
+
+        The provider slot is held only while waiting on the provider, never
+        across a yield, so a slow consumer does not keep an
+        AI_MAX_CONCURRENCY slot for the whole download.
+        """
+        received = False
+        elapsed = 0.0
+
+        def produce():
+            stream = provider.get('stream')
+            if stream:
+                yield from stream(prompt, provider['key'])
+            else:
+                yield provider['func'](prompt, provider['key'])
+
+        pieces = produce()
+
+        def pull():
+            nonlocal elapsed
+            started = time.perf_counter()
+            try:
+                return next(pieces, None)
+            finally:
+                elapsed += time.perf_counter() - started
+
+        logging.info(f"Attempting streaming generation with: {provider['name']}")
+        try:
+            with _provider_slot():
+                piece = pull()
+            slots = _get_provider_slots()
+            while piece is not None:
+                if piece:
+                    received = True
+                    yield piece
+                with slots:
+                    piece = pull()
+            if not received:
+                raise AIProviderError("empty response")
+        except Exception as e:
+            _record_attempt(stats, provider['name'], elapsed, False, str(e))
+            logging.warning(f"{provider['name']} stream failed: {str(e)}")
+            if received:
+                raise AIProviderError(f"{provider['name']} failed mid-stream: {str(e)}")
+            errors.append(f"{provider['name']} failed: {str(e)}")
+            return False
+        finally:
+            pieces.close()
+
+        _record_attempt(stats, provider['name'], elapsed, True)
+        logging.info(f"Streamed successfully with provider: {provider['name']}")
+        return True
+
+    def token_budget(self):
+        """
+        Largest prompt, in estimated tokens, that at least one configured
+        provider accepts; None when no provider has a budget set.
+        """
+        budgets = parse_token_budgets(current_app.config.get('AI_TOKEN_BUDGETS', ''))
+        limits = [self._budget_for(provider['name'], budgets) for provider in self._init_providers()]
+        if not limits or None in limits:
+            return None
+        return max(limits)
+
+    @staticmethod
+    def _budget_for(name, budgets):
+        # Longest matching prefix wins, so "huggingface/meta-llama" can override "huggingface"
+        matches = [prefix for prefix in budgets if name.startswith(prefix)]
+        return budgets[max(matches, key=len)] if matches else None
+
+    def _within_budget(self, providers, prompt):
+        """
+        Drop providers whose AI_TOKEN_BUDGETS entry is smaller than the
+        prompt. Skipping is not a failure, so circuit stats are untouched.
+        """
+        budgets = parse_token_budgets(current_app.config.get('AI_TOKEN_BUDGETS', ''))
+        if not budgets:
+            return providers
+        tokens = estimate_tokens(prompt)
+        fitting = []
+        for provider in providers:
+            budget = self._budget_for(provider['name'], budgets)
+            if budget is not None and tokens > budget:
+                logging.info(f"Skipping {provider['name']}: prompt of ~{tokens} tokens exceeds its {budget} token budget")
+                continue
+            fitting.append(provider)
+        if not fitting:
+            raise AIProviderError(f"Prompt of ~{tokens} tokens exceeds the token budget of every provider")
+        return fitting
+
+    def provider_stats(self):
+        """Latency, error and circuit state per provider/model in this worker."""
+        return get_provider_stats().snapshot()
+
+    def _attempt(self, provider, prompt, json_mode, abandoned=None):
+        """
+        Run one provider call, recording its latency and outcome. A hedged
+        call whose race was already won (`abandoned` set) is skipped, and a
+        successful one sets `abandoned` for the rest of its race.
+        """
+        stats = get_provider_stats()
+        with _provider_slot():
+            if abandoned is not None and abandoned.is_set():
+                raise AIProviderError("abandoned: another provider already answered")
+            started = time.perf_counter()
+            logging.info(f"Attempting generation with: {provider['name']}")
+            try:
+                result = provider['func'](prompt, provider['key'], json_mode=json_mode)
+                if not result or not result.strip():
+                    raise AIProviderError("empty response")
+            except Exception as e:
+                _record_attempt(stats, provider['name'], time.perf_counter() - started, False, str(e))
+                logging.warning(f"{provider['name']} failed: {str(e)}")
+                raise
+
+            _record_attempt(stats, provider['name'], time.perf_counter() - started, True)
+            if abandoned is not None:
+                # Mark the race won before the slot is freed, so a loser
+                # queued for it gives up instead of calling its provider
+                abandoned.set()
+        logging.info(f"Success with provider: {provider['name']}")
+        return result
+
+    async def _aattempt(self, provider, prompt, json_mode):
+        """_attempt for the event loop, under the async concurrency cap."""
+        stats = get_provider_stats()
+        async with _async_provider_slot():
+            started = time.perf_counter()
+            logging.info(f"Attempting generation with: {provider['name']}")
+            try:
+                afunc = provider.get('afunc')
+                if afunc:
+                    result = await afunc(prompt, provider['key'], json_mode=json_mode)
+                else:
+                    result = await run_in_thread(provider['func'], prompt, provider['key'], json_mode=json_mode)
+                if not result or not result.strip():
+                    raise AIProviderError("empty response")
+            except Exception as e:
+                _record_attempt(stats, provider['name'], time.perf_counter() - started, False, str(e))
+                logging.warning(f"{provider['name']} failed: {str(e)}")
+                raise
+
+            _record_attempt(stats, provider['name'], time.perf_counter() - started, True)
+        logging.info(f"Success with provider: {provider['name']}")
+        return result
+
     # ------------------------------------------------------------------
     # Provider implementations
     # ------------------------------------------------------------------
 
-    def _generate_with_gemini(self, prompt: str, key: str) -> str:
-        client = genai.Client(api_key=key)
-        response = client.models.generate_content(
-            model='gemini-2.0-flash',
-            contents=prompt
-        )
-        return response.text
+    @staticmethod
+    def _openai_base_url():
+        # Lets load tests point the OpenAI provider at a local stub server
+        return current_app.config.get('OPENAI_BASE_URL') or None
 
-    def _generate_with_openai(self, prompt: str, key: str) -> str:
-        client = OpenAI(api_key=key)
-        response = client.chat.completions.create(
+    def _gemini_config(self, json_mode):
+        if not json_mode:
+            return None
+        from google.genai import types as genai_types
+        return genai_types.GenerateContentConfig(response_mime_type='application/json')
+
+    def _openai_request(self, prompt, json_mode):
+        extra = {}
+        if json_mode:
+            extra['response_format'] = {"type": "json_object"}
+        return dict(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": "You are an intelligent assistant."},
                 {"role": "user", "content": prompt}
-            ]
+            ],
+            **extra
+        )
+
+    def _huggingface_request(self, prompt, model_id):
+        return dict(
+            model=model_id,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a helpful AI assistant."
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            max_tokens=1024,
+            temperature=0.5,
+            timeout=current_app.config.get('AI_HF_TIMEOUT', 90),
         )
+
+    def _generate_with_gemini(self, prompt: str, key: str, json_mode: bool = False) -> str:
+        client = get_client_registry().gemini(key)
+        response = client.models.generate_content(
+            model='gemini-2.0-flash',
+            contents=prompt,
+            config=self._gemini_config(json_mode)
+        )
+        return response.text
+
+    def _generate_with_openai(self, prompt: str, key: str, json_mode: bool = False) -> str:
+        client = get_client_registry().openai(key, base_url=self._openai_base_url())
+        response = client.chat.completions.create(**self._openai_request(prompt, json_mode))
         return response.choices[0].message.content
 
-    def _generate_with_huggingface(self, prompt: str, key: str) -> str:
+    def _generate_with_huggingface(self, prompt: str, key: str, json_mode: bool = False,
+                                   model: str = None) -> str:
         """
         Uses the HuggingFace Inference Router (OpenAI-compatible).
           Base URL : https://router.huggingface.co/v1
@@ -132,47 +721,104 @@ class AIRouter:
                      ":fastest" lets the router pick the best available
                      free-tier backend automatically.
 
-        Iterates through HF_MODELS until one succeeds.
+        Calls a single HF_MODELS entry; generate_content routes across models.
+        json_mode is accepted for interface parity only; router backends vary
+        in JSON support so the prompt itself has to ask for JSON.
         """
-        client = OpenAI(
+        model_id = model or self.HF_MODELS[0]
+        client = get_client_registry().openai(
+            key,
             base_url=self.HF_ROUTER_BASE,
-            api_key=key,
+            name='huggingface'
         )
 
-        last_error = None
+        logging.info(f"HuggingFace router: trying '{model_id}'")
+        response = client.chat.completions.create(**self._huggingface_request(prompt, model_id))
+        text = response.choices[0].message.content
+        if not text or not text.strip():
+            raise AIProviderError(f"{model_id} returned empty content")
 
-        for model_id in self.HF_MODELS:
-            try:
-                logging.info(f"HuggingFace router: trying '{model_id}'")
-                response = client.chat.completions.create(
-                    model=model_id,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "You are a helpful AI assistant."
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    max_tokens=1024,
-                    temperature=0.5,
-                    timeout=90,
-                )
-                text = response.choices[0].message.content
-                if text and text.strip():
-                    logging.info(f"HuggingFace router: success with '{model_id}'")
-                    return text.strip()
+        return text.strip()
 
-                last_error = f"{model_id} returned empty content"
-                logging.warning(f"HuggingFace router: {last_error}")
+    # ------------------------------------------------------------------
+    # Async provider implementations (ASGI serving mode)
+    # ------------------------------------------------------------------
 
-            except Exception as e:
-                last_error = f"{model_id} raised: {str(e)}"
-                logging.warning(f"HuggingFace router: {last_error}")
-                continue
+    async def _agenerate_with_gemini(self, prompt: str, key: str, json_mode: bool = False) -> str:
+        client = get_async_client_registry().gemini(key)
+        response = await client.aio.models.generate_content(
+            model='gemini-2.0-flash',
+            contents=prompt,
+            config=self._gemini_config(json_mode)
+        )
+        return response.text
 
-        raise Exception(
-            f"All HuggingFace models failed. Last error: {last_error}"
-        )
\ No newline at end of file
+    async def _agenerate_with_openai(self, prompt: str, key: str, json_mode: bool = False) -> str:
+        client = get_async_client_registry().openai(key, base_url=self._openai_base_url())
+        response = await client.chat.completions.create(**self._openai_request(prompt, json_mode))
+        return response.choices[0].message.content
+
+    async def _agenerate_with_huggingface(self, prompt: str, key: str, json_mode: bool = False,
+                                          model: str = None) -> str:
+        model_id = model or self.HF_MODELS[0]
+        client = get_async_client_registry().openai(
+            key,
+            base_url=self.HF_ROUTER_BASE,
+            name='huggingface'
+        )
+
+        logging.info(f"HuggingFace router: trying '{model_id}'")
+        response = await client.chat.completions.create(**self._huggingface_request(prompt, model_id))
+        text = response.choices[0].message.content
+        if not text or not text.strip():
+            raise AIProviderError(f"{model_id} returned empty content")
+
+        return text.strip()
+
+    # ------------------------------------------------------------------
+    # Streaming provider implementations
+    # ------------------------------------------------------------------
+
+    def _stream_with_gemini(self, prompt: str, key: str):
+        client = get_client_registry().gemini(key)
+        for chunk in client.models.generate_content_stream(
+            model='gemini-2.0-flash',
+            contents=prompt
+        ):
+            yield chunk.text
+
+    def _stream_with_openai(self, prompt: str, key: str):
+        client = get_client_registry().openai(key, base_url=self._openai_base_url())
+        stream = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": "You are an intelligent assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content
+
+    def _stream_with_huggingface(self, prompt: str, key: str, model: str = None):
+        model_id = model or self.HF_MODELS[0]
+        client = get_client_registry().openai(
+            key,
+            base_url=self.HF_ROUTER_BASE,
+            name='huggingface'
+        )
+        stream = client.chat.completions.create(
+            model=model_id,
+            messages=[
+                {"role": "system", "content": "You are a helpful AI assistant."},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1024,
+            temperature=0.5,
+            timeout=current_app.config.get('AI_HF_TIMEOUT', 90),
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content
@@ -0,0 +1,182 @@
+import time
+import asyncio
+import logging
+from flask import current_app
+from app.utils.cache import document_cache
+from app.utils.file_processor import FileProcessor, DEFAULT_TITLE, extract_document, extraction_options
+from app.utils.helpers import run_in_thread
+from app.utils.images import image_service
+from app.utils.metrics import stage
+from app.utils.offload import offload
+from app.utils.stage_graph import parse_timeouts
+from app.utils.text_chunker import TextChunker, estimate_tokens
+
+
+class AsyncFileProcessor(FileProcessor):
+    """
+    FileProcessor for the ASGI serving mode.
+
+    Same DAG, prompts and caches as process_file, but every provider call is
+    awaited through AIRouter.agenerate_content, so a worker holds hundreds of
+    documents in flight on one event loop. Extraction runs on the offload
+    process pool, cache reads and writes on threads.
+    """
+
+    async def aprocess_file(self, source, file_type, summary_depth=2.0):
+        """process_file on the event loop; 'image' in the result is an asyncio Task."""
+        extracted = await self._aextract_stage(source, file_type, summary_depth)
+        image = None
+        if not current_app.config.get('AI_STRUCTURED_OUTPUT', True):
+            image = asyncio.ensure_future(image_service.aget_image(self._image_query(extracted[0])))
+        try:
+            source_text, stats, config = await self._acondense_stage(extracted)
+            draft = await self._adraft_stage(source_text, stats, config, summary_depth)
+            if image is None:
+                image = asyncio.ensure_future(image_service.aget_image(self._image_query(extracted[0], draft)))
+            title, markers = await asyncio.gather(
+                self._optional('title', self._atitle_stage(draft), DEFAULT_TITLE),
+                self._optional('markers', self._amarkers_stage(draft), [])
+            )
+            display_format = await run_in_thread(self._display_stage, draft, markers)
+        except BaseException:
+            if image is not None:
+                image.cancel()
+            raise
+
+        return {
+            'summary': draft['summary'],
+            'title': title,
+            'display_format': display_format,
+            'stats': stats,
+            'image': image
+        }
+
+    async def _optional(self, name, coroutine, default):
+        """Await an optional stage under its STAGE_TIMEOUTS entry, using `default` on failure."""
+        config = current_app.config
+        timeout = parse_timeouts(config.get('STAGE_TIMEOUTS', '')).get(name, config.get('STAGE_TIMEOUT_DEFAULT') or None)
+        try:
+            return await asyncio.wait_for(coroutine, timeout)
+        except Exception as e:
+            logging.warning(f"Optional stage '{name}' failed, using default: {type(e).__name__} {str(e)}")
+            return default
+
+    async def _aextract_stage(self, source, file_type, summary_depth):
+        document_key = self._document_key(source, file_type)
+        started = time.perf_counter()
+        cached = await run_in_thread(self._cached_text, document_key, started)
+        if cached:
+            text_content, stats = cached
+        else:
+            options = extraction_options(current_app.config)
+            # The offload pool is the parallelism; no nested page pools
+            options['workers'] = 1
+            # Spooled uploads are read from disk by the worker, not pickled
+            payload = bytes(source) if isinstance(source, (bytes, bytearray)) else source.path or source.read()
+            with stage('offload_extract', size=getattr(source, 'size', None)):
+                text_content, stats = await offload(extract_document, payload, file_type, options)
+            text_content, stats = await run_in_thread(self._extracted, text_content, stats, started, document_key)
+        config = self._optimize_length_params(len(text_content.split()), summary_depth)
+        return text_content, stats, config, document_key
+
+    async def _acondense_stage(self, extracted):
+        text_content, extraction_stats, config, document_key = extracted
+        source_text, stats = await self._acondense_source(text_content, document_key)
+        stats.update(extraction_stats)
+        return source_text, stats, config
+
+    async def _acondense_source(self, text_content, document_key=None):
+        """_condense_source with the map step awaited concurrently."""
+        limit = self._condense_limit()
+        if document_key:
+            cached = await run_in_thread(document_cache.get_condensed, document_key, limit)
+            if cached:
+                logging.info(f"Reusing {cached['stats']['chunk_count']} partial summaries from the document cache")
+                return cached['source'], cached['stats']
+
+        stats = {'chunk_count': 0, 'chunk_timings': [], 'map_passes': 0}
+        source = text_content
+
+        while estimate_tokens(source) > limit and stats['map_passes'] < 3:
+            chunks = TextChunker(limit).split(source)
+            if len(chunks) <= 1:
+                break
+
+            started = time.perf_counter()
+            partials, timings = await self._amap_chunks(chunks)
+            stats['map_passes'] += 1
+            stats['chunk_count'] += len(chunks)
+            stats['chunk_timings'].extend(timings)
+            logging.info(
+                f"Map pass {stats['map_passes']}: {len(chunks)} chunks in "
+                f"{time.perf_counter() - started:.2f}s"
+            )
+            source = "\n\n".join(partials)
+
+        stats['chunk_count'] = stats['chunk_count'] or 1
+        if document_key and stats['map_passes']:
+            await run_in_thread(document_cache.set_condensed, document_key, limit, source, stats)
+        return source, stats
+
+    async def _amap_chunks(self, chunks):
+        # SUMMARY_MAX_WORKERS still bounds one document's share of the providers
+        limit = asyncio.Semaphore(max(1, current_app.config.get('SUMMARY_MAX_WORKERS', 4)))
+        total = len(chunks)
+
+        async def summarize(index, chunk):
+            async with limit:
+                return await self._asummarize_chunk(index, total, chunk)
+
+        results = await asyncio.gather(*(summarize(index, chunk) for index, chunk in enumerate(chunks, start=1)))
+        partials = [text for text, _ in results if text]
+        timings = [round(seconds, 3) for _, seconds in results]
+        return partials, timings
+
+    async def _asummarize_chunk(self, index, total, chunk):
+        started = time.perf_counter()
+        target = self._partial_target(chunk)
+        cached = await run_in_thread(document_cache.get_chunk, chunk, target)
+        if cached:
+            return cached, time.perf_counter() - started
+
+        text = (await self.router.agenerate_content(self._chunk_prompt(index, total, target, chunk)) or '').strip()
+        if text:
+            await run_in_thread(document_cache.set_chunk, chunk, target, text)
+        return text, time.perf_counter() - started
+
+    async def _adraft_stage(self, source_text, stats, config, summary_depth):
+        if current_app.config.get('AI_STRUCTURED_OUTPUT', True):
+            logging.info("Starting single-call structured summarization")
+            response_text = await self.router.agenerate_content(
+                self._structured_prompt(source_text, summary_depth, config, stats),
+                json_mode=True
+            )
+            result = self._structured_result(response_text)
+            if result:
+                return result
+            logging.warning("Structured response failed validation, falling back to multi-call path")
+
+        logging.info("Starting summarization using AIRouter fallback system")
+        summary = await self.router.agenerate_content(self._summary_prompt(source_text, summary_depth, config, stats))
+        if not summary or not summary.strip():
+            raise ValueError("The AI provider returned an empty summary.")
+        return {'summary': summary}
+
+    async def _atitle_stage(self, draft):
+        if draft.get('title'):
+            return draft['title']
+        try:
+            return self._clean_title(await self.router.agenerate_content(self._title_prompt(draft['summary'])))
+        except Exception as e:
+            logging.error(f"Title generation failed: {str(e)}")
+            return DEFAULT_TITLE
+
+    async def _amarkers_stage(self, draft):
+        if 'display_format' in draft or not self._wants_markers(draft['summary']):
+            return []
+        try:
+            response_text = await self.router.agenerate_content(self._markers_prompt(draft['summary']))
+            return [m.strip() for m in response_text.split(',')]
+        except Exception as e:
+            logging.error(f"Section marker generation failed: {str(e)}")
+            return []
@@ -0,0 +1,392 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+from cachetools import TTLCache
+from flask import current_app
+
+DEPTH_BUCKETS = [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def bucket_depth(summary_depth):
+    """Snap a summary depth onto the discrete levels the prompts understand."""
+    return min(DEPTH_BUCKETS, key=lambda x: abs(x - float(summary_depth)))
+
+
+def hash_content(file_content: bytes) -> str:
+    return hashlib.sha256(file_content).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Backends
+#
+# Every backend stores JSON-serialisable dicts under string keys and exposes
+# the same get / set / delete / clear interface, so they can be stacked.
+# ---------------------------------------------------------------------------
+
+def _json_size(value):
+    return len(json.dumps(value))
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU with per-entry TTL. Local to a single gunicorn worker.
+
+    With `max_bytes` the bound is the total JSON size of the entries rather
+    than their count; values larger than the whole budget are not cached.
+    """
+
+    def __init__(self, max_entries=512, ttl=3600, max_bytes=None):
+        if max_bytes:
+            self._cache = TTLCache(maxsize=max_bytes, ttl=ttl, getsizeof=_json_size)
+        else:
+            self._cache = TTLCache(maxsize=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            try:
+                self._cache[key] = value
+            except ValueError:
+                # Larger than the whole byte budget
+                self._cache.pop(key, None)
+
+    def delete(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+class SQLiteCacheBackend:
+    """
+    On-disk cache shared by every worker on the same host.
+
+    Entries expire after `ttl` seconds; once the table grows past
+    `max_entries` rows (or `max_bytes` of stored JSON, when set) the least
+    recently read rows are evicted.
+    """
+
+    def __init__(self, path, table='cache', max_entries=10000, ttl=86400, max_bytes=None):
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_accessed "
+            f"ON {self.table} (accessed_at)"
+        )
+        conn.commit()
+
+    def _connect(self):
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, expires_at = row
+        if expires_at < now:
+            self.delete(key)
+            return None
+
+        conn.execute(
+            f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        conn.commit()
+        return json.loads(value)
+
+    def set(self, key, value):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now + self.ttl, now)
+        )
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+        conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        if self.max_bytes:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM (SELECT key, SUM(LENGTH(value)) OVER "
+                f"(ORDER BY accessed_at DESC, key ROWS UNBOUNDED PRECEDING) AS running "
+                f"FROM {self.table}) WHERE running > ?)",
+                (self.max_bytes,)
+            )
+        conn.commit()
+
+    def delete(self, key):
+        conn = self._connect()
+        conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        conn.commit()
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute(f"DELETE FROM {self.table}")
+        conn.commit()
+
+
+class TieredCacheBackend:
+    """Memory tier in front of a shared tier; shared hits are promoted."""
+
+    def __init__(self, front, back):
+        self.front = front
+        self.back = back
+
+    def get(self, key):
+        value = self.front.get(key)
+        if value is not None:
+            return value
+        value = self.back.get(key)
+        if value is not None:
+            self.front.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.front.set(key, value)
+        self.back.set(key, value)
+
+    def delete(self, key):
+        self.front.delete(key)
+        self.back.delete(key)
+
+    def clear(self):
+        self.front.clear()
+        self.back.clear()
+
+
+def build_cache_backend(kind, path, table, max_entries, ttl, memory_bytes=None, disk_bytes=None):
+    """
+    Build a backend by name: 'memory', 'sqlite', 'tiered' or 'none'.
+    `memory_bytes` / `disk_bytes` optionally bound each tier by size.
+    """
+    kind = (kind or 'none').lower()
+    if kind == 'memory':
+        return MemoryCacheBackend(max_entries=max_entries, ttl=ttl, max_bytes=memory_bytes)
+    if kind == 'sqlite':
+        return SQLiteCacheBackend(path, table=table, max_entries=max_entries, ttl=ttl, max_bytes=disk_bytes)
+    if kind == 'tiered':
+        return TieredCacheBackend(
+            MemoryCacheBackend(max_entries=max_entries, ttl=ttl, max_bytes=memory_bytes),
+            SQLiteCacheBackend(path, table=table, max_entries=max_entries, ttl=ttl, max_bytes=disk_bytes)
+        )
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Summary cache
+# ---------------------------------------------------------------------------
+
+class SummaryCache:
+    """
+    Content-addressed cache of finished summaries.
+
+    Keyed by the SHA-256 of the uploaded bytes plus the bucketed summary
+    depth, so a repeat upload of the same document returns the stored
+    pdf_url/title without touching the extractor or any LLM provider.
+    """
+
+    def __init__(self):
+        # Backend is created lazily because current_app may not be ready
+        self._backend = None
+        self._initialised = False
+        self._lock = threading.Lock()
+
+    def _get_backend(self):
+        if not self._initialised:
+            with self._lock:
+                if not self._initialised:
+                    config = current_app.config
+                    try:
+                        self._backend = build_cache_backend(
+                            config.get('SUMMARY_CACHE_BACKEND'),
+                            config.get('SUMMARY_CACHE_PATH'),
+                            'summary_cache',
+                            config.get('SUMMARY_CACHE_MAX_ENTRIES', 512),
+                            config.get('SUMMARY_CACHE_TTL', 86400)
+                        )
+                    except Exception as e:
+                        logging.error(f"Summary cache disabled: {str(e)}")
+                        self._backend = None
+                    self._initialised = True
+        return self._backend
+
+    @staticmethod
+    def make_key(file_hash, summary_depth):
+        return f"{file_hash}:{bucket_depth(summary_depth)}"
+
+    def get(self, file_hash, summary_depth):
+        backend = self._get_backend()
+        if backend is None:
+            return None
+        try:
+            return backend.get(self.make_key(file_hash, summary_depth))
+        except Exception as e:
+            logging.warning(f"Summary cache lookup failed: {str(e)}")
+            return None
+
+    def set(self, file_hash, summary_depth, value):
+        backend = self._get_backend()
+        if backend is None:
+            return
+        try:
+            backend.set(self.make_key(file_hash, summary_depth), value)
+        except Exception as e:
+            logging.warning(f"Summary cache write failed: {str(e)}")
+
+    def reset(self):
+        """Drop the backend so it is rebuilt from the current config."""
+        with self._lock:
+            self._backend = None
+            self._initialised = False
+
+summary_cache = SummaryCache()
+
+
+# ---------------------------------------------------------------------------
+# Document cache
+# ---------------------------------------------------------------------------
+
+class DocumentCache:
+    """
+    Intermediate results that do not depend on the summary depth, so a
+    document re-run at another depth skips straight to the reduce call:
+
+    - text:      extracted text and extraction stats per document
+    - chunk:     partial summary per map chunk, keyed by the chunk's hash
+    - condensed: the final map output (reduce input) per document
+
+    Document keys combine the upload hash with the extraction budget, since
+    a different page/character limit yields different text.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._initialised = False
+        self._lock = threading.Lock()
+
+    def _get_backend(self):
+        if not self._initialised:
+            with self._lock:
+                if not self._initialised:
+                    config = current_app.config
+                    try:
+                        self._backend = build_cache_backend(
+                            config.get('DOCUMENT_CACHE_BACKEND'),
+                            config.get('DOCUMENT_CACHE_PATH'),
+                            'document_cache',
+                            config.get('DOCUMENT_CACHE_MAX_ENTRIES', 2000),
+                            config.get('DOCUMENT_CACHE_TTL', 86400),
+                            memory_bytes=config.get('DOCUMENT_CACHE_MEMORY_MB', 64) * 1024 * 1024,
+                            disk_bytes=config.get('DOCUMENT_CACHE_DISK_MB', 1024) * 1024 * 1024
+                        )
+                    except Exception as e:
+                        logging.error(f"Document cache disabled: {str(e)}")
+                        self._backend = None
+                    self._initialised = True
+        return self._backend
+
+    @staticmethod
+    def document_key(file_hash, file_type):
+        """
+        Key for one document under the current extraction settings: page and
+        character budgets, OCR, table profiling and compaction all change
+        the extracted text, so any change to them starts a fresh entry.
+        """
+        from app.utils.file_processor import extraction_options
+
+        options = extraction_options(current_app.config)
+        # Pool sizing and the OCR cache location do not affect the text
+        for name in ('workers', 'parallel_min_pages', 'pages_per_task'):
+            options.pop(name)
+        options['ocr'].pop('cache_path')
+        settings = hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return f"{file_hash}:{file_type}:{settings[:16]}"
+
+    def _get(self, key):
+        backend = self._get_backend()
+        if backend is None:
+            return None
+        try:
+            return backend.get(key)
+        except Exception as e:
+            logging.warning(f"Document cache lookup failed: {str(e)}")
+            return None
+
+    def _set(self, key, value):
+        backend = self._get_backend()
+        if backend is None:
+            return
+        try:
+            backend.set(key, value)
+        except Exception as e:
+            logging.warning(f"Document cache write failed: {str(e)}")
+
+    def get_text(self, document_key):
+        return self._get(f"text:{document_key}")
+
+    def set_text(self, document_key, text, stats):
+        self._set(f"text:{document_key}", {'text': text, 'stats': stats})
+
+    @staticmethod
+    def chunk_key(chunk, target_words):
+        return f"chunk:{hashlib.sha256(chunk.encode('utf-8')).hexdigest()}:{target_words}"
+
+    def get_chunk(self, chunk, target_words):
+        value = self._get(self.chunk_key(chunk, target_words))
+        return value['summary'] if value else None
+
+    def set_chunk(self, chunk, target_words, summary):
+        self._set(self.chunk_key(chunk, target_words), {'summary': summary})
+
+    def get_condensed(self, document_key, chunk_tokens):
+        return self._get(f"condensed:{document_key}:{chunk_tokens}")
+
+    def set_condensed(self, document_key, chunk_tokens, source, stats):
+        self._set(f"condensed:{document_key}:{chunk_tokens}", {'source': source, 'stats': stats})
+
+    def reset(self):
+        with self._lock:
+            self._backend = None
+            self._initialised = False
+
+document_cache = DocumentCache()
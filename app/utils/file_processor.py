@@ -1,15 +1,95 @@
 import os
+import json
 import base64
 import logging
-import nltk
 from app.utils.text_extractor import TextExtractor
 from app.utils.ai_router import AIRouter
+from app.utils.cache import bucket_depth, hash_content, document_cache
+from app.utils.metrics import stage
+from app.utils.images import image_service
+from app.utils.stage_graph import build_graph
+from app.utils.section_segmenter import segment_sections, has_structure
 from flask import current_app
-from PIL import Image
 import re
+import time
 import datetime
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.helpers import with_app_context
+from app.utils.text_chunker import TextChunker, estimate_tokens
+from app.utils.text_compactor import compact_pages
+
+DEFAULT_TITLE = "Academic_Content_Summary"
+
+
+def extraction_options(config):
+    """TextExtractor and compaction settings from the app config, as a picklable dict."""
+    return {
+        'max_pages': config.get('EXTRACT_MAX_PAGES'),
+        'max_chars': config.get('EXTRACT_MAX_CHARS'),
+        'workers': config.get('EXTRACT_WORKERS') or None,
+        'parallel_min_pages': config.get('EXTRACT_PARALLEL_MIN_PAGES', 40),
+        'pages_per_task': config.get('EXTRACT_PAGES_PER_TASK', 10),
+        'ocr': {
+            'enabled': config.get('OCR_ENABLED', True),
+            'dpi': config.get('OCR_DPI'),
+            'min_page_chars': config.get('OCR_MIN_PAGE_CHARS'),
+            'max_side': config.get('OCR_MAX_SIDE'),
+            'tile_height': config.get('OCR_TILE_HEIGHT'),
+            'lang': config.get('OCR_LANG'),
+            'cache_path': config.get('OCR_CACHE_PATH') or None
+        },
+        'table': {
+            'max_chars': config.get('TABLE_PROFILE_MAX_CHARS'),
+            'sample_rows': config.get('TABLE_SAMPLE_ROWS'),
+            'chunk_rows': config.get('TABLE_CHUNK_ROWS'),
+            'max_columns': config.get('TABLE_MAX_COLUMNS')
+        },
+        'compact': {
+            'table_max_rows': config.get('COMPACT_TABLE_MAX_ROWS', 60),
+            'header_min_share': config.get('COMPACT_HEADER_MIN_SHARE', 0.5),
+            'dedupe': config.get('COMPACT_DEDUPE', True)
+        } if config.get('COMPACT_ENABLED', True) else None
+    }
+
+
+def extract_document(source, file_type, options):
+    """
+    Extract and compact the text of `source` (bytes, handle, SpooledUpload
+    or a file path) with extraction_options(); returns (text, stats).
+    Needs no app context, so it can run in a process-pool worker.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as handle:
+            return extract_document(handle, file_type, options)
+
+    extraction = TextExtractor.extract_pages(
+        source,
+        file_type,
+        max_pages=options['max_pages'],
+        max_chars=options['max_chars'],
+        workers=options['workers'],
+        parallel_min_pages=options['parallel_min_pages'],
+        pages_per_task=options['pages_per_task'],
+        ocr=options['ocr'],
+        table=options['table']
+    )
+    compaction = None
+    if options['compact']:
+        text_content, compaction = compact_pages(extraction['pages'], file_type, **options['compact'])
+    else:
+        text_content = "\n\n".join(extraction['pages'])
+    if not text_content or not text_content.strip():
+        raise ValueError(f"Could not extract meaningful text from the {file_type} file.")
+
+    stats = {
+        'page_count': len(extraction['pages']),
+        'page_timings': extraction['page_timings'],
+        'extraction_truncated': extraction['truncated'],
+        'tokens_before_compaction': compaction['tokens_before'] if compaction else estimate_tokens(text_content),
+        'tokens_after_compaction': compaction['tokens_after'] if compaction else estimate_tokens(text_content)
+    }
+    return text_content, stats
 
-nltk.download('punkt', quiet=True)
 
 class FileProcessor:
     def __init__(self):
@@ -23,80 +103,453 @@ class FileProcessor:
             3.0: {'max_ratio': 0.40, 'min_ratio': 0.20, 'title_length': 5},
             4.0: {'max_ratio': 0.60, 'min_ratio': 0.30, 'title_length': 6}
         }
-        depths = list(depth_configs.keys())
-        closest_depth = min(depths, key=lambda x: abs(x - float(summary_depth)))
-        return depth_configs[closest_depth]
+        depth = bucket_depth(summary_depth)
+        config = dict(depth_configs[depth], depth=depth)
 
-    def process_file(self, file_content, file_type, summary_depth=2.0):
-        try:
-            config = self._optimize_length_params(1000, summary_depth)
-
-            logging.info("Starting summarization using AIRouter fallback system")
-            summary = self._generate_summary(file_content, file_type, summary_depth)
+        # Turn the ratios into word targets for a document of text_length words
+        max_words = current_app.config.get('SUMMARY_MAX_WORDS', 2000)
+        config['min_words'] = max(30, min(int(text_length * config['min_ratio']), max_words))
+        config['max_words'] = max(config['min_words'], min(int(text_length * config['max_ratio']), max_words))
+        return config
 
-            if not summary:
-                return None
+    def process_file(self, source, file_type, summary_depth=2.0, on_stage=None):
+        """
+        Run the summarization DAG:
 
-            suggested_title = self._generate_title(summary)
-            display_format = self._force_sections(summary)
+            extract -> condense -> draft -> title   -> display_format
+                                         -> markers ->
+                                         -> image (prefetch)
 
-            return {
-                'summary': summary,
-                'title': suggested_title,
-                'display_format': display_format
-            }
+        `draft` is the single structured call, or the plain summary when
+        structured output is off or fails validation. Title and section
+        markers then run concurrently; both are skipped when the structured
+        draft already has them. The header image is looked up from the
+        draft's image keywords; with AI_STRUCTURED_OUTPUT off there are none,
+        so it is prefetched from the document text right after extraction.
+        """
+        graph = build_graph('summarize')
+        graph.add('extract', lambda: self._extract_stage(source, file_type, summary_depth, on_stage))
+        graph.add('condense', lambda extracted: self._condense_stage(extracted, on_stage),
+                  deps=['extract'])
+        graph.add('draft', lambda condensed: self._draft_stage(condensed, summary_depth),
+                  deps=['condense'])
+        if current_app.config.get('AI_STRUCTURED_OUTPUT', True):
+            graph.add('image', lambda extracted, draft: image_service.prefetch(self._image_query(extracted[0], draft)),
+                      deps=['extract', 'draft'], required=False)
+        else:
+            graph.add('image', lambda extracted: self._prefetch_image(extracted[0]),
+                      deps=['extract'], required=False)
+        graph.add('title', self._title_stage, deps=['draft'],
+                  required=False, default=DEFAULT_TITLE)
+        graph.add('markers', self._markers_stage, deps=['draft'],
+                  required=False, default=[])
+        graph.add('display_format', self._display_stage, deps=['draft', 'markers'])
 
+        try:
+            results = graph.run()
         except Exception as e:
             logging.error(f"File processing error: {str(e)}")
             raise
 
-    def _generate_summary(self, file_content, file_type, summary_depth):
+        return {
+            'summary': results['draft']['summary'],
+            'title': results['title'],
+            'display_format': results['display_format'],
+            'stats': results['condense'][1],
+            'image': results['image']
+        }
+
+    def _extract_stage(self, source, file_type, summary_depth, on_stage):
+        if on_stage:
+            on_stage('extracting')
+        document_key = self._document_key(source, file_type)
+        text_content, extraction_stats = self._extract_text(source, file_type, document_key)
+        config = self._optimize_length_params(len(text_content.split()), summary_depth)
+        return text_content, extraction_stats, config, document_key
+
+    def _condense_stage(self, extracted, on_stage):
+        text_content, extraction_stats, config, document_key = extracted
+        if on_stage:
+            on_stage('summarizing')
+        source_text, stats = self._condense_source(text_content, config, document_key)
+        stats.update(extraction_stats)
+        return source_text, stats, config
+
+    def _draft_stage(self, condensed, summary_depth):
+        source_text, stats, config = condensed
+        if current_app.config.get('AI_STRUCTURED_OUTPUT', True):
+            logging.info("Starting single-call structured summarization")
+            result = self._generate_structured(source_text, summary_depth, config, stats)
+            if result:
+                return result
+            logging.warning("Structured response failed validation, falling back to multi-call path")
+
+        logging.info("Starting summarization using AIRouter fallback system")
+        summary = self._generate_summary(source_text, summary_depth, config, stats)
+        if not summary or not summary.strip():
+            raise ValueError("The AI provider returned an empty summary.")
+        return {'summary': summary}
+
+    def _title_stage(self, draft):
+        return draft.get('title') or self._generate_title(draft['summary'])
+
+    def _markers_stage(self, draft):
+        if 'display_format' in draft:
+            return []
+        return self._section_markers(draft['summary'])
+
+    def _display_stage(self, draft, markers):
+        if 'display_format' in draft:
+            return draft['display_format']
+        summary = draft['summary']
+        return self._build_display_format(self._extract_sections(summary, markers), summary[:500])
+
+    def stream_file(self, source, file_type, summary_depth=2.0):
         """
-        Summarizes the given file content using the unified AIRouter.
+        Streaming variant of process_file.
+
+        Yields (event, data) tuples: ('stage', name) as stages start,
+        ('token', text) while the summary streams from the provider, then
+        ('title', title), ('sections', sections) and finally ('result', dict)
+        with the same shape process_file returns. The summary is streamed as
+        prose, so title and sections come from follow-up calls, which run
+        concurrently.
         """
-        try:
-            # Extract plain text from binary file
-            text_content = TextExtractor.extract(file_content, file_type)
-            if not text_content or not text_content.strip():
-                raise ValueError(f"Could not extract meaningful text from the {file_type} file.")
-
-            depth_prompts = {
-                0.0: "Generate an extremely concise summary in 1-2 sentences.",
-                1.0: "Create a brief summary with key points only.",
-                2.0: "Produce a balanced summary covering main points.",
-                3.0: "Develop a detailed summary of important content.",
-                4.0: "Create comprehensive summary covering nearly all content."
-            }
-
-            closest_depth = min([0.0, 1.0, 2.0, 3.0, 4.0], key=lambda x: abs(x - summary_depth))
-            prompt = f"{depth_prompts[closest_depth]} Analyze this document text. Extract the content into well-defined sections, using clear titles and coherent paragraphs. Completely REMOVE any unnecessary markdown characters, bullet points, numbers or any other formatting symbols. Create well formated contents and subheadings.\n\nDocument Text:\n{text_content}"
+        yield 'stage', 'extracting'
+        extracted = self._extract_stage(source, file_type, summary_depth, None)
+        image = self._prefetch_image(extracted[0])
+
+        yield 'stage', 'summarizing'
+        source_text, stats, config = self._condense_stage(extracted, None)
+        prompt = self._summary_prompt(source_text, summary_depth, config, stats)
+
+        pieces = []
+        for piece in self.router.stream_content(prompt):
+            pieces.append(piece)
+            yield 'token', piece
 
+        summary = ''.join(pieces).strip()
+        if not summary:
+            raise ValueError("The AI provider returned an empty summary.")
+
+        draft = {'summary': summary}
+        graph = build_graph('stream-finish')
+        graph.add('title', lambda: self._title_stage(draft), required=False, default=DEFAULT_TITLE)
+        graph.add('markers', lambda: self._markers_stage(draft), required=False, default=[])
+        graph.add('sections', lambda markers: self._extract_sections(summary, markers), deps=['markers'])
+        results = graph.run()
+
+        yield 'title', results['title']
+        yield 'sections', results['sections']
+
+        yield 'result', {
+            'summary': summary,
+            'title': results['title'],
+            'display_format': self._build_display_format(results['sections'], summary[:500]),
+            'stats': stats,
+            'image': image
+        }
+
+    def _prefetch_image(self, text_content):
+        """
+        Start the header image lookup from the document's own keywords so it
+        runs while the LLM summarizes; create_pdf collects the Future.
+        """
+        return image_service.prefetch(self._image_query(text_content))
+
+    @staticmethod
+    def _image_query(text_content, draft=None):
+        """The structured draft's image keywords, else the start of the document text."""
+        keywords = (draft or {}).get('image_keywords')
+        if keywords:
+            return " ".join(keywords)
+        return text_content[:current_app.config.get('IMAGE_QUERY_SAMPLE_CHARS', 20000)]
+
+    @staticmethod
+    def _document_key(source, file_type):
+        """Document cache key for uploads and raw bytes; None for plain file handles."""
+        if isinstance(source, (bytes, bytearray)):
+            return document_cache.document_key(hash_content(bytes(source)), file_type)
+        file_hash = getattr(source, 'sha256', None)
+        return document_cache.document_key(file_hash, file_type) if file_hash else None
+
+    def _extract_text(self, source, file_type, document_key=None):
+        """
+        Extract plain text from the upload (bytes, handle or SpooledUpload) or fail loudly.
+
+        Returns the text and extraction stats (page count, per-page timings,
+        whether the page/character budget cut the document short). Results
+        are reused from the document cache when `document_key` is given.
+        """
+        started = time.perf_counter()
+        cached = self._cached_text(document_key, started)
+        if cached:
+            return cached
+
+        text_content, stats = extract_document(source, file_type, extraction_options(current_app.config))
+        return self._extracted(text_content, stats, started, document_key)
+
+    def _cached_text(self, document_key, started):
+        cached = document_cache.get_text(document_key) if document_key else None
+        if not cached:
+            return None
+        with stage('extract', size=len(cached['text'])) as record:
+            record.outcome = 'cached'
+        logging.info(f"Reusing extracted text ({len(cached['text'])} chars) from the document cache")
+        return cached['text'], dict(cached['stats'], extraction_seconds=round(time.perf_counter() - started, 3))
+
+    def _extracted(self, text_content, stats, started, document_key):
+        """Log and time a fresh extraction and store it in the document cache."""
+        elapsed = time.perf_counter() - started
+        logging.info(f"Extracted {stats['page_count']} pages ({len(text_content)} chars) in {elapsed:.2f}s")
+        stats = dict(stats, extraction_seconds=round(elapsed, 3))
+        if document_key:
+            document_cache.set_text(document_key, text_content, stats)
+        return text_content, stats
+
+    def _depth_instruction(self, summary_depth):
+        depth_prompts = {
+            0.0: "Generate an extremely concise summary in 1-2 sentences.",
+            1.0: "Create a brief summary with key points only.",
+            2.0: "Produce a balanced summary covering main points.",
+            3.0: "Develop a detailed summary of important content.",
+            4.0: "Create comprehensive summary covering nearly all content."
+        }
+        return depth_prompts[bucket_depth(summary_depth)]
+
+    def _length_instruction(self, config):
+        # Depth 0 asks for 1-2 sentences; a word range would contradict it
+        if config['depth'] == 0.0:
+            return ""
+        return f" Aim for roughly {config['min_words']}-{config['max_words']} words in total."
+
+    def _source_note(self, stats):
+        if not stats['map_passes']:
+            return ""
+        return " The document was too long to read at once, so the text below holds partial summaries of its consecutive parts; merge them into one coherent summary."
+
+    # ------------------------------------------------------------------
+    # Map-reduce for large documents
+    # ------------------------------------------------------------------
+
+    def _condense_source(self, text_content, config, document_key=None):
+        """
+        Map step: if the text is over the per-prompt token budget, summarize
+        it chunk by chunk (repeating on the joined partials if needed) so the
+        final reduce prompt fits. Returns the text to reduce plus stats.
+
+        Partial summaries do not depend on the requested depth, so the map
+        output is cached per document and a re-run at another depth only
+        pays for the reduce call.
+        """
+        limit = self._condense_limit()
+        if document_key:
+            cached = document_cache.get_condensed(document_key, limit)
+            if cached:
+                logging.info(f"Reusing {cached['stats']['chunk_count']} partial summaries from the document cache")
+                return cached['source'], cached['stats']
+
+        stats = {'chunk_count': 0, 'chunk_timings': [], 'map_passes': 0}
+        source = text_content
+
+        while estimate_tokens(source) > limit and stats['map_passes'] < 3:
+            chunks = TextChunker(limit).split(source)
+            if len(chunks) <= 1:
+                break
+
+            started = time.perf_counter()
+            partials, timings = self._map_chunks(chunks)
+            stats['map_passes'] += 1
+            stats['chunk_count'] += len(chunks)
+            stats['chunk_timings'].extend(timings)
+            logging.info(
+                f"Map pass {stats['map_passes']}: {len(chunks)} chunks in "
+                f"{time.perf_counter() - started:.2f}s"
+            )
+            source = "\n\n".join(partials)
+
+        # A document that fit in one prompt counts as a single chunk
+        stats['chunk_count'] = stats['chunk_count'] or 1
+        if document_key and stats['map_passes']:
+            document_cache.set_condensed(document_key, limit, source, stats)
+        return source, stats
+
+    def _condense_limit(self):
+        """Largest source text, in estimated tokens, sent to the reduce prompt."""
+        limit = current_app.config.get('SUMMARY_CHUNK_TOKENS', 6000)
+        budget = self.router.token_budget()
+        if budget is not None:
+            # Leave room for the instructions wrapped around the text
+            limit = max(500, min(limit, budget - current_app.config.get('AI_PROMPT_RESERVE_TOKENS', 1000)))
+        return limit
+
+    def _map_chunks(self, chunks):
+        workers = max(1, min(current_app.config.get('SUMMARY_MAX_WORKERS', 4), len(chunks)))
+        summarize = with_app_context(self._summarize_chunk)
+        total = len(chunks)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sycx-map') as pool:
+            results = list(pool.map(
+                lambda item: summarize(item[0], total, item[1]),
+                enumerate(chunks, start=1)
+            ))
+
+        partials = [text for text, _ in results if text]
+        timings = [round(seconds, 3) for _, seconds in results]
+        return partials, timings
+
+    def _summarize_chunk(self, index, total, chunk):
+        started = time.perf_counter()
+        target = self._partial_target(chunk)
+        cached = document_cache.get_chunk(chunk, target)
+        if cached:
+            return cached, time.perf_counter() - started
+
+        prompt = self._chunk_prompt(index, total, target, chunk)
+        text = (self.router.generate_content(prompt) or '').strip()
+        if text:
+            document_cache.set_chunk(chunk, target, text)
+        return text, time.perf_counter() - started
+
+    @staticmethod
+    def _partial_target(chunk):
+        # Same detail level at every depth so partials can be shared between them
+        ratio = current_app.config.get('SUMMARY_PARTIAL_RATIO', 0.6)
+        return max(80, int(len(chunk.split()) * ratio))
+
+    @staticmethod
+    def _chunk_prompt(index, total, target, chunk):
+        return (
+            f"This is part {index} of {total} of a larger document. Summarize it in about {target} words, "
+            "keeping every key fact, term, name and figure. Respond with plain text only."
+            f"\n\nText:\n{chunk}"
+        )
+
+    # ------------------------------------------------------------------
+    # Reduce / final generation
+    # ------------------------------------------------------------------
+
+    def _generate_summary(self, text_content, summary_depth, config, stats):
+        """
+        Summarizes the given document text using the unified AIRouter.
+        """
+        try:
+            prompt = self._summary_prompt(text_content, summary_depth, config, stats)
             return self.router.generate_content(prompt)
 
         except Exception as e:
             logging.error(f"AI summarization error: {str(e)}")
             raise
 
+    def _summary_prompt(self, text_content, summary_depth, config, stats):
+        return f"{self._depth_instruction(summary_depth)}{self._length_instruction(config)}{self._source_note(stats)} Analyze this document text. Extract the content into well-defined sections, using clear titles and coherent paragraphs. Completely REMOVE any unnecessary markdown characters, bullet points, numbers or any other formatting symbols. Create well formated contents and subheadings.\n\nDocument Text:\n{text_content}"
+
+    def _generate_structured(self, text_content, summary_depth, config, stats):
+        """
+        Produces summary, title, sections and image keywords in one provider
+        call. Returns None when the response cannot be parsed or validated so
+        the caller can fall back to the multi-call path.
+        """
+        response_text = self.router.generate_content(
+            self._structured_prompt(text_content, summary_depth, config, stats),
+            json_mode=True
+        )
+        return self._structured_result(response_text)
+
+    def _structured_prompt(self, text_content, summary_depth, config, stats):
+        return (
+            f"{self._depth_instruction(summary_depth)}{self._length_instruction(config)}{self._source_note(stats)} "
+            "Analyze this document text and respond with ONLY a JSON object, "
+            "without code fences or any other text, using exactly this schema:\n"
+            '{"title": string, "sections": [{"title": string, "content": string}], "image_keywords": [string]}\n'
+            "Rules: the title is descriptive, in title case and at most 60 characters. "
+            "Split the summary into well-defined sections, each with a short clear heading and coherent plain-text paragraphs. "
+            "Do NOT use markdown characters, bullet points, numbering or any other formatting symbols. "
+            "image_keywords holds 3-5 short words describing the visual subject of the document."
+            f"\n\nDocument Text:\n{text_content}"
+        )
+
+    def _structured_result(self, response_text):
+        """Draft dict from a structured response, or None when it does not validate."""
+        parsed = self._parse_structured_response(response_text)
+        if not parsed:
+            return None
+
+        summary = "\n\n".join(f"{s['title']}\n{s['content']}" for s in parsed['sections'])
+        image_query = " ".join(parsed['image_keywords']) or parsed['title']
+
+        return {
+            'summary': summary,
+            'title': parsed['title'],
+            'display_format': self._build_display_format(parsed['sections'], image_query),
+            'image_keywords': parsed['image_keywords']
+        }
+
+    def _parse_structured_response(self, response_text):
+        """Parse and validate the JSON payload from _generate_structured."""
+        if not response_text:
+            return None
+
+        start = response_text.find('{')
+        end = response_text.rfind('}')
+        if start == -1 or end <= start:
+            logging.warning("Structured response contained no JSON object")
+            return None
+
+        try:
+            data = json.loads(response_text[start:end + 1])
+        except ValueError as e:
+            logging.warning(f"Structured response is not valid JSON: {str(e)}")
+            return None
+
+        if not isinstance(data, dict):
+            return None
+
+        title = self._clean_title(str(data.get('title') or ''))
+
+        sections = []
+        for section in data.get('sections') or []:
+            if not isinstance(section, dict):
+                continue
+            section_title = str(section.get('title') or '').strip()
+            content = str(section.get('content') or '').strip()
+            if section_title and content:
+                sections.append({'title': section_title, 'content': content})
+
+        keywords = data.get('image_keywords') or []
+        if isinstance(keywords, str):
+            keywords = keywords.split(',')
+        keywords = [str(k).strip() for k in keywords if str(k).strip()]
+
+        if not title or not sections:
+            logging.warning("Structured response is missing a title or sections")
+            return None
+
+        return {'title': title, 'sections': sections, 'image_keywords': keywords[:5]}
+
+    def _clean_title(self, title):
+        """Sanitize and shorten a model-suggested title."""
+        title = title.strip().replace('"', '')
+        return re.sub(r'[^a-zA-Z0-9 \-\_]', '', title)[:60].strip()
+
     def _generate_title(self, text):
         """
         Generates a meaningful title using AI for the given text content.
         """
         try:
-            prompt = f"Suggest a short, descriptive, and well-formatted title for the following document: {text[:2000]}. The title must not exceed 60 characters. Respond with just the title, removing any quotation marks or surrounding phrases. Format the title in title case; this is VERY IMPORTANT"
-            response_text = self.router.generate_content(prompt)
-            title = response_text.strip().replace('"', '')
-
-            # Sanitize and shorten title
-            clean_title = re.sub(r'[^a-zA-Z0-9 \-\_]', '', title)[:60]
-            return clean_title
+            response_text = self.router.generate_content(self._title_prompt(text))
+            return self._clean_title(response_text)
 
         except Exception as e:
             logging.error(f"Title generation failed: {str(e)}")
-            return "Academic_Content_Summary"
+            return DEFAULT_TITLE
+
+    @staticmethod
+    def _title_prompt(text):
+        return f"Suggest a short, descriptive, and well-formatted title for the following document: {text[:2000]}. The title must not exceed 60 characters. Respond with just the title, removing any quotation marks or surrounding phrases. Format the title in title case; this is VERY IMPORTANT"
 
-    def _force_sections(self, text):
-        """Forces the display format to be sections."""
-        sections = self._extract_sections(text)
+
+    def _build_display_format(self, sections, image_query):
         return {
             'type': 'sections',
             'sections': sections,
@@ -111,52 +564,46 @@ class FileProcessor:
                 'code_font': 'Courier',
                 'icon_set': 'fontawesome'
             },
-            'image_query': f"{self._generate_title(text)} {text[:500]}"
+            'image_query': image_query
         }
 
-    def _extract_sections(self, text):
-        """Extract sections from the given text."""
-        sentences = nltk.sent_tokenize(text)
-        sections = []
-        current_section = {'title': 'Introduction', 'content': []}
-
-        dynamic_markers = self._generate_section_markers(text)
-        markers = ['introduction', 'overview', 'summary', 'background', 'conclusion', 'first', 'second', 'third', 'finally', 'next', 'moreover', 'furthermore'] + dynamic_markers
-
-        for sentence in sentences:
-            lower_sentence = sentence.lower()
-            is_new_section = any(marker in lower_sentence for marker in markers)
-
-            if is_new_section:
-                if current_section['content']:
-                    sections.append({
-                        'title': current_section['title'],
-                        'content': ' '.join(current_section['content'])
-                    })
-                current_section = {
-                    'title': sentence.strip(),
-                    'content': []
-                }
-            else:
-                current_section['content'].append(sentence)
-
-        if current_section['content']:
-            sections.append({
-                'title': current_section['title'],
-                'content': ' '.join(current_section['content'])
-            })
-
-        return sections
+    def _extract_sections(self, text, dynamic_markers=None):
+        """
+        Extract sections from the given text. `dynamic_markers` are the
+        AI-suggested section markers; they are requested here when not given
+        and the text has no headings of its own.
+        """
+        with stage('sections', size=len(text)):
+            if dynamic_markers is None:
+                dynamic_markers = self._section_markers(text)
+            return segment_sections(text, dynamic_markers)
+
+    def _section_markers(self, text):
+        """
+        AI section markers, only when SECTION_MARKERS_LLM asks for them:
+        'always', 'never' or 'auto' (only for text without structural headings).
+        """
+        if not self._wants_markers(text):
+            return []
+        return self._generate_section_markers(text)
+
+    @staticmethod
+    def _wants_markers(text):
+        mode = current_app.config.get('SECTION_MARKERS_LLM', 'auto')
+        return not (mode == 'never' or (mode == 'auto' and has_structure(text)))
 
     def _generate_section_markers(self, text):
         """
         Generates dynamic section markers using AI.
         """
         try:
-            prompt = f"Suggest a list of 5-10 keywords or phrases that could indicate the start of a new section in the following text: {text[:1500]}.  Exclude the words introduction, overview, summary, background, and conclusion from your response. Respond with just a comma-separated list of keywords/phrases."
-            response_text = self.router.generate_content(prompt)
+            response_text = self.router.generate_content(self._markers_prompt(text))
             markers = [m.strip() for m in response_text.split(',')]
             return markers
         except Exception as e:
             logging.error(f"Section marker generation failed: {str(e)}")
-            return []
\ No newline at end of file
+            return []
+
+    @staticmethod
+    def _markers_prompt(text):
+        return f"Suggest a list of 5-10 keywords or phrases that could indicate the start of a new section in the following text: {text[:1500]}.  Exclude the words introduction, overview, summary, background, and conclusion from your response. Respond with just a comma-separated list of keywords/phrases."
\ No newline at end of file
@@ -1,44 +1,60 @@
+import asyncio
+import contextvars
 from functools import wraps
 from flask import request, current_app
-import time
-from collections import defaultdict
-import threading
-
-class RateLimiter:
-    def __init__(self):
-        self.request_counts = defaultdict(list)
-        self.lock = threading.Lock()
-
-    def is_rate_limited(self, ip):
-        with self.lock:
-            now = time.time()
-            window = current_app.config['RATE_LIMIT_PERIOD'].total_seconds()
-            
-            # Clean old requests
-            self.request_counts[ip] = [
-                req_time for req_time in self.request_counts[ip]
-                if now - req_time < window
-            ]
-            
-            # Check rate limit
-            if len(self.request_counts[ip]) >= current_app.config['RATE_LIMIT']:
-                return True
-                
-            self.request_counts[ip].append(now)
-            return False
-
-rate_limiter = RateLimiter()
-
-def rate_limit(f):
+from app.utils.rate_limiter import rate_limiter
+
+
+def rate_limit(f=None, scope='default', per_user=False):
+    """
+    Reject requests over the scope's budget with 429.
+
+    Usable bare (`@rate_limit`, shared 'default' scope) or configured
+    (`@rate_limit(scope='summarize', per_user=True)`); see RateLimiter.
+    """
+    if f is None:
+        return lambda func: rate_limit(func, scope=scope, per_user=per_user)
+
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        ip = request.remote_addr
-        
-        if rate_limiter.is_rate_limited(ip):
+        user_id = rate_limiter.trusted_user_id(request.headers) if per_user else None
+        result = rate_limiter.check(scope, request.remote_addr, user_id=user_id)
+
+        if not result.allowed:
             return {
                 'error': 'Rate limit exceeded',
-                'retry_after': current_app.config['RATE_LIMIT_PERIOD'].total_seconds()
-            }, 429
-            
+                'retry_after': result.retry_after
+            }, 429, {
+                'Retry-After': str(result.retry_after),
+                'X-RateLimit-Limit': str(result.limit),
+                'X-RateLimit-Remaining': '0'
+            }
+
         return f(*args, **kwargs)
     return decorated_function
+
+
+def with_app_context(func):
+    """
+    Bind `func` to the current Flask app so it can run on a worker thread.
+
+    Must be called while an app context is active; the returned callable
+    pushes a fresh app context around every invocation and runs in a copy
+    of the caller's context variables, so the request trace follows it.
+    """
+    app = current_app._get_current_object()
+    context = contextvars.copy_context()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with app.app_context():
+            return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+async def run_in_thread(func, *args, **kwargs):
+    """
+    Await `func` on asyncio's default thread pool with the current app
+    bound (see with_app_context), for blocking calls on the ASGI path.
+    """
+    return await asyncio.to_thread(with_app_context(func), *args, **kwargs)
@@ -0,0 +1,367 @@
+import os
+import re
+import time
+import asyncio
+import hashlib
+import logging
+import tempfile
+import threading
+from io import BytesIO
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, Future
+import requests
+from PIL import Image as PILImage, ImageOps
+from flask import current_app
+from app.utils.ai_clients import get_async_client_registry
+from app.utils.helpers import with_app_context, run_in_thread
+from app.utils.metrics import stage
+
+UNSPLASH_RANDOM_URL = "https://api.unsplash.com/photos/random"
+
+# Rendered at 6 x 4 inches in the PDF
+RENDER_WIDTH_IN = 6
+RENDER_HEIGHT_IN = 4
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before
+being below between both but by can could did do does doing down during each few for from
+further had has have having he her here hers herself him himself his how however i if in into
+is it its itself just may me might more most must my myself no nor not now of off on once only
+or other our ours ourselves out over own same she should so some such than that the their
+theirs them themselves then there these they this those through thus to too under until up
+upon us very was we were what when where which while who whom why will with within without
+would you your yours yourself yourselves summary document section introduction conclusion
+chapter page figure table using used use based also one two three new may many much
+""".split())
+
+_WORD_PATTERN = re.compile(r"[a-z][a-z\-]{2,}")
+
+
+def normalize_query(text, max_keywords=3, fallback='document'):
+    """
+    Reduce free text (a title, keywords, the start of a document) to a short,
+    stable Unsplash query: the most frequent non-stopword terms, sorted so
+    the same subject always produces the same cache key.
+    """
+    words = [w.strip('-') for w in _WORD_PATTERN.findall((text or '').lower())]
+    counts = Counter(w for w in words if len(w) > 2 and w not in STOPWORDS)
+    if not counts:
+        return fallback
+    first_seen = {}
+    for index, word in enumerate(words):
+        first_seen.setdefault(word, index)
+    ranked = sorted(counts, key=lambda w: (-counts[w], first_seen[w]))
+    return " ".join(sorted(ranked[:max_keywords]))
+
+
+def fit_image(data, width, height, quality=85):
+    """Decode, centre-crop to width:height, resize and re-encode as JPEG."""
+    image = PILImage.open(BytesIO(data))
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    image = ImageOps.fit(image, (width, height), PILImage.LANCZOS)
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+class DiskImageCache:
+    """
+    On-disk LRU of render-ready JPEGs keyed by normalized query.
+
+    Files are written atomically and recency is tracked through mtime, so
+    every worker on the host shares the cache without extra coordination.
+    Oldest files are evicted once either limit is exceeded.
+    """
+
+    def __init__(self, directory, max_entries=500, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.jpg')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def set(self, key, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logging.warning(f"Could not cache image: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._evict()
+
+    def _evict(self):
+        try:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.jpg'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        while entries and (len(entries) > self.max_entries or total > self.max_bytes):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class ImageService:
+    """
+    Header images for generated PDFs.
+
+    Lookup order: disk cache, Unsplash (short timeouts, skipped for a while
+    after a failure), then a bundled local image picked deterministically
+    from the query. prefetch() starts the lookup on a background thread so
+    it overlaps the LLM stage. aget_image() and aresolve() are the asyncio
+    forms used by the ASGI serving mode.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache = None
+        self._cache_dir = None
+        self._pool = None
+        self._api_down_until = 0.0
+        self._fallbacks = None
+
+    def _config(self):
+        return current_app.config
+
+    def _size(self):
+        dpi = self._config().get('IMAGE_RENDER_DPI', 150)
+        return RENDER_WIDTH_IN * dpi, RENDER_HEIGHT_IN * dpi
+
+    def _get_cache(self):
+        config = self._config()
+        directory = config.get('IMAGE_CACHE_DIR')
+        if not directory:
+            return None
+        if self._cache is None or self._cache_dir != directory:
+            with self._lock:
+                if self._cache is None or self._cache_dir != directory:
+                    try:
+                        self._cache = DiskImageCache(
+                            directory,
+                            max_entries=config.get('IMAGE_CACHE_MAX_ENTRIES', 500),
+                            max_bytes=config.get('IMAGE_CACHE_MAX_MB', 200) * 1024 * 1024
+                        )
+                    except OSError as e:
+                        logging.warning(f"Image cache unavailable: {str(e)}")
+                        return None
+                    self._cache_dir = directory
+        return self._cache
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self._config().get('IMAGE_PREFETCH_WORKERS', 4),
+                        thread_name_prefix='sycx-image'
+                    )
+        return self._pool
+
+    def prefetch(self, text):
+        """Start fetching an image for `text` in the background; returns a Future."""
+        query = normalize_query(text)
+        try:
+            return self._get_pool().submit(with_app_context(self.get_image), query)
+        except RuntimeError:
+            # Pool shut down (interpreter exit); resolve inline
+            future = Future()
+            future.set_result(None)
+            return future
+
+    def get_image(self, query):
+        """Render-ready JPEG bytes for `query`, or None if nothing is available."""
+        query = normalize_query(query)
+        with stage('image') as record:
+            cache = self._get_cache()
+            data = cache.get(query) if cache else None
+            if data:
+                record.outcome = 'hit'
+                return data
+
+            data = self._fetch_unsplash(query)
+            if data:
+                record.outcome = 'fetched'
+                if cache:
+                    cache.set(query, data)
+                return data
+
+            data = self._fallback_image(query)
+            record.outcome = 'fallback' if data else 'miss'
+            return data
+
+    def resolve(self, pending, query, wait=None):
+        """
+        Image bytes from a prefetch Future, waiting at most `wait` seconds
+        before falling back to the bundled images.
+        """
+        wait = self._config().get('IMAGE_WAIT_SECONDS', 5.0) if wait is None else wait
+        if pending is not None:
+            try:
+                data = pending.result(timeout=wait)
+                if data:
+                    return data
+            except Exception as e:
+                logging.warning(f"Image prefetch not ready: {type(e).__name__}")
+            return self._fallback_image(normalize_query(query))
+        return self.get_image(query)
+
+    async def aget_image(self, query):
+        """get_image on the event loop: Unsplash over httpx, disk and PIL work on threads."""
+        query = normalize_query(query)
+        with stage('image') as record:
+            cache = self._get_cache()
+            data = await run_in_thread(cache.get, query) if cache else None
+            if data:
+                record.outcome = 'hit'
+                return data
+
+            data = await self._afetch_unsplash(query)
+            if data:
+                record.outcome = 'fetched'
+                if cache:
+                    await run_in_thread(cache.set, query, data)
+                return data
+
+            data = await run_in_thread(self._fallback_image, query)
+            record.outcome = 'fallback' if data else 'miss'
+            return data
+
+    async def aresolve(self, pending, query, wait=None):
+        """resolve() for an asyncio Task from aget_image(); the task keeps running after a timeout."""
+        wait = self._config().get('IMAGE_WAIT_SECONDS', 5.0) if wait is None else wait
+        if pending is not None:
+            try:
+                data = await asyncio.wait_for(asyncio.shield(pending), wait)
+                if data:
+                    return data
+            except Exception as e:
+                logging.warning(f"Image prefetch not ready: {type(e).__name__}")
+            return await run_in_thread(self._fallback_image, normalize_query(query))
+        return await self.aget_image(query)
+
+    def _unsplash_available(self):
+        access_key = self._config().get('UNSPLASH_ACCESS_KEY')
+        return bool(access_key) and time.monotonic() >= self._api_down_until
+
+    def _unsplash_failed(self, error):
+        logging.error(f"Error fetching Unsplash image: {error}")
+        self._api_down_until = time.monotonic() + self._config().get('UNSPLASH_COOLDOWN', 60)
+
+    async def _afetch_unsplash(self, query):
+        if not self._unsplash_available():
+            return None
+
+        config = self._config()
+        timeout = config.get('UNSPLASH_TIMEOUT', 3.0)
+        width, height = self._size()
+        client = get_async_client_registry().http()
+        try:
+            response = await client.get(
+                UNSPLASH_RANDOM_URL,
+                headers={"Authorization": f"Client-ID {config['UNSPLASH_ACCESS_KEY']}"},
+                params={"query": query, "orientation": "landscape"},
+                timeout=timeout
+            )
+            response.raise_for_status()
+            image_url = response.json()["urls"]["raw"]
+            img_response = await client.get(
+                image_url,
+                params={'w': width, 'h': height, 'fit': 'crop', 'fm': 'jpg', 'q': 80},
+                timeout=timeout,
+                follow_redirects=True
+            )
+            img_response.raise_for_status()
+            return await asyncio.to_thread(fit_image, img_response.content, width, height)
+        except Exception as e:
+            self._unsplash_failed(e)
+            return None
+
+    def _fetch_unsplash(self, query):
+        if not self._unsplash_available():
+            return None
+
+        config = self._config()
+        access_key = config.get('UNSPLASH_ACCESS_KEY')
+
+        timeout = config.get('UNSPLASH_TIMEOUT', 3.0)
+        width, height = self._size()
+        try:
+            response = requests.get(
+                UNSPLASH_RANDOM_URL,
+                headers={"Authorization": f"Client-ID {access_key}"},
+                params={"query": query, "orientation": "landscape"},
+                timeout=timeout
+            )
+            response.raise_for_status()
+            image_url = response.json()["urls"]["raw"]
+            # Let the Unsplash CDN crop and scale before download
+            img_response = requests.get(
+                image_url,
+                params={'w': width, 'h': height, 'fit': 'crop', 'fm': 'jpg', 'q': 80},
+                timeout=timeout
+            )
+            img_response.raise_for_status()
+            return fit_image(img_response.content, width, height)
+        except Exception as e:
+            self._unsplash_failed(e)
+            return None
+
+    def _fallback_image(self, query):
+        if self._fallbacks is None:
+            directory = self._config().get('IMAGE_FALLBACK_DIR') or os.path.join(
+                os.path.dirname(current_app.root_path), 'assets/images'
+            )
+            try:
+                self._fallbacks = sorted(
+                    os.path.join(directory, name) for name in os.listdir(directory)
+                    if name.lower().endswith(('.jpg', '.jpeg', '.png'))
+                )
+            except OSError:
+                self._fallbacks = []
+        if not self._fallbacks:
+            return None
+
+        index = int(hashlib.sha1(query.encode('utf-8')).hexdigest(), 16) % len(self._fallbacks)
+        path = self._fallbacks[index]
+        cache = self._get_cache()
+        key = f"fallback:{os.path.basename(path)}:{self._size()}"
+        data = cache.get(key) if cache else None
+        if data:
+            return data
+        try:
+            with open(path, 'rb') as f:
+                data = fit_image(f.read(), *self._size())
+        except Exception as e:
+            logging.warning(f"Fallback image unusable: {str(e)}")
+            return None
+        if cache:
+            cache.set(key, data)
+        return data
+
+image_service = ImageService()
@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import psutil
+from flask import current_app
+from app.utils.helpers import with_app_context
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+# Identifies this worker process in the shared SQLite stores alongside its
+# pid. PIDs are reused (gunicorn restarts workers, containers hand out low
+# PIDs), so a pid alone cannot tell a live owner from a dead one. Forked
+# children (gunicorn preload_app) get a token of their own.
+_process_token = uuid.uuid4().hex
+
+
+def _renew_process_token():
+    global _process_token
+    _process_token = uuid.uuid4().hex
+
+
+os.register_at_fork(after_in_child=_renew_process_token)
+
+
+def process_token():
+    return _process_token
+
+
+def owner_alive(pid, token, since):
+    """
+    Whether the process that owned a row as (pid, token), last seen at
+    `since`, is still running. A process now holding that pid but started
+    after `since` is a different one.
+    """
+    if token == _process_token:
+        return True
+    if pid == os.getpid():
+        return False
+    try:
+        return psutil.Process(pid).create_time() <= since
+    except psutil.NoSuchProcess:
+        return False
+    except psutil.Error:
+        return True
+
+
+def ensure_owner_token_column(conn, table):
+    """Add the owner_token column to stores created before it existed."""
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if 'owner_token' not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN owner_token TEXT")
+
+
+def _new_job(job_id, meta):
+    now = time.time()
+    return {
+        'id': job_id,
+        'status': JOB_QUEUED,
+        'stage': JOB_QUEUED,
+        'stages': [],
+        'meta': meta or {},
+        'result': None,
+        'error': None,
+        'status_code': None,
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+# ---------------------------------------------------------------------------
+# Job stores
+#
+# A store only persists job records; execution always happens in the
+# JobQueue's executor. Both stores share the same create / get / update /
+# count_pending interface.
+# ---------------------------------------------------------------------------
+
+class MemoryJobStore:
+    """Jobs visible only to the worker process that accepted them."""
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, meta=None):
+        job = _new_job(job_id, meta)
+        with self._lock:
+            self._evict_expired()
+            self._jobs[job_id] = job
+        return dict(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields)
+            job['updated_at'] = time.time()
+
+    def count_pending(self):
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job['status'] not in FINISHED_STATES)
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job['status'] in FINISHED_STATES and job['updated_at'] < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """
+    Jobs persisted in SQLite so any gunicorn worker on the host can answer
+    status polls, whichever worker is actually running the job.
+    """
+
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, data TEXT NOT NULL, "
+            "owner_pid INTEGER NOT NULL, updated_at REAL NOT NULL, owner_token TEXT)"
+        )
+        ensure_owner_token_column(conn, 'jobs')
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, job_id, meta=None):
+        job = _new_job(job_id, meta)
+        conn = self._connect()
+        conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (JOB_COMPLETED, JOB_FAILED, time.time() - self.ttl)
+        )
+        conn.execute(
+            "INSERT INTO jobs (id, status, data, owner_pid, owner_token, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, job['status'], json.dumps(job), os.getpid(), process_token(), job['updated_at'])
+        )
+        conn.commit()
+        return job
+
+    def get(self, job_id):
+        row = self._connect().execute(
+            "SELECT data FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, job_id, **fields):
+        conn = self._connect()
+        row = conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return
+        job = json.loads(row[0])
+        job.update(fields)
+        job['updated_at'] = time.time()
+        conn.execute(
+            "UPDATE jobs SET status = ?, data = ?, updated_at = ? WHERE id = ?",
+            (job['status'], json.dumps(job), job['updated_at'], job_id)
+        )
+        conn.commit()
+
+    def count_pending(self):
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?) AND owner_token = ?",
+            (JOB_QUEUED, JOB_RUNNING, process_token())
+        ).fetchone()
+        return row[0]
+
+    def fail_orphaned(self):
+        """Mark jobs whose owning worker process is gone as failed."""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT id, owner_pid, owner_token, updated_at FROM jobs WHERE status IN (?, ?)",
+            (JOB_QUEUED, JOB_RUNNING)
+        ).fetchall()
+        for job_id, pid, token, updated_at in rows:
+            if not owner_alive(pid, token, updated_at):
+                self.update(
+                    job_id,
+                    status=JOB_FAILED,
+                    error='Job was interrupted by a worker restart',
+                    status_code=500
+                )
+
+
+# ---------------------------------------------------------------------------
+# Job queue
+# ---------------------------------------------------------------------------
+
+class JobQueue:
+    """
+    Runs long pipelines on a background thread pool and records their
+    progress in a pluggable job store.
+    """
+
+    def __init__(self):
+        # Store and executor are created lazily because current_app may not be ready
+        self._store = None
+        self._executor = None
+        self._max_pending = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._store is not None:
+            return
+        with self._lock:
+            if self._store is not None:
+                return
+            config = current_app.config
+            ttl = config.get('JOB_TTL', 3600)
+            if config.get('JOB_STORE_BACKEND', 'sqlite') == 'sqlite':
+                store = SQLiteJobStore(config.get('JOB_STORE_PATH'), ttl=ttl)
+                store.fail_orphaned()
+            else:
+                store = MemoryJobStore(ttl=ttl)
+            self._executor = ThreadPoolExecutor(
+                max_workers=config.get('JOB_WORKERS', 4),
+                thread_name_prefix='sycx-job'
+            )
+            self._max_pending = config.get('JOB_MAX_PENDING', 100)
+            self._store = store
+
+    @property
+    def store(self):
+        self._ensure_started()
+        return self._store
+
+    def submit(self, func, *args, meta=None, **kwargs):
+        """
+        Queue `func(*args, on_stage=..., **kwargs)` and return the job id.
+
+        `func` must return a JSON-serialisable result; exceptions carrying a
+        `status_code` attribute keep that code when reported.
+        """
+        self._ensure_started()
+        if self._store.count_pending() >= self._max_pending:
+            raise QueueFullError('Too many jobs in progress, try again later')
+
+        job_id = uuid.uuid4().hex
+        self._store.create(job_id, meta)
+        self._executor.submit(with_app_context(self._run), job_id, func, args, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _run(self, job_id, func, args, kwargs):
+        stages = []
+
+        def on_stage(name):
+            now = time.time()
+            if stages:
+                stages[-1]['finished_at'] = now
+            stages.append({'name': name, 'started_at': now, 'finished_at': None})
+            self._store.update(job_id, stage=name, stages=stages)
+
+        self._store.update(job_id, status=JOB_RUNNING, stage='starting')
+        try:
+            result = func(*args, on_stage=on_stage, **kwargs)
+            if stages:
+                stages[-1]['finished_at'] = time.time()
+            self._store.update(
+                job_id, status=JOB_COMPLETED, stage=JOB_COMPLETED,
+                stages=stages, result=result, status_code=200
+            )
+        except Exception as e:
+            logging.error(f"Job {job_id} failed: {str(e)}")
+            self._store.update(
+                job_id, status=JOB_FAILED, stage=JOB_FAILED, stages=stages,
+                error=str(e), status_code=getattr(e, 'status_code', 500)
+            )
+
+job_queue = JobQueue()
@@ -0,0 +1,139 @@
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+import psutil
+from flask import current_app
+
+MB = 1024 * 1024
+
+
+class MemoryPressureError(Exception):
+    """Raised when new work cannot be admitted without risking an OOM kill."""
+
+    def __init__(self, message, retry_after=30):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = 503
+
+
+class MemoryAdmissionController:
+    """
+    Per-process admission control against this worker's share of
+    MAX_MEMORY_MB, the host budget split evenly across MEMORY_WORKERS
+    worker processes.
+
+    Each piece of work reserves an estimate of the memory it will need.
+    Work is admitted while resident memory plus outstanding reservations
+    stays under the share * MEMORY_HIGH_WATERMARK; otherwise the caller
+    waits up to MEMORY_ADMISSION_WAIT seconds for memory to free up and is
+    then rejected with MemoryPressureError.
+    """
+
+    def __init__(self):
+        self._process = psutil.Process()
+        self._reserved_mb = 0.0
+        self._condition = threading.Condition()
+
+    def rss_mb(self):
+        """Resident memory of this worker plus its extraction/offload pool processes."""
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss / MB
+
+    def estimate_mb(self, upload_size):
+        config = current_app.config
+        return (config.get('MEMORY_REQUEST_BASE_MB', 50)
+                + upload_size / MB * config.get('MEMORY_UPLOAD_FACTOR', 4.0))
+
+    @staticmethod
+    def limit_mb():
+        """This worker's admission limit: its share of MAX_MEMORY_MB, times the watermark."""
+        config = current_app.config
+        workers = max(1, config.get('MEMORY_WORKERS', 1))
+        return config['MAX_MEMORY_MB'] / workers * config.get('MEMORY_HIGH_WATERMARK', 0.85)
+
+    def status(self):
+        return {
+            'rss_mb': round(self.rss_mb(), 1),
+            'reserved_mb': round(self._reserved_mb, 1),
+            'limit_mb': round(self.limit_mb(), 1)
+        }
+
+    def _limits(self, wait):
+        config = current_app.config
+        wait = config.get('MEMORY_ADMISSION_WAIT', 10.0) if wait is None else wait
+        return self.limit_mb(), wait
+
+    def _try_reserve(self, estimated_mb, limit_mb):
+        """Reserve `estimated_mb` if it fits; returns the projected MB otherwise. Call under the condition."""
+        projected = self.rss_mb() + self._reserved_mb + estimated_mb
+        # Always admit when nothing else is reserved, otherwise a
+        # single oversized request could never run at all
+        if projected <= limit_mb or self._reserved_mb == 0:
+            self._reserved_mb += estimated_mb
+            return None
+        return projected
+
+    def _reject(self, projected, limit_mb, wait):
+        logging.warning(
+            f"Rejecting work: projected {projected:.0f} MB exceeds {limit_mb:.0f} MB"
+        )
+        return MemoryPressureError(
+            'Server is under memory pressure, try again shortly',
+            retry_after=max(1, int(wait))
+        )
+
+    def _release(self, estimated_mb):
+        with self._condition:
+            self._reserved_mb = max(0.0, self._reserved_mb - estimated_mb)
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, estimated_mb, wait=None):
+        limit_mb, wait = self._limits(wait)
+        deadline = time.monotonic() + wait
+
+        with self._condition:
+            while True:
+                projected = self._try_reserve(estimated_mb, limit_mb)
+                if projected is None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._reject(projected, limit_mb, wait)
+                # Re-check RSS periodically; it can fall without a release()
+                self._condition.wait(min(remaining, 1.0))
+
+        try:
+            yield
+        finally:
+            self._release(estimated_mb)
+
+    @asynccontextmanager
+    async def admit_async(self, estimated_mb, wait=None):
+        """admit() for the event loop: polls instead of blocking a thread on the condition."""
+        limit_mb, wait = self._limits(wait)
+        deadline = time.monotonic() + wait
+
+        while True:
+            with self._condition:
+                projected = self._try_reserve(estimated_mb, limit_mb)
+            if projected is None:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self._reject(projected, limit_mb, wait)
+            await asyncio.sleep(min(remaining, 0.25))
+
+        try:
+            yield
+        finally:
+            self._release(estimated_mb)
+
+memory_guard = MemoryAdmissionController()
@@ -0,0 +1,217 @@
+import os
+import re
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from flask import request, g, Response
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY,
+    generate_latest, CONTENT_TYPE_LATEST, multiprocess
+)
+
+# prometheus_client switches to file-backed values shared by all gunicorn
+# workers when PROMETHEUS_MULTIPROC_DIR is set before it is imported (see
+# gunicorn.conf.py); /metrics then aggregates every worker's files.
+MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90, 120, 300)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+
+STAGE_SECONDS = Histogram(
+    'sycx_stage_duration_seconds', 'Pipeline stage duration',
+    ['stage', 'outcome'], buckets=DURATION_BUCKETS
+)
+STAGE_SIZE = Histogram(
+    'sycx_stage_size', 'Pipeline stage input/output size (bytes or characters)',
+    ['stage'], buckets=SIZE_BUCKETS
+)
+PROVIDER_SECONDS = Histogram(
+    'sycx_provider_attempt_duration_seconds', 'LLM provider/model attempt duration',
+    ['provider', 'outcome'], buckets=DURATION_BUCKETS
+)
+PROVIDER_ATTEMPTS = Counter(
+    'sycx_provider_attempts_total', 'LLM provider/model attempts',
+    ['provider', 'outcome']
+)
+HTTP_SECONDS = Histogram(
+    'sycx_http_request_duration_seconds', 'HTTP request duration',
+    ['endpoint', 'method', 'status'], buckets=DURATION_BUCKETS
+)
+
+_trace = contextvars.ContextVar('sycx_trace', default=None)
+_TRACE_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class Trace:
+    """Per-request trace id plus accumulated stage durations for Server-Timing."""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        # Stages may run concurrently on worker threads (map chunks, hedges)
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def server_timing(self):
+        with self._lock:
+            timings = dict(self.timings)
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def current_trace():
+    return _trace.get()
+
+
+def current_trace_id():
+    trace = _trace.get()
+    return trace.trace_id if trace else '-'
+
+
+@contextmanager
+def use_trace(trace):
+    """Make `trace` current, e.g. inside a streamed response generator."""
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+class StageRecord:
+    __slots__ = ('name', 'size', 'outcome')
+
+    def __init__(self, name, size=None):
+        self.name = name
+        self.size = size
+        self.outcome = 'ok'
+
+
+@contextmanager
+def stage(name, size=None):
+    """
+    Time a pipeline stage. The yielded record's `size` and `outcome` can be
+    set by the caller; an exception marks the stage as an error.
+    """
+    record = StageRecord(name, size)
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception:
+        record.outcome = 'error'
+        raise
+    finally:
+        observe_stage(name, time.perf_counter() - started, record.outcome, record.size)
+
+
+def observe_stage(name, seconds, outcome='ok', size=None):
+    try:
+        STAGE_SECONDS.labels(stage=name, outcome=outcome).observe(seconds)
+        if size is not None:
+            STAGE_SIZE.labels(stage=name).observe(size)
+    except Exception as e:
+        logging.debug(f"Metrics unavailable: {str(e)}")
+    trace = _trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def observe_provider(provider, seconds, ok):
+    outcome = 'ok' if ok else 'error'
+    try:
+        PROVIDER_SECONDS.labels(provider=provider, outcome=outcome).observe(seconds)
+        PROVIDER_ATTEMPTS.labels(provider=provider, outcome=outcome).inc()
+    except Exception as e:
+        logging.debug(f"Metrics unavailable: {str(e)}")
+    trace = _trace.get()
+    if trace is not None:
+        trace.add('llm', seconds)
+
+
+def request_trace(incoming=''):
+    """New Trace for a request, honouring a well-formed upstream X-Request-ID so proxies and logs line up."""
+    return Trace(incoming if _TRACE_ID_PATTERN.match(incoming or '') else None)
+
+
+def observe_request(endpoint, method, status, trace):
+    try:
+        HTTP_SECONDS.labels(
+            endpoint=endpoint or 'unknown',
+            method=method,
+            status=str(status)
+        ).observe(time.perf_counter() - trace.started)
+    except Exception as e:
+        logging.debug(f"Metrics unavailable: {str(e)}")
+
+
+def metrics_response():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+# ---------------------------------------------------------------------------
+# Flask integration
+# ---------------------------------------------------------------------------
+
+class TraceIdFilter(logging.Filter):
+    """Adds %(trace_id)s to every record so log lines can be correlated."""
+
+    def filter(self, record):
+        record.trace_id = current_trace_id()
+        return True
+
+
+def init_metrics(app):
+    """Register request tracing, Server-Timing and the /metrics endpoint."""
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(app.config['LOG_FORMAT']))
+        root.addHandler(handler)
+        root.setLevel(app.config['LOG_LEVEL'])
+    for handler in root.handlers:
+        if not any(isinstance(f, TraceIdFilter) for f in handler.filters):
+            handler.addFilter(TraceIdFilter())
+
+    @app.before_request
+    def start_trace():
+        trace = request_trace(request.headers.get('X-Request-ID', ''))
+        g.sycx_trace = trace
+        g.sycx_trace_token = _trace.set(trace)
+
+    @app.after_request
+    def finish_trace(response):
+        trace = g.get('sycx_trace')
+        if trace is None:
+            return response
+        response.headers['X-Request-ID'] = trace.trace_id
+        if app.config['SERVER_TIMING_ENABLED']:
+            response.headers['Server-Timing'] = trace.server_timing()
+        if request.endpoint != 'metrics':
+            observe_request(request.endpoint, request.method, response.status_code, trace)
+        return response
+
+    @app.teardown_request
+    def end_trace(exc=None):
+        token = g.pop('sycx_trace_token', None)
+        if token is not None:
+            try:
+                _trace.reset(token)
+            except ValueError:
+                # Token was created in a different context (e.g. copied)
+                _trace.set(None)
+
+    if app.config['METRICS_ENABLED']:
+        app.add_url_rule('/metrics', 'metrics', metrics_response)
@@ -0,0 +1,182 @@
+import hashlib
+import logging
+from PIL import Image, ImageOps
+from app.utils.cache import SQLiteCacheBackend, MemoryCacheBackend
+
+# Settings are plain dicts so they can be pickled into process-pool workers.
+DEFAULT_OCR_SETTINGS = {
+    'enabled': True,
+    'dpi': 300,                 # rasterization DPI for image-only PDF pages
+    'min_page_chars': 20,       # pages with less extracted text are OCR'd
+    'max_side': 4000,           # downscale images whose longest side is larger
+    'min_side': 1000,           # upscale images whose longest side is smaller
+    'tile_height': 3000,        # split taller images into strips
+    'lang': 'eng',
+    'cache_path': None,         # SQLite path shared across processes
+    'cache_ttl': 30 * 24 * 3600,
+}
+
+# One cache handle per process, keyed by path
+_caches = {}
+
+
+def ocr_settings(overrides=None):
+    settings = dict(DEFAULT_OCR_SETTINGS)
+    if overrides:
+        settings.update({k: v for k, v in overrides.items() if v is not None})
+    return settings
+
+
+def _get_cache(settings):
+    path = settings.get('cache_path')
+    cache = _caches.get(path)
+    if cache is None:
+        try:
+            if path:
+                cache = SQLiteCacheBackend(path, table='ocr_cache', max_entries=50000, ttl=settings['cache_ttl'])
+            else:
+                cache = MemoryCacheBackend(max_entries=1024, ttl=settings['cache_ttl'])
+        except Exception as e:
+            logging.warning(f"OCR cache unavailable: {str(e)}")
+            cache = MemoryCacheBackend(max_entries=1024, ttl=settings['cache_ttl'])
+        _caches[path] = cache
+    return cache
+
+
+def image_hash(image):
+    digest = hashlib.sha256()
+    digest.update(f"{image.mode}:{image.size}".encode('utf-8'))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Preprocessing
+# ---------------------------------------------------------------------------
+
+def otsu_threshold(histogram):
+    """Otsu's threshold from a 256-bin grayscale histogram."""
+    total = sum(histogram)
+    if not total:
+        return 128
+    sum_all = sum(i * count for i, count in enumerate(histogram))
+    sum_background = 0
+    weight_background = 0
+    best_threshold, best_variance = 0, 0.0
+    for level, count in enumerate(histogram):
+        weight_background += count
+        if weight_background == 0:
+            continue
+        weight_foreground = total - weight_background
+        if weight_foreground == 0:
+            break
+        sum_background += level * count
+        mean_background = sum_background / weight_background
+        mean_foreground = (sum_all - sum_background) / weight_foreground
+        variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_variance, best_threshold = variance, level
+    return best_threshold
+
+
+def preprocess(image, settings):
+    """Grayscale, rescale towards OCR-friendly resolution and binarize."""
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('L')
+
+    longest = max(image.size)
+    if longest > settings['max_side']:
+        scale = settings['max_side'] / longest
+    elif longest < settings['min_side']:
+        scale = min(2.0, settings['min_side'] / longest)
+    else:
+        scale = 1.0
+    if scale != 1.0:
+        image = image.resize(
+            (max(1, int(image.width * scale)), max(1, int(image.height * scale))),
+            Image.LANCZOS
+        )
+
+    threshold = otsu_threshold(image.histogram())
+    return image.point(lambda p: 255 if p > threshold else 0)
+
+
+def split_tiles(image, tile_height):
+    """
+    Split a tall image into horizontal strips of roughly `tile_height`,
+    cutting on the brightest (emptiest) row near each boundary so lines of
+    text are not sliced in half.
+    """
+    if image.height <= tile_height:
+        return [image]
+
+    # Per-row mean brightness via a 1-pixel-wide box resize (mode L: 1 byte/row)
+    row_means = image.resize((1, image.height), Image.BOX).tobytes()
+    window = max(1, tile_height // 10)
+
+    tiles = []
+    top = 0
+    while image.height - top > tile_height:
+        target = top + tile_height
+        lower = max(top + 1, target - window)
+        upper = min(image.height - 1, target + window)
+        cut = max(range(lower, upper), key=lambda y: (row_means[y], -abs(y - target)))
+        tiles.append(image.crop((0, top, image.width, cut)))
+        top = cut
+    tiles.append(image.crop((0, top, image.width, image.height)))
+    return tiles
+
+
+# ---------------------------------------------------------------------------
+# OCR entry points (module-level so process pools can pickle them)
+# ---------------------------------------------------------------------------
+
+def _ocr_tile(tile, lang):
+    import pytesseract
+
+    return pytesseract.image_to_string(tile, lang=lang)
+
+
+def ocr_image(image, settings, pool=None):
+    """OCR a PIL image, using the per-image cache and tiling large images."""
+    cache = _get_cache(settings)
+    key = f"{image_hash(image)}:{settings['lang']}"
+    cached = cache.get(key)
+    if cached is not None:
+        return cached['text']
+
+    tiles = split_tiles(preprocess(image, settings), settings['tile_height'])
+    if pool is not None and len(tiles) > 1:
+        texts = list(pool.map(_ocr_tile, tiles, [settings['lang']] * len(tiles)))
+    else:
+        texts = [_ocr_tile(tile, settings['lang']) for tile in tiles]
+
+    text = "\n".join(t.strip() for t in texts if t.strip())
+    cache.set(key, {'text': text})
+    return text
+
+
+def ocr_image_file(stream, settings, pool=None):
+    """OCR an image from a binary file handle."""
+    image = Image.open(stream)
+    return ocr_image(image, settings, pool=pool)
+
+
+def ocr_pdf_page(path, page_index, settings):
+    """Rasterize one (0-based) PDF page and OCR it."""
+    from pdf2image import convert_from_path
+
+    images = convert_from_path(
+        path,
+        dpi=settings['dpi'],
+        first_page=page_index + 1,
+        last_page=page_index + 1,
+        grayscale=True
+    )
+    if not images:
+        return ""
+    return ocr_image(images[0], settings)
+
+
+def needs_ocr(text, settings):
+    return len(text.strip()) < settings['min_page_chars']
@@ -0,0 +1,67 @@
+"""
+Process pool for CPU-bound work in the ASGI serving mode.
+
+Text extraction and PDF rendering hold the GIL for most of their run, so on
+an event loop they would stall every other request of the worker. They are
+sent to a pool of spawned processes instead. Each process gets a minimal
+Flask app carrying a copy of the serving app's plain config values, so code
+that reads current_app (the PDF font path, OCR settings) works unchanged.
+"""
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from app.utils.text_extractor import available_cpus
+
+_pool_lock = threading.Lock()
+_pool = None
+
+_PLAIN_TYPES = (str, int, float, bool, type(None))
+
+
+def _plain_config(config):
+    return {key: value for key, value in config.items() if isinstance(value, _PLAIN_TYPES)}
+
+
+def _init_worker(root_path, config):
+    from flask import Flask
+
+    logging.basicConfig(level=config.get('LOG_LEVEL', 'INFO'))
+    # root_path of the real app package, which locates assets/ for fonts
+    app = Flask('app', root_path=root_path)
+    app.config.update(config)
+    app.app_context().push()
+
+
+def get_offload_pool():
+    """Process-wide offload pool (OFFLOAD_WORKERS processes; 0 means one per CPU)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = current_app.config.get('OFFLOAD_WORKERS') or available_cpus()
+                # spawn: the serving process runs threads and an event loop
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(current_app.root_path, _plain_config(current_app.config))
+                )
+                logging.info(f"Started offload pool with {workers} processes (pid {os.getpid()})")
+    return _pool
+
+
+async def offload(func, *args):
+    """Await module-level `func(*args)` on the offload pool; arguments must pickle."""
+    return await asyncio.get_running_loop().run_in_executor(get_offload_pool(), func, *args)
+
+
+def shutdown_offload_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
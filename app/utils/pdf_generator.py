@@ -1,30 +1,47 @@
 import os
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, ListFlowable
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, ListFlowable, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-import requests
-from PIL import Image as PILImage
 from io import BytesIO
-import cloudinary
-import cloudinary.uploader
+from xml.sax.saxutils import escape
 from flask import current_app
 import logging
 import uuid
 import datetime
+import threading
+from collections import OrderedDict
+from app.utils.metrics import stage
+from app.utils.images import image_service
+from app.utils.stage_graph import build_graph
+from app.utils.storage import storage
 
 from reportlab.pdfgen import canvas
 from reportlab.pdfbase import pdfdoc
 
-class PDFGenerator:
-    def __init__(self):
+# ---------------------------------------------------------------------------
+# Rendering context
+#
+# Fonts, the sample stylesheet and the fixed paragraph styles are built once
+# per process and shared by every PDFGenerator. ParagraphStyles are only read
+# while building, so sharing them across threads is safe. Palette-dependent
+# styles are cached per display_format['style'] colour set.
+# ---------------------------------------------------------------------------
+
+TEMPLATE_CACHE_SIZE = 64
+
+_render_lock = threading.Lock()
+_render_context = None
+
+
+class RenderContext:
+    def __init__(self, font_path):
         self.styles = getSampleStyleSheet()
 
         # Register custom font
-        font_path = os.path.join(os.path.dirname(current_app.root_path), 'assets/fonts/Coming_Soon/ComingSoon-Regular.ttf')
         if os.path.exists(font_path):
             pdfmetrics.registerFont(TTFont('ComingSoon', font_path))
             self.font_name = 'ComingSoon'
@@ -43,176 +60,247 @@ class PDFGenerator:
             textColor=colors.HexColor('#263238')  # Darker grey
         )
 
-        # Configure Cloudinary
-        cloudinary.config(
-            cloud_name=current_app.config['CLOUDINARY_CLOUD_NAME'],
-            api_key=current_app.config['CLOUDINARY_API_KEY'],
-            api_secret=current_app.config['CLOUDINARY_API_SECRET']
+        # Author style
+        self.author_style = ParagraphStyle(
+            'AuthorStyle',
+            parent=self.styles['Normal'],
+            fontName=self.font_name,
+            fontSize=10,
+            alignment=2,  # Align right
+            spaceAfter=16,  # Reduced spacing
+            textColor=colors.grey
         )
 
-    def _get_unsplash_image(self, query):
-        """Fetch relevant image from Unsplash with error handling"""
-        try:
-            headers = {
-                "Authorization": f"Client-ID {current_app.config['UNSPLASH_ACCESS_KEY']}"
-            }
-            params = {
-                "query": query,
-                "orientation": "landscape"
-            }
-
-            response = requests.get(
-                "https://api.unsplash.com/photos/random",
-                headers=headers,
-                params=params,
-                timeout=5
-            )
-
-            if response.status_code == 200:
-                image_url = response.json()["urls"]["regular"]
-                img_response = requests.get(image_url, timeout=5)
-                if img_response.status_code == 200:
-                    img = PILImage.open(BytesIO(img_response.content))
-                    img = img.convert('RGB')
-                    temp_path = "/tmp/temp_image.jpg"
-                    img.save(temp_path)
-                    return temp_path
-
-            return None
-
-        except Exception as e:
-            logging.error(f"Error fetching Unsplash image: {e}")
-            return None
-
-    def create_pdf(self, summary_content, display_format, title):
-        """Create PDF with enhanced formatting and metadata"""
-        try:
-            # Generate a unique filename to prevent collisions
-            unique_id = str(uuid.uuid4())[:8]
-            safe_title = title.replace(' ', '_').replace('/', '_').replace('\\', '_')
-            output_path = f"/tmp/{safe_title}_{unique_id}.pdf"
-
-            # Creation date for metadata
-            creation_date = datetime.datetime.now()
-
-            doc = SimpleDocTemplate(output_path, pagesize=letter,
-                                  author="SycX AI",  # Setting Author
-                                  title=title,        # Setting Title
-                                  subject="AI Generated Summary",  # Setting Subject
-                                  keywords=["AI", "Summary", "Document"], # Setting keywords
-                                  creationdate=creation_date) # Setting creation date
-
-            story = []
-
+        self._templates = OrderedDict()
+        self._templates_lock = threading.Lock()
+
+    def template(self, style):
+        """Title and section header styles for a display_format['style'] palette."""
+        palette = (style or {}).get('colors', {})
+        key = (palette.get('primary', '#000000'), palette.get('headers', '#000000'))
+        with self._templates_lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                return template
+
+        primary, headers = key
+        template = {
             # Title style
-            title_style = ParagraphStyle(
+            'title': ParagraphStyle(
                 'CustomTitle',
                 parent=self.styles['Title'],
                 fontName=self.font_name,
                 fontSize=24,
                 spaceAfter=8,  # Reduced spacing
-                textColor=colors.HexColor(display_format['style']['colors'].get('primary', '#000000')),  # Primary Color
+                textColor=colors.HexColor(primary),  # Primary Color
                 alignment=1  # Center align
-            )
-
-            # Author style
-            author_style = ParagraphStyle(
-                'AuthorStyle',
-                parent=self.styles['Normal'],
+            ),
+            # Section header
+            'header': ParagraphStyle(
+                'SectionHeader',
+                parent=self.styles['Heading2'],
                 fontName=self.font_name,
-                fontSize=10,
-                alignment=2,  # Align right
-                spaceAfter=16,  # Reduced spacing
-                textColor=colors.grey
+                fontSize=16,
+                spaceAfter=4,  # Reduced spacing
+                textColor=colors.HexColor(headers),  # Headers Color
+                leading=18  # Increased leading
             )
+        }
+        with self._templates_lock:
+            self._templates[key] = template
+            if len(self._templates) > TEMPLATE_CACHE_SIZE:
+                self._templates.popitem(last=False)
+        return template
+
+
+def get_render_context():
+    """Process-wide RenderContext, created on first use (or by init_rendering)."""
+    global _render_context
+    if _render_context is None:
+        with _render_lock:
+            if _render_context is None:
+                font_path = os.path.join(
+                    os.path.dirname(current_app.root_path),
+                    'assets/fonts/Coming_Soon/ComingSoon-Regular.ttf'
+                )
+                _render_context = RenderContext(font_path)
+    return _render_context
+
+
+def init_rendering(app):
+    """Load fonts and styles at startup instead of on the first request."""
+    with app.app_context():
+        get_render_context()
+
+
+def storage_name(title):
+    """Unique storage name for a PDF titled `title`, preventing collisions."""
+    unique_id = str(uuid.uuid4())[:8]
+    safe_title = title.replace(' ', '_').replace('/', '_').replace('\\', '_')
+    return f"{safe_title}_{unique_id}"
+
+
+def render_pdf(summary_content, display_format, title, image_bytes=None):
+    """
+    PDF bytes for one summary, without storing it. A picklable entry point
+    for the offload process pool; needs an app context only for the font path.
+    """
+    generator = PDFGenerator()
+    story = generator._build_story(summary_content, display_format)
+    image_data = BytesIO(image_bytes) if image_bytes else None
+    return generator._render(title, display_format, image_data, story).getvalue()
 
-            # Add title
-            story.append(Paragraph(title, title_style))
 
-            # Add author
-            story.append(Paragraph("SycX AI", author_style))  # Adding the author
+class PDFGenerator:
+    def __init__(self):
+        context = get_render_context()
+        self.context = context
+        self.styles = context.styles
+        self.font_name = context.font_name
+        self.custom_style = context.custom_style
+
+    def _get_header_image(self, query, pending=None):
+        """Header image as an in-memory reader, from the prefetch or a fresh lookup."""
+        data = image_service.resolve(pending, query)
+        return BytesIO(data) if data else None
+
+    def create_pdf(self, summary_content, display_format, title, on_stage=None, image=None, base_url=None):
+        """
+        Create PDF with enhanced formatting and metadata.
+
+        Runs as a stage graph: the header image (`image` is an optional
+        Future from ImageService.prefetch(), otherwise looked up from
+        display_format['image_query']) resolves while the text flowables are
+        built, then the document is rendered and uploaded.
+        """
+        return self._publish(
+            title, display_format,
+            lambda: self._build_story(summary_content, display_format),
+            on_stage=on_stage, image=image, base_url=base_url
+        )
 
-            story.append(Spacer(1, 12))
+    def create_combined_pdf(self, documents, title, on_stage=None, base_url=None):
+        """
+        One PDF holding several summaries, each under its own heading, for
+        batch requests. `documents` are dicts with 'title' and either
+        'summary' and 'display_format', or just 'pdf_url' when only the
+        individual PDF is available (summary cache hits); those are linked.
+        """
+        display_format = {
+            'type': 'sections',
+            'style': next((d['display_format'].get('style') for d in documents if d.get('display_format')), None),
+            'image_query': ' '.join(d['title'] for d in documents)
+        }
+        return self._publish(
+            title, display_format,
+            lambda: self._build_combined_story(documents, display_format),
+            on_stage=on_stage, base_url=base_url
+        )
 
-            # Add image at the top if available
-            image_path = self._get_unsplash_image(display_format.get('image_query', 'document'))
-            if image_path:
-                img = Image(image_path)
-                img.drawHeight = 4 * inch
-                img.drawWidth = 6 * inch
-                story.append(img)
-                story.append(Spacer(1, 12))
-
-            # Format content based on display type
-            if display_format['type'] == 'sections':
-                for section in display_format['sections']:
-                    # Section header
-                    header_style = ParagraphStyle(
-                        'SectionHeader',
-                        parent=self.styles['Heading2'],
-                        fontName=self.font_name,
-                        fontSize=16,
-                        spaceAfter=4,  # Reduced spacing
-                        textColor=colors.HexColor(display_format['style']['colors'].get('headers', '#000000')),  # Headers Color
-                        leading=18  # Increased leading
-                    )
-                    story.append(Paragraph(section['title'], header_style))
-                    story.append(Spacer(1, 2))
-
-                    # Section content
-                    # Split the content into lines and format each as a paragraph
-                    lines = section['content'].split('\n')
-                    for line in lines:
-                        story.append(Paragraph(line.strip(), self.custom_style))
-                    story.append(Spacer(1, 10))  # Reduced spacing
-
-            else:  # Default paragraph format
-                story.append(Paragraph(summary_content, self.custom_style))
-
-            # Metadata is passed directly during doc creation.
-            doc.build(story)
+    def _publish(self, title, display_format, build_story, on_stage=None, image=None, base_url=None):
+        """Render the header image and `build_story()` body, then store it; returns the URL or None."""
+        try:
+            if on_stage:
+                on_stage('rendering')
 
-            # Upload to Cloudinary with error handling and retry
-            try:
-                # First attempt
-                response = self._upload_to_cloudinary(output_path, safe_title, unique_id)
-                if response:
-                    return response['secure_url']
+            graph = build_graph('render')
+            graph.add('image', lambda: self._get_header_image(display_format.get('image_query', 'document'), image),
+                      required=False)
+            graph.add('story', build_story)
+            graph.add('render', lambda image_data, story: self._render(title, display_format, image_data, story),
+                      deps=['image', 'story'])
+            output = graph.run()['render']
 
-                # Retry with different parameters if first attempt failed
-                logging.warning("First Cloudinary upload attempt failed. Retrying with modified parameters...")
-                response = self._upload_to_cloudinary(output_path, f"summary_{unique_id}", unique_id, retry=True)
-                if response:
-                    return response['secure_url']
+            if on_stage:
+                on_stage('uploading')
 
-                return None
+            # Stored in the background; the URL is stable either way
+            try:
+                return storage.save(output, storage_name(title), base_url=base_url)
             except Exception as e:
-                logging.error(f"Cloudinary upload error: {e}")
+                logging.error(f"PDF storage error: {e}")
                 return None
 
         except Exception as e:
             logging.error(f"PDF generation error: {e}")
             return None
 
-    # In pdf_generator.py, modify the _upload_to_cloudinary method:
-    def _upload_to_cloudinary(self, file_path, title, unique_id, retry=False):
-        try:
-            options = {
-                "folder": "SycX Files",
-                "public_id": f"{title}_{unique_id}",
-                "resource_type": "auto",
-                "overwrite": True,
-                "context": {"author": "SycX AI"}  # Add author in context
-            }
-
-            # Remove problematic retry parameters
-            response = cloudinary.uploader.upload(file_path, **options)
-
-            if 'secure_url' not in response:
-                logging.error(f"Cloudinary response: {response}")
-                return None
+    def _build_story(self, summary_content, display_format):
+        """Body flowables (everything below the header image)."""
+        story = []
+        template = self.context.template(display_format.get('style'))
+
+        # Format content based on display type
+        if display_format['type'] == 'sections':
+            for section in display_format['sections']:
+                # Section header
+                story.append(Paragraph(section['title'], template['header']))
+                story.append(Spacer(1, 2))
+
+                # Section content
+                # Split the content into lines and format each as a paragraph
+                lines = section['content'].split('\n')
+                for line in lines:
+                    story.append(Paragraph(line.strip(), self.custom_style))
+                story.append(Spacer(1, 10))  # Reduced spacing
+
+        else:  # Default paragraph format
+            story.append(Paragraph(summary_content, self.custom_style))
+
+        return story
+
+    def _build_combined_story(self, documents, display_format):
+        story = []
+        template = self.context.template(display_format.get('style'))
+        for index, document in enumerate(documents):
+            if index:
+                story.append(PageBreak())
+            story.append(Paragraph(document['title'], template['title']))
+            story.append(Spacer(1, 6))
+            if document.get('display_format'):
+                story.extend(self._build_story(document.get('summary', ''), document['display_format']))
+            else:
+                url = escape(document['pdf_url'])
+                story.append(Paragraph(f'Summary: <link href="{url}">{url}</link>', self.custom_style))
+        return story
+
+    def _render(self, title, display_format, image_data, body):
+        """Lay out title, author, header image and body into an in-memory PDF."""
+        output = BytesIO()
+
+        # Creation date for metadata
+        creation_date = datetime.datetime.now()
+
+        doc = SimpleDocTemplate(output, pagesize=letter,
+                              author="SycX AI",  # Setting Author
+                              title=title,        # Setting Title
+                              subject="AI Generated Summary",  # Setting Subject
+                              keywords=["AI", "Summary", "Document"], # Setting keywords
+                              creationdate=creation_date) # Setting creation date
+
+        template = self.context.template(display_format.get('style'))
+
+        # Add title
+        story = [Paragraph(title, template['title'])]
+
+        # Add author
+        story.append(Paragraph("SycX AI", self.context.author_style))  # Adding the author
+
+        story.append(Spacer(1, 12))
+
+        # Add image at the top if available
+        if image_data:
+            img = Image(image_data)
+            img.drawHeight = 4 * inch
+            img.drawWidth = 6 * inch
+            story.append(img)
+            story.append(Spacer(1, 12))
 
-            return response
-        except Exception as e:
-            logging.error(f"Cloudinary upload error: {str(e)}")
-            return None
\ No newline at end of file
+        story.extend(body)
+
+        # Metadata is passed directly during doc creation.
+        with stage('render') as record:
+            doc.build(story)
+            record.size = output.getbuffer().nbytes
+        return output
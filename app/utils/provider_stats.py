@@ -0,0 +1,196 @@
+import time
+import threading
+from collections import deque
+from flask import current_app
+
+_registry_lock = threading.Lock()
+
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+
+class LatencyStats:
+    """Rolling latency and error statistics for one provider or model."""
+
+    def __init__(self, alpha=0.3, window=200):
+        self.alpha = alpha
+        self.samples = deque(maxlen=window)
+        self.ewma_latency = None
+        self.ewma_error = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.last_error = None
+
+    def record(self, latency, ok, error=None):
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+        self.ewma_error = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.ewma_error
+        self.samples.append(latency)
+        if ok:
+            self.successes += 1
+        else:
+            self.failures += 1
+            self.last_error = error
+
+    def percentile(self, pct):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `cooldown` seconds, then lets a single trial call through.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+
+    def allow(self):
+        now = time.time()
+        if self.state == BREAKER_CLOSED:
+            return True
+        if self.state == BREAKER_OPEN and now - self.opened_at >= self.cooldown:
+            self.state = BREAKER_HALF_OPEN
+            self.trial_started_at = None
+        if self.state == BREAKER_HALF_OPEN:
+            # A trial that never reported back must not wedge the breaker
+            if self.trial_started_at is None or now - self.trial_started_at >= self.cooldown:
+                self.trial_started_at = now
+                return True
+        return False
+
+    def record(self, ok):
+        if ok:
+            self.state = BREAKER_CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            return
+        self.consecutive_failures += 1
+        if self.state == BREAKER_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = BREAKER_OPEN
+            self.opened_at = time.time()
+
+
+class ProviderStatsRegistry:
+    """
+    Thread-safe per-worker registry of LatencyStats and CircuitBreakers,
+    keyed by candidate name ('gemini', 'openai', 'huggingface/<model>').
+    """
+
+    def __init__(self, alpha=0.3, window=200, prior_latency=5.0, failure_penalty=30.0,
+                 failure_threshold=3, cooldown=60.0):
+        self.alpha = alpha
+        self.window = window
+        self.prior_latency = prior_latency
+        self.failure_penalty = failure_penalty
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = (
+                LatencyStats(alpha=self.alpha, window=self.window),
+                CircuitBreaker(failure_threshold=self.failure_threshold, cooldown=self.cooldown)
+            )
+            self._entries[name] = entry
+        return entry
+
+    def allow(self, name):
+        with self._lock:
+            return self._entry(name)[1].allow()
+
+    def record(self, name, latency, ok, error=None):
+        with self._lock:
+            stats, breaker = self._entry(name)
+            stats.record(latency, ok, error)
+            breaker.record(ok)
+
+    def expected_latency(self, name):
+        """
+        Cost used for ordering: smoothed latency plus a penalty weighted by
+        the smoothed error rate, since a failure costs its latency and
+        another attempt elsewhere.
+        """
+        with self._lock:
+            stats = self._entry(name)[0]
+            latency = stats.ewma_latency if stats.ewma_latency is not None else self.prior_latency
+            return latency + stats.ewma_error * self.failure_penalty
+
+    def percentile(self, name, pct):
+        with self._lock:
+            return self._entry(name)[0].percentile(pct)
+
+    def sample_count(self, name):
+        with self._lock:
+            return len(self._entry(name)[0].samples)
+
+    def order(self, names):
+        """Sort names by expected latency, keeping configured order on ties."""
+        indexed = list(enumerate(names))
+        indexed.sort(key=lambda item: (self.expected_latency(item[1]), item[0]))
+        return [name for _, name in indexed]
+
+    def snapshot(self):
+        with self._lock:
+            names = list(self._entries.keys())
+        result = {}
+        for name in names:
+            with self._lock:
+                stats, breaker = self._entries[name]
+                result[name] = {
+                    'ewma_latency': _round(stats.ewma_latency),
+                    'error_rate': round(stats.ewma_error, 3),
+                    'p50': _round(stats.percentile(50)),
+                    'p95': _round(stats.percentile(95)),
+                    'p99': _round(stats.percentile(99)),
+                    'successes': stats.successes,
+                    'failures': stats.failures,
+                    'last_error': stats.last_error,
+                    'circuit': breaker.state,
+                    'consecutive_failures': breaker.consecutive_failures,
+                }
+            result[name]['expected_latency'] = round(self.expected_latency(name), 3)
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+def get_provider_stats():
+    """Return the ProviderStatsRegistry of the current app, creating it once."""
+    registry = current_app.extensions.get('sycx_provider_stats')
+    if registry is None:
+        with _registry_lock:
+            registry = current_app.extensions.get('sycx_provider_stats')
+            if registry is None:
+                config = current_app.config
+                registry = ProviderStatsRegistry(
+                    alpha=config.get('AI_ROUTER_EWMA_ALPHA', 0.3),
+                    window=config.get('AI_ROUTER_WINDOW', 200),
+                    prior_latency=config.get('AI_ROUTER_PRIOR_LATENCY', 5.0),
+                    failure_penalty=config.get('AI_ROUTER_FAILURE_PENALTY', 30.0),
+                    failure_threshold=config.get('AI_BREAKER_FAILURE_THRESHOLD', 3),
+                    cooldown=config.get('AI_BREAKER_COOLDOWN', 60.0),
+                )
+                current_app.extensions['sycx_provider_stats'] = registry
+    return registry
@@ -0,0 +1,388 @@
+import os
+import math
+import time
+import logging
+import sqlite3
+import threading
+from collections import namedtuple
+from flask import current_app
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'retry_after'])
+
+
+def sliding_window(start, current, previous, now, period):
+    """
+    Roll a sliding-window counter forward to `now`.
+
+    Windows are aligned to multiples of `period`. The request rate is
+    estimated as the current window's count plus the previous window's
+    count weighted by how much of it still overlaps the sliding window.
+    Returns (start, current, previous, estimate).
+    """
+    window_start = now - now % period
+    if start != window_start:
+        previous = current if window_start - start == period else 0
+        current = 0
+        start = window_start
+    weight = 1.0 - (now - start) / period
+    return start, current, previous, previous * weight + current
+
+
+def retry_after(start, current, previous, now, period, limit, cost=1):
+    """Seconds until `cost` more requests would fit under `limit`."""
+    elapsed = now - start
+    if current + cost <= limit:
+        if previous <= 0:
+            return 0.0
+        # The previous window's share decays linearly over this window
+        return max(0.0, period * (1.0 - (limit - current - cost) / previous) - elapsed)
+    # Only the next window can admit it; by then this window is "previous"
+    wait_next = period * (1.0 - (limit - cost) / current) if current else 0.0
+    return (period - elapsed) + max(0.0, wait_next)
+
+
+def _result(allowed, limit, estimate, wait):
+    remaining = max(0, int(limit - estimate))
+    return RateLimitResult(allowed, limit, remaining, 0 if allowed else max(1, math.ceil(wait)))
+
+
+# ---------------------------------------------------------------------------
+# Backends
+#
+# Every backend exposes hit(key, limit, period, cost=1) -> RateLimitResult,
+# refund(key, period, cost=1) to give back an allowed hit, and keeps
+# constant state per key: window start, current and previous count.
+# ---------------------------------------------------------------------------
+
+class _Shard:
+    __slots__ = ('lock', 'counters', 'hits')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.hits = 0
+
+
+class MemoryRateLimitBackend:
+    """
+    In-process counters split across `shards` independently locked dicts,
+    so concurrent requests for different keys rarely contend. Keys idle
+    for two full periods carry no information and are swept periodically.
+    Local to a single gunicorn worker.
+    """
+
+    def __init__(self, shards=16, sweep_every=1024):
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        self.sweep_every = sweep_every
+
+    def hit(self, key, limit, period, cost=1):
+        now = time.time()
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            counter = shard.counters.get(key)
+            if counter is None:
+                counter = [now - now % period, 0, 0, period]
+                shard.counters[key] = counter
+
+            start, current, previous, estimate = sliding_window(counter[0], counter[1], counter[2], now, period)
+            allowed = estimate + cost <= limit
+            if allowed:
+                current += cost
+                estimate += cost
+            counter[:] = [start, current, previous, period]
+
+            shard.hits += 1
+            if shard.hits % self.sweep_every == 0:
+                self._sweep(shard, now)
+
+        wait = 0.0 if allowed else retry_after(start, current, previous, now, period, limit, cost)
+        return _result(allowed, limit, estimate, wait)
+
+    def refund(self, key, period, cost=1):
+        now = time.time()
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            counter = shard.counters.get(key)
+            if counter is not None and counter[0] == now - now % period:
+                counter[1] = max(0, counter[1] - cost)
+
+    @staticmethod
+    def _sweep(shard, now):
+        idle = [k for k, c in shard.counters.items() if now - c[0] >= 2 * c[3]]
+        for key in idle:
+            del shard.counters[key]
+
+    def __len__(self):
+        return sum(len(shard.counters) for shard in self._shards)
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.counters.clear()
+
+
+class SQLiteRateLimitBackend:
+    """
+    Counters in a SQLite table shared by every worker on the same host.
+
+    Each hit is a single IMMEDIATE transaction, so the read-modify-write is
+    atomic across processes. Expired rows are deleted every `sweep_every`
+    hits.
+    """
+
+    def __init__(self, path, table='rate_limits', sweep_every=1024):
+        self.path = path
+        self.table = table
+        self.sweep_every = sweep_every
+        self._hits = 0
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, window_start REAL NOT NULL, "
+            "current INTEGER NOT NULL, previous INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_expires "
+            f"ON {self.table} (expires_at)"
+        )
+
+    def _connect(self):
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly in hit()
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, limit, period, cost=1):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                f"SELECT window_start, current, previous FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            start, current, previous = row if row else (now - now % period, 0, 0)
+
+            start, current, previous, estimate = sliding_window(start, current, previous, now, period)
+            allowed = estimate + cost <= limit
+            if allowed:
+                current += cost
+                estimate += cost
+
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} "
+                "(key, window_start, current, previous, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, start, current, previous, start + 2 * period)
+            )
+
+            self._hits += 1
+            if self._hits % self.sweep_every == 0:
+                conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        wait = 0.0 if allowed else retry_after(start, current, previous, now, period, limit, cost)
+        return _result(allowed, limit, estimate, wait)
+
+    def refund(self, key, period, cost=1):
+        now = time.time()
+        self._connect().execute(
+            f"UPDATE {self.table} SET current = MAX(0, current - ?) WHERE key = ? AND window_start = ?",
+            (cost, key, now - now % period)
+        )
+
+    def clear(self):
+        self._connect().execute(f"DELETE FROM {self.table}")
+
+
+class RedisRateLimitBackend:
+    """
+    Counters in Redis (or any server speaking its protocol) shared by every
+    worker on every host. One key per fixed window, expiring after two
+    periods, so idle keys disappear on their own. Needs the `redis` package.
+    """
+
+    def __init__(self, url, prefix='sycx:rl:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def hit(self, key, limit, period, cost=1):
+        now = time.time()
+        index = int(now // period)
+        current_key = f"{self.prefix}{key}:{index}"
+        previous_key = f"{self.prefix}{key}:{index - 1}"
+
+        # Count optimistically and give the slot back if it was over the limit
+        pipe = self.client.pipeline()
+        pipe.incrby(current_key, cost)
+        pipe.expire(current_key, int(2 * period) + 1)
+        pipe.get(previous_key)
+        current, _, previous = pipe.execute()
+        previous = int(previous or 0)
+
+        start = index * period
+        weight = 1.0 - (now - start) / period
+        estimate = previous * weight + current
+        allowed = estimate <= limit
+        if not allowed:
+            self.client.decrby(current_key, cost)
+            current -= cost
+            estimate -= cost
+
+        wait = 0.0 if allowed else retry_after(start, current, previous, now, period, limit, cost)
+        return _result(allowed, limit, estimate, wait)
+
+    def refund(self, key, period, cost=1):
+        current_key = f"{self.prefix}{key}:{int(time.time() // period)}"
+        if self.client.exists(current_key):
+            self.client.decrby(current_key, cost)
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+
+def build_rate_limit_backend(kind, path=None, redis_url=None, shards=16):
+    """Build a backend by name: 'memory', 'sqlite' or 'redis'."""
+    kind = (kind or 'memory').lower()
+    if kind == 'sqlite':
+        return SQLiteRateLimitBackend(path)
+    if kind == 'redis':
+        return RedisRateLimitBackend(redis_url)
+    return MemoryRateLimitBackend(shards=shards)
+
+
+# ---------------------------------------------------------------------------
+# Limiter
+# ---------------------------------------------------------------------------
+
+def parse_route_limits(spec, default_period):
+    """
+    Parse RATE_LIMIT_ROUTES, e.g. "summarize=100/15,health=600", into
+    {scope: (limit, period_seconds)}. Periods are in minutes and default to
+    RATE_LIMIT_PERIOD.
+    """
+    limits = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        scope, value = item.split('=', 1)
+        limit, _, minutes = value.partition('/')
+        try:
+            period = float(minutes) * 60 if minutes.strip() else default_period
+            limits[scope.strip()] = (int(limit), period)
+        except ValueError:
+            logging.warning(f"Ignoring malformed rate limit rule: {item!r}")
+    return limits
+
+
+class RateLimiter:
+    """
+    Sliding-window rate limiter with per-scope and per-user quotas.
+
+    Each decorated route belongs to a scope; scopes listed in
+    RATE_LIMIT_ROUTES get their own per-IP budget, everything else shares
+    RATE_LIMIT per RATE_LIMIT_PERIOD. Scopes can additionally enforce
+    RATE_LIMIT_USER per user, identified only by RATE_LIMIT_USER_HEADER as
+    set by an authenticating proxy; the user_id form field is chosen by the
+    client and never counted. If the shared backend fails, requests are let
+    through rather than turning an outage into 500s.
+    """
+
+    def __init__(self):
+        # Backend is created lazily because current_app may not be ready
+        self._backend = None
+        self._routes = (None, {})
+        self._lock = threading.Lock()
+
+    def _get_backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    config = current_app.config
+                    try:
+                        self._backend = build_rate_limit_backend(
+                            config.get('RATE_LIMIT_BACKEND', 'memory'),
+                            path=config.get('RATE_LIMIT_PATH'),
+                            redis_url=config.get('RATE_LIMIT_REDIS_URL'),
+                            shards=config.get('RATE_LIMIT_SHARDS', 16)
+                        )
+                    except Exception as e:
+                        logging.warning(f"Shared rate limit backend unavailable, using memory: {str(e)}")
+                        self._backend = MemoryRateLimitBackend(shards=config.get('RATE_LIMIT_SHARDS', 16))
+        return self._backend
+
+    def limits_for(self, scope):
+        """(limit, period_seconds) for a scope's per-IP budget."""
+        config = current_app.config
+        default_period = config['RATE_LIMIT_PERIOD'].total_seconds()
+        spec = config.get('RATE_LIMIT_ROUTES', '')
+        if self._routes[0] != spec:
+            self._routes = (spec, parse_route_limits(spec, default_period))
+        return self._routes[1].get(scope, (config['RATE_LIMIT'], default_period))
+
+    @staticmethod
+    def trusted_user_id(headers):
+        """The caller's identity from RATE_LIMIT_USER_HEADER, or None when unset or absent."""
+        header = current_app.config.get('RATE_LIMIT_USER_HEADER')
+        return (headers.get(header) or None) if header else None
+
+    def user_limits_for(self, scope):
+        config = current_app.config
+        _, period = self.limits_for(scope)
+        return config.get('RATE_LIMIT_USER', 0), period
+
+    def hit(self, key, limit, period, cost=1):
+        try:
+            return self._get_backend().hit(key, limit, period, cost)
+        except Exception as e:
+            logging.warning(f"Rate limit check failed for {key}: {str(e)}")
+            return RateLimitResult(True, limit, limit, 0)
+
+    def refund(self, key, period, cost=1):
+        try:
+            self._get_backend().refund(key, period, cost)
+        except Exception as e:
+            logging.warning(f"Rate limit refund failed for {key}: {str(e)}")
+
+    def check(self, scope, ip, user_id=None):
+        """
+        Count one request against the scope's IP budget and, when a user_id
+        is given and RATE_LIMIT_USER is set, the user's budget. Returns the
+        first exhausted RateLimitResult, or the IP result if all allow it.
+        A request the user budget rejects gives its IP hit back, so it does
+        not also cost the caller's IP budget.
+        """
+        limit, period = self.limits_for(scope)
+        ip_key = f"{scope}:ip:{ip}"
+        result = self.hit(ip_key, limit, period)
+        if not result.allowed or not user_id:
+            return result
+
+        user_limit, user_period = self.user_limits_for(scope)
+        if user_limit:
+            user_result = self.hit(f"{scope}:user:{user_id}", user_limit, user_period)
+            if not user_result.allowed:
+                self.refund(ip_key, period)
+                return user_result
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._backend = None
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,182 @@
+import re
+from functools import lru_cache
+
+# Sentences containing one of these start a new section (when the text has
+# no structural headings of its own)
+DEFAULT_MARKERS = (
+    'introduction', 'overview', 'summary', 'background', 'conclusion', 'first',
+    'second', 'third', 'finally', 'next', 'moreover', 'furthermore'
+)
+
+DEFAULT_SECTION_TITLE = 'Introduction'
+
+# A heading needs at least this many found in the text to be trusted
+MIN_STRUCTURAL_HEADINGS = 2
+MAX_HEADING_CHARS = 80
+MAX_HEADING_WORDS = 10
+
+_BLOCK_SPLIT = re.compile(r'\n[ \t]*\n+')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+(?=["\'(\[]?[A-Z0-9])')
+_HEADING_PREFIX = re.compile(r'^\s*(?:#{1,6}\s*|\*\*|(?:\d{1,2}|[IVXivx]{1,4}|[A-Za-z])[.)]\s+)')
+_HEADING_SUFFIX = re.compile(r'(?:\*\*|:)\s*$')
+_MINOR_WORDS = frozenset(
+    'a an and as at but by for from in into of on or the to vs via with'.split()
+)
+
+
+def _trie_pattern(words):
+    """
+    Regex source for `words` factored into a prefix trie, so each position
+    follows a single branch instead of trying every alternative in turn.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        end = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            # Longer match first; the trailing \b backtracks to the shorter one
+            return '(?:' + body + ')?' if len(branches) > 1 or len(body) > 1 else body + '?'
+        return body
+
+    return build(trie)
+
+
+@lru_cache(maxsize=256)
+def compile_markers(markers):
+    """
+    One regex matching any marker as a whole word or phrase in lowercased
+    text (IGNORECASE is several times slower here), built as a prefix trie
+    rather than a flat alternation so the cost stays flat as LLM-suggested
+    markers are added. Cached per marker tuple.
+    """
+    cleaned = {m.strip().lower() for m in markers if m and m.strip()}
+    if not cleaned:
+        return None
+    return re.compile(r'\b' + _trie_pattern(cleaned) + r'\b')
+
+
+def split_sentences(text):
+    return [s.strip() for s in _SENTENCE_SPLIT.split(text) if s.strip()]
+
+
+def clean_heading(line):
+    line = _HEADING_PREFIX.sub('', line.strip())
+    return _HEADING_SUFFIX.sub('', line).strip(' *#')
+
+
+def is_heading(line):
+    """
+    Structural heading test for a single line: markdown or numbered
+    headings, or a short line without sentence punctuation that is title
+    case, ALL CAPS or ends with a colon.
+    """
+    raw = line.strip()
+    if not raw or len(raw) > MAX_HEADING_CHARS:
+        return False
+    if raw.startswith('#'):
+        return True
+
+    title = clean_heading(raw)
+    words = title.split()
+    if not words or len(words) > MAX_HEADING_WORDS or title[-1] in '.!?,;':
+        return False
+    if raw.endswith(':') or (raw.startswith('**') and raw.endswith('**')):
+        return True
+    if title.isupper() and any(c.isalpha() for c in title):
+        return True
+
+    significant = [w for w in words if w.lower() not in _MINOR_WORDS and w[0].isalpha()]
+    if not significant:
+        return False
+    capitalized = sum(1 for w in significant if w[0].isupper())
+    return capitalized == len(significant) and (len(words) > 1 or len(title) > 3)
+
+
+def _structural_blocks(text):
+    """Yield ('heading', title) / ('content', paragraph) from blank-line blocks."""
+    for block in _BLOCK_SPLIT.split(text.strip()):
+        lines = [line for line in block.splitlines() if line.strip()]
+        if not lines:
+            continue
+        if is_heading(lines[0]):
+            yield 'heading', clean_heading(lines[0])
+            lines = lines[1:]
+        if lines:
+            yield 'content', ' '.join(line.strip() for line in lines)
+
+
+def has_structure(text):
+    headings = 0
+    for kind, _ in _structural_blocks(text):
+        if kind == 'heading':
+            headings += 1
+            if headings >= MIN_STRUCTURAL_HEADINGS:
+                return True
+    return False
+
+
+def _segment_structural(text):
+    sections = []
+    title, paragraphs = DEFAULT_SECTION_TITLE, []
+    for kind, value in _structural_blocks(text):
+        if kind == 'heading':
+            if paragraphs:
+                sections.append({'title': title, 'content': '\n'.join(paragraphs)})
+            title, paragraphs = value, []
+        else:
+            paragraphs.append(value)
+    if paragraphs:
+        sections.append({'title': title, 'content': '\n'.join(paragraphs)})
+    return sections
+
+
+def _segment_by_markers(text, markers):
+    pattern = compile_markers(tuple(DEFAULT_MARKERS) + tuple(markers or ()))
+    sections = []
+    title, content = DEFAULT_SECTION_TITLE, []
+    for sentence in split_sentences(text):
+        # A marker sentence right after another one becomes its content
+        # rather than replacing (and dropping) it
+        if pattern is not None and pattern.search(sentence.lower()) and (content or title == DEFAULT_SECTION_TITLE):
+            if content:
+                sections.append({'title': title, 'content': ' '.join(content)})
+            title, content = sentence, []
+        else:
+            content.append(sentence)
+    if content:
+        sections.append({'title': title, 'content': ' '.join(content)})
+    elif title != DEFAULT_SECTION_TITLE:
+        # Trailing marker sentence with nothing after it
+        if sections:
+            sections[-1]['content'] += ' ' + title
+        else:
+            sections.append({'title': DEFAULT_SECTION_TITLE, 'content': title})
+    return sections
+
+
+def segment_sections(text, markers=None):
+    """
+    Split a summary into [{'title', 'content'}] sections in a single pass.
+
+    Text with its own headings (at least MIN_STRUCTURAL_HEADINGS) is split on
+    them, keeping paragraphs as separate lines of content. Otherwise every
+    sentence that mentions a marker (DEFAULT_MARKERS plus `markers`) starts a
+    new section titled by that sentence. Never returns an empty list for
+    non-empty text.
+    """
+    if not text or not text.strip():
+        return []
+    if has_structure(text):
+        sections = _segment_structural(text)
+    else:
+        sections = _segment_by_markers(text, markers)
+    return sections or [{'title': DEFAULT_SECTION_TITLE, 'content': ' '.join(text.split())}]
@@ -0,0 +1,168 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from flask import current_app
+from app.utils.helpers import with_app_context
+
+# Shared by every graph in the worker; created on first run
+_pool_lock = threading.Lock()
+_pool = None
+
+
+def get_stage_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('STAGE_WORKERS', 16),
+                    thread_name_prefix='sycx-stage'
+                )
+    return _pool
+
+
+def parse_timeouts(spec):
+    """Parse STAGE_TIMEOUTS, e.g. "title=30,image=10", into {stage: seconds}."""
+    timeouts = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        name, value = item.split('=', 1)
+        try:
+            timeouts[name.strip()] = float(value)
+        except ValueError:
+            logging.warning(f"Ignoring malformed stage timeout: {item!r}")
+    return timeouts
+
+
+class StageTimeoutError(TimeoutError):
+    def __init__(self, stage, timeout):
+        super().__init__(f"Stage '{stage}' timed out after {timeout:g}s")
+        self.stage = stage
+
+
+class Stage:
+    __slots__ = ('name', 'func', 'deps', 'required', 'default', 'timeout')
+
+    def __init__(self, name, func, deps, required, default, timeout):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.required = required
+        self.default = default
+        self.timeout = timeout
+
+
+class StageGraph:
+    """
+    A small DAG of pipeline stages run on the shared stage pool.
+
+    Each stage is called with its dependencies' results as positional
+    arguments, in the order listed, and starts as soon as they are all
+    available, so independent stages overlap. Stages must be added after
+    their dependencies, which keeps the graph acyclic by construction.
+
+    A failing or timed-out optional stage (required=False) is replaced by
+    its `default`. When a required stage fails, stages not yet started are
+    cancelled, `cancelled` is set for running stages that poll it, and the
+    error is raised: the original exception, or StageTimeoutError. Threads
+    cannot be killed, so a timed-out stage is abandoned rather than stopped.
+    """
+
+    def __init__(self, name, timeouts=None, default_timeout=None):
+        self.name = name
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.cancelled = threading.Event()
+        self.timings = {}
+        self._stages = OrderedDict()
+
+    def add(self, name, func, deps=(), required=True, default=None, timeout=None):
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        if timeout is None:
+            timeout = self.timeouts.get(name, self.default_timeout)
+        self._stages[name] = Stage(name, func, deps, required, default, timeout)
+        return self
+
+    def _call(self, stage, args):
+        if self.cancelled.is_set():
+            raise RuntimeError(f"Stage '{stage.name}' cancelled")
+        started = time.perf_counter()
+        try:
+            return stage.func(*args)
+        finally:
+            self.timings[stage.name] = round(time.perf_counter() - started, 4)
+
+    def run(self):
+        """Run every stage and return {stage name: result}."""
+        pool = get_stage_pool()
+        results = {}
+        waiting = list(self._stages)
+        running = {}  # future -> (stage, deadline)
+
+        try:
+            while waiting or running:
+                for name in list(waiting):
+                    stage = self._stages[name]
+                    if all(dep in results for dep in stage.deps):
+                        waiting.remove(name)
+                        args = [results[dep] for dep in stage.deps]
+                        future = pool.submit(with_app_context(self._call), stage, args)
+                        deadline = time.monotonic() + stage.timeout if stage.timeout else None
+                        running[future] = (stage, deadline)
+
+                if not running:
+                    # Only possible if a dependency never produced a result
+                    raise RuntimeError(f"Stages {waiting} in '{self.name}' cannot be scheduled")
+
+                deadlines = [d for _, d in running.values() if d is not None]
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                finished, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in finished:
+                    stage, _ = running.pop(future)
+                    try:
+                        results[stage.name] = future.result()
+                    except Exception as e:
+                        results[stage.name] = self._failed(stage, e)
+
+                now = time.monotonic()
+                for future, (stage, deadline) in list(running.items()):
+                    if deadline is not None and now >= deadline:
+                        del running[future]
+                        future.cancel()
+                        results[stage.name] = self._failed(stage, StageTimeoutError(stage.name, stage.timeout))
+        except BaseException:
+            self.cancelled.set()
+            for future in running:
+                future.cancel()
+            raise
+        finally:
+            if self.timings:
+                logging.info(
+                    f"{self.name} stages: " +
+                    ", ".join(f"{name}={seconds:.2f}s" for name, seconds in self.timings.items())
+                )
+
+        return results
+
+    def _failed(self, stage, error):
+        if stage.required:
+            logging.error(f"Required stage '{stage.name}' of '{self.name}' failed: {str(error)}")
+            raise error
+        logging.warning(f"Optional stage '{stage.name}' of '{self.name}' failed, using default: {str(error)}")
+        return stage.default
+
+
+def build_graph(name):
+    """StageGraph with timeouts from STAGE_TIMEOUTS / STAGE_TIMEOUT_DEFAULT."""
+    config = current_app.config
+    return StageGraph(
+        name,
+        timeouts=parse_timeouts(config.get('STAGE_TIMEOUTS', '')),
+        default_timeout=config.get('STAGE_TIMEOUT_DEFAULT') or None
+    )
@@ -0,0 +1,67 @@
+"""
+Worker start-up cost.
+
+Document parsers, PDF rendering and the provider SDKs are imported where
+they are first used, so booting a worker (and serving /health) does not
+load them. Two hooks move that cost back to a moment of our choosing:
+
+- preload_modules() imports them up front. With gunicorn's preload_app the
+  master does this once before forking, and every worker shares the pages
+  copy-on-write instead of importing its own copy on its first request.
+- check_modules() is run at build time (scripts/check_build.py) so a
+  missing dependency still fails the deploy rather than the first upload.
+"""
+import time
+import shutil
+import logging
+import importlib
+
+# Imported lazily by the code that uses them
+HEAVY_MODULES = (
+    'pdfminer.converter',
+    'pdfminer.pdfinterp',
+    'pdfminer.pdfpage',
+    'docx',
+    'pptx',
+    'openpyxl',
+    'numpy',
+    'pytesseract',
+    'pdf2image',
+    'reportlab.platypus',
+    'cloudinary.uploader',
+    'openai',
+    'google.genai',
+    'app.utils.table_profiler',
+    'app.utils.pdf_generator',
+)
+
+# External programs the OCR path shells out to
+REQUIRED_BINARIES = ('tesseract', 'pdftoppm')
+
+
+def preload_modules(app):
+    """Import every lazily loaded module and build the PDF rendering context."""
+    started = time.perf_counter()
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logging.warning(f"Preload skipped {name}: {str(e)}")
+
+    from app.utils.pdf_generator import init_rendering
+    init_rendering(app)
+    logging.info(f"Preloaded {len(HEAVY_MODULES)} modules in {time.perf_counter() - started:.2f}s")
+
+
+def check_modules():
+    """Return a list of problems: modules that fail to import and missing binaries."""
+    problems = []
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            problems.append(f"module {name}: {str(e)}")
+    for binary in REQUIRED_BINARIES:
+        if shutil.which(binary) is None:
+            problems.append(f"binary {binary}: not found on PATH")
+    return problems
@@ -0,0 +1,530 @@
+import os
+import re
+import time
+import asyncio
+import random
+import shutil
+import sqlite3
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, request, has_request_context
+from app.utils.ai_clients import get_async_client_registry
+from app.utils.helpers import with_app_context, run_in_thread
+from app.utils.job_queue import owner_alive, process_token, ensure_owner_token_column
+from app.utils.metrics import stage, observe_stage
+
+UPLOAD_PENDING = 'pending'
+UPLOAD_DONE = 'done'
+UPLOAD_FAILED = 'failed'
+
+_KEY_UNSAFE = re.compile(r'[^A-Za-z0-9._-]+')
+
+_cloudinary_lock = threading.Lock()
+_cloudinary_fingerprint = None
+
+
+class StorageError(Exception):
+    pass
+
+
+def safe_key(name):
+    """Storage key usable as a file name, Cloudinary public id and URL segment."""
+    return _KEY_UNSAFE.sub('_', name).strip('._') or 'document'
+
+
+def _configure_cloudinary(config):
+    """cloudinary.config is process-global; only reapply it when it changes."""
+    global _cloudinary_fingerprint
+    import cloudinary
+
+    fingerprint = (
+        config['CLOUDINARY_CLOUD_NAME'],
+        config['CLOUDINARY_API_KEY'],
+        config['CLOUDINARY_API_SECRET']
+    )
+    if fingerprint != _cloudinary_fingerprint:
+        with _cloudinary_lock:
+            cloudinary.config(
+                cloud_name=fingerprint[0],
+                api_key=fingerprint[1],
+                api_secret=fingerprint[2]
+            )
+            _cloudinary_fingerprint = fingerprint
+
+
+def _write_atomic(buffer, path):
+    """Copy a file-like object to `path` via a temp file in the same directory."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            buffer.seek(0)
+            shutil.copyfileobj(buffer, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+# ---------------------------------------------------------------------------
+# Backends
+#
+# A backend stores a staged file under a key and returns its public URL,
+# or None when the file is served from this host through /api/v1/files.
+# ---------------------------------------------------------------------------
+
+class CloudinaryStorage:
+    name = 'cloudinary'
+    remote = True
+
+    def __init__(self, folder='SycX Files', chunk_threshold=20 * 1024 * 1024, chunk_size=6 * 1024 * 1024):
+        self.folder = folder
+        self.chunk_threshold = chunk_threshold
+        self.chunk_size = chunk_size
+
+    def _options(self, key):
+        return {
+            "folder": self.folder,
+            "public_id": key,
+            "resource_type": "auto",
+            "overwrite": True,
+            "filename": f"{key}.pdf",
+            "context": {"author": "SycX AI"}
+        }
+
+    def put(self, path, key):
+        import cloudinary.uploader
+
+        _configure_cloudinary(current_app.config)
+        options = self._options(key)
+        if os.path.getsize(path) > self.chunk_threshold:
+            # Chunked upload: a dropped connection only costs the current chunk
+            response = cloudinary.uploader.upload_large(path, chunk_size=self.chunk_size, **options)
+        else:
+            response = cloudinary.uploader.upload(path, **options)
+
+        if not response or 'secure_url' not in response:
+            raise StorageError(f"Unexpected Cloudinary response: {response}")
+        return response['secure_url']
+
+    async def aput(self, path, key):
+        """
+        put() over the shared httpx.AsyncClient: the request is built and
+        signed by the SDK, then posted without holding a thread. Chunked
+        uploads stay on the SDK, on a thread.
+        """
+        if os.path.getsize(path) > self.chunk_threshold:
+            return await run_in_thread(self.put, path, key)
+
+        import cloudinary.utils
+
+        _configure_cloudinary(current_app.config)
+        options = self._options(key)
+        params = cloudinary.utils.sign_request(cloudinary.utils.build_upload_params(**options), {})
+        fields = []
+        for name, value in params.items():
+            if isinstance(value, list):
+                fields.extend((f"{name}[]", item) for item in value)
+            elif value:
+                fields.append((name, str(value)))
+
+        data = await asyncio.to_thread(_read_file, path)
+        response = await get_async_client_registry().http().post(
+            cloudinary.utils.cloudinary_api_url('upload', resource_type='auto'),
+            data=fields,
+            files={'file': (options['filename'], data, 'application/pdf')}
+        )
+        result = response.json()
+        if response.is_error or 'secure_url' not in result:
+            raise StorageError(f"Unexpected Cloudinary response: {result}")
+        return result['secure_url']
+
+
+class LocalStorage:
+    """Files kept on this host's disk and served by the API itself."""
+
+    name = 'local'
+    remote = False
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def put(self, path, key):
+        if os.path.abspath(path) != os.path.abspath(self.path_for(key)):
+            with open(path, 'rb') as f:
+                _write_atomic(f, self.path_for(key))
+        return None
+
+    async def aput(self, path, key):
+        return await asyncio.to_thread(self.put, path, key)
+
+
+def build_storage_backend(config):
+    backend = config.get('STORAGE_BACKEND', 'cloudinary')
+    if backend == 'local':
+        return LocalStorage(config['STORAGE_LOCAL_DIR'])
+    if backend != 'cloudinary':
+        logging.warning(f"Unknown STORAGE_BACKEND {backend!r}, using cloudinary")
+    return CloudinaryStorage(
+        chunk_threshold=config.get('STORAGE_CHUNK_THRESHOLD', 20 * 1024 * 1024),
+        chunk_size=config.get('STORAGE_CHUNK_SIZE', 6 * 1024 * 1024)
+    )
+
+
+# ---------------------------------------------------------------------------
+# Outbox
+# ---------------------------------------------------------------------------
+
+class UploadOutbox:
+    """
+    Pending remote uploads persisted in SQLite next to their staged files,
+    so an upload interrupted by a worker restart is picked up again by the
+    next worker, and any worker can resolve a stable URL.
+    """
+
+    def __init__(self, path, ttl=30 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            "key TEXT PRIMARY KEY, path TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, url TEXT, error TEXT, "
+            "owner_pid INTEGER NOT NULL, updated_at REAL NOT NULL, owner_token TEXT)"
+        )
+        ensure_owner_token_column(conn, 'uploads')
+        conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def add(self, key, path):
+        conn = self._connect()
+        conn.execute(
+            "DELETE FROM uploads WHERE status = ? AND updated_at < ?",
+            (UPLOAD_DONE, time.time() - self.ttl)
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO uploads (key, path, status, attempts, owner_pid, owner_token, updated_at) "
+            "VALUES (?, ?, ?, 0, ?, ?, ?)",
+            (key, path, UPLOAD_PENDING, os.getpid(), process_token(), time.time())
+        )
+        conn.commit()
+
+    def get(self, key):
+        row = self._connect().execute("SELECT * FROM uploads WHERE key = ?", (key,)).fetchone()
+        return dict(row) if row else None
+
+    def update(self, key, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        conn = self._connect()
+        conn.execute(f"UPDATE uploads SET {assignments} WHERE key = ?", (*fields.values(), key))
+        conn.commit()
+
+    def claim_orphaned(self):
+        """Take over pending uploads whose owning worker process is gone."""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT key, owner_pid, owner_token, updated_at FROM uploads WHERE status = ?", (UPLOAD_PENDING,)
+        ).fetchall()
+        claimed = []
+        for row in rows:
+            if owner_alive(row['owner_pid'], row['owner_token'], row['updated_at']):
+                continue
+            cursor = conn.execute(
+                "UPDATE uploads SET owner_pid = ?, owner_token = ?, updated_at = ? "
+                "WHERE key = ? AND owner_token IS ? AND status = ?",
+                (os.getpid(), process_token(), time.time(), row['key'], row['owner_token'], UPLOAD_PENDING)
+            )
+            conn.commit()
+            if cursor.rowcount:
+                claimed.append(row['key'])
+        return claimed
+
+
+# ---------------------------------------------------------------------------
+# Storage service
+# ---------------------------------------------------------------------------
+
+class StorageService:
+    """
+    Stores generated PDFs and hands back their URL.
+
+    With a remote backend the PDF is staged on local disk and recorded in
+    the outbox. The first upload attempt runs inline and its CDN URL is
+    returned when it succeeds; otherwise, or straight away with
+    STORAGE_ASYNC_UPLOAD on, it is uploaded on a background pool, retrying
+    with exponential backoff and jitter. Uploads left behind by a worker
+    that died are claimed on start and every STORAGE_ORPHAN_SWEEP_INTERVAL
+    seconds. Meanwhile the stable URL
+    (/api/v1/files/<key>.pdf) serves the staged copy and redirects to the
+    CDN URL once the upload finishes. refresh_url() swaps stored stable URLs
+    for the CDN URL so they do not outlive this host's outbox.
+
+    asave() is the asyncio form for the ASGI serving mode: uploads and their
+    retries run as tasks on the event loop instead of the thread pool.
+    """
+
+    def __init__(self):
+        # Created lazily because current_app may not be ready
+        self._backend = None
+        self._outbox = None
+        self._pool = None
+        self._lock = threading.Lock()
+        # Strong references to running upload tasks, which asyncio does not keep
+        self._tasks = set()
+
+    def _ensure_started(self):
+        if self._backend is not None:
+            return
+        with self._lock:
+            if self._backend is not None:
+                return
+            config = current_app.config
+            backend = build_storage_backend(config)
+            if backend.remote:
+                os.makedirs(config['STORAGE_STAGING_DIR'], exist_ok=True)
+                self._outbox = UploadOutbox(config['STORAGE_OUTBOX_PATH'], ttl=config.get('STORAGE_OUTBOX_TTL'))
+                self._pool = ThreadPoolExecutor(
+                    max_workers=config.get('STORAGE_UPLOAD_WORKERS', 2),
+                    thread_name_prefix='sycx-upload'
+                )
+            self._backend = backend
+        if self._outbox is not None:
+            self._sweep(current_app.config.get('STORAGE_ORPHAN_SWEEP_INTERVAL', 300))
+
+    def _sweep(self, interval):
+        """
+        Resume uploads whose owning worker died, then repeat every `interval`
+        seconds (0 disables the repeat), so they do not wait for a restart.
+        """
+        try:
+            for key in self._outbox.claim_orphaned():
+                logging.info(f"Resuming interrupted upload {key}")
+                self._schedule(key)
+        except Exception as e:
+            logging.warning(f"Upload outbox sweep failed: {str(e)}")
+        if interval > 0:
+            timer = threading.Timer(interval, with_app_context(self._sweep), args=(interval,))
+            timer.daemon = True
+            timer.start()
+
+    @property
+    def backend(self):
+        self._ensure_started()
+        return self._backend
+
+    def save(self, buffer, name, base_url=None):
+        """
+        Store a PDF buffer under a unique `name`; returns its URL. Callers on
+        worker threads (jobs, batches) pass the request's `base_url`, since
+        they have no request context to take the host from.
+        """
+        self._ensure_started()
+        config = current_app.config
+        key = safe_key(name)
+
+        with stage('upload', size=buffer.getbuffer().nbytes) as record:
+            if not self._backend.remote:
+                _write_atomic(buffer, self._backend.path_for(key))
+                record.outcome = 'local'
+                return self.public_url(key, base_url)
+
+            staged = os.path.join(config['STORAGE_STAGING_DIR'], f"{key}.pdf")
+            _write_atomic(buffer, staged)
+            self._outbox.add(key, staged)
+
+            if not config.get('STORAGE_ASYNC_UPLOAD', False):
+                url = self._attempt(key)
+                if url:
+                    return url
+                record.outcome = 'deferred'
+            else:
+                record.outcome = 'queued'
+                self._schedule(key)
+            return self.public_url(key, base_url)
+
+    async def asave(self, buffer, name, base_url=None):
+        """save() for the event loop."""
+        self._ensure_started()
+        config = current_app.config
+        key = safe_key(name)
+
+        with stage('upload', size=buffer.getbuffer().nbytes) as record:
+            if not self._backend.remote:
+                await asyncio.to_thread(_write_atomic, buffer, self._backend.path_for(key))
+                record.outcome = 'local'
+                return self.public_url(key, base_url)
+
+            staged = os.path.join(config['STORAGE_STAGING_DIR'], f"{key}.pdf")
+            await asyncio.to_thread(_write_atomic, buffer, staged)
+            await asyncio.to_thread(self._outbox.add, key, staged)
+
+            if not config.get('STORAGE_ASYNC_UPLOAD', False):
+                url = await self._aattempt(key)
+                if url:
+                    return url
+                record.outcome = 'deferred'
+            else:
+                record.outcome = 'queued'
+                self._spawn(key)
+            return self.public_url(key, base_url)
+
+    def resolve(self, key):
+        """
+        ('redirect', url) once a remote upload has finished, ('file', path)
+        while the PDF is only on this host, or None for unknown keys.
+        """
+        self._ensure_started()
+        if not self._backend.remote:
+            path = self._backend.path_for(key)
+            return ('file', path) if os.path.exists(path) else None
+
+        row = self._outbox.get(key)
+        if row is None:
+            return None
+        if row['status'] == UPLOAD_DONE and row['url']:
+            return 'redirect', row['url']
+        if os.path.exists(row['path']):
+            return 'file', row['path']
+        return None
+
+    def refresh_url(self, url):
+        """
+        Bring a stored PDF URL up to date before handing it out again: a
+        stable /api/v1/files URL becomes the CDN URL once its upload has
+        finished, and None means this host no longer has the file (outbox
+        lost on redeploy or expired). Any other URL is returned unchanged.
+        """
+        _, marker, name = url.rpartition('/api/v1/files/')
+        if not marker or not name.endswith('.pdf'):
+            return url
+        location = self.resolve(name[:-len('.pdf')])
+        if location is None:
+            return None
+        kind, target = location
+        return target if kind == 'redirect' else url
+
+    @staticmethod
+    def public_url(key, base_url=None):
+        config = current_app.config
+        base = config.get('STORAGE_PUBLIC_URL') or base_url or (request.host_url if has_request_context() else '')
+        return f"{base.rstrip('/')}/api/v1/files/{key}.pdf"
+
+    def _schedule(self, key, delay=0):
+        task = with_app_context(self._attempt)
+        if delay <= 0:
+            self._pool.submit(task, key)
+            return
+        timer = threading.Timer(delay, self._pool.submit, args=(task, key))
+        timer.daemon = True
+        timer.start()
+
+    def _attempt(self, key):
+        """One upload try; returns the URL, or schedules a retry and returns None."""
+        row = self._outbox.get(key)
+        if row is None or row['status'] != UPLOAD_PENDING:
+            return row and row['url']
+
+        started = time.perf_counter()
+        try:
+            url = self._backend.put(row['path'], key)
+        except Exception as e:
+            observe_stage('upload_attempt', time.perf_counter() - started, 'error')
+            delay = self._failed(key, row, e)
+            if delay is not None:
+                self._schedule(key, delay)
+            return None
+
+        observe_stage('upload_attempt', time.perf_counter() - started)
+        self._uploaded(key, row, url)
+        return url
+
+    def _failed(self, key, row, error):
+        """Record a failed attempt; returns the retry delay, or None once giving up."""
+        config = current_app.config
+        attempts = row['attempts'] + 1
+        if attempts >= config.get('STORAGE_MAX_ATTEMPTS', 8):
+            logging.error(f"Giving up on upload {key} after {attempts} attempts: {str(error)}")
+            self._outbox.update(key, status=UPLOAD_FAILED, attempts=attempts, error=str(error))
+            return None
+        delay = min(
+            config.get('STORAGE_RETRY_MAX_DELAY', 300),
+            config.get('STORAGE_RETRY_BASE', 2.0) * 2 ** (attempts - 1)
+        ) * random.uniform(0.5, 1.0)
+        logging.warning(f"Upload {key} failed (attempt {attempts}), retrying in {delay:.1f}s: {str(error)}")
+        self._outbox.update(key, attempts=attempts, error=str(error))
+        return delay
+
+    def _uploaded(self, key, row, url):
+        self._outbox.update(key, status=UPLOAD_DONE, url=url, attempts=row['attempts'] + 1, error=None)
+        try:
+            os.remove(row['path'])
+        except OSError:
+            pass
+        logging.info(f"Uploaded {key} to {self._backend.name}")
+
+    def _spawn(self, key, delay=0):
+        """Run _aattempt(key) as a task on the running loop, after `delay` seconds."""
+        app = current_app._get_current_object()
+
+        async def upload():
+            if delay > 0:
+                await asyncio.sleep(delay)
+            with app.app_context():
+                await self._aattempt(key)
+
+        task = asyncio.get_running_loop().create_task(upload())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _aattempt(self, key):
+        """_attempt on the event loop; retries are rescheduled as new tasks."""
+        row = await asyncio.to_thread(self._outbox.get, key)
+        if row is None or row['status'] != UPLOAD_PENDING:
+            return row and row['url']
+
+        started = time.perf_counter()
+        try:
+            url = await self._backend.aput(row['path'], key)
+        except Exception as e:
+            observe_stage('upload_attempt', time.perf_counter() - started, 'error')
+            delay = await run_in_thread(self._failed, key, row, e)
+            if delay is not None:
+                self._spawn(key, delay)
+            return None
+
+        observe_stage('upload_attempt', time.perf_counter() - started)
+        await asyncio.to_thread(self._uploaded, key, row, url)
+        return url
+
+
+storage = StorageService()
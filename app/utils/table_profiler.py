@@ -0,0 +1,310 @@
+import random
+import datetime
+from collections import Counter
+from itertools import zip_longest
+import numpy as np
+
+DEFAULT_TABLE_SETTINGS = {
+    'max_chars': 12000,      # budget for one sheet's description
+    'sample_rows': 20,       # representative rows quoted in the description
+    'head_rows': 5,          # of which this many are the first rows
+    'chunk_rows': 5000,      # rows profiled per vectorized batch
+    'max_columns': 60,       # wider sheets only profile the first columns
+    'top_values': 5,
+}
+
+# Exact distinct counts stop here; the column reports "N+ distinct"
+DISTINCT_LIMIT = 10000
+# Top-value counters are pruned back to this many keys when they double
+TOP_VALUE_KEYS = 5000
+MAX_CELL_CHARS = 40
+
+_EMPTY = (None, '')
+
+
+def table_settings(overrides=None):
+    settings = dict(DEFAULT_TABLE_SETTINGS)
+    if overrides:
+        settings.update({k: v for k, v in overrides.items() if v is not None})
+    return settings
+
+
+def _as_floats(values):
+    """float64 array of `values`, NaN where a value is not a number."""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return np.array([_to_float(value) for value in values], dtype=np.float64)
+
+
+def _to_float(value):
+    if isinstance(value, (bool, datetime.date, datetime.time)):
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _as_dates(values):
+    """datetime64 array if every value parses as an ISO date, else None."""
+    # numpy also accepts words such as "today"; dates start with a digit
+    if not all(value[:1].isdigit() for value in values):
+        return None
+    try:
+        return np.array(values, dtype='datetime64[s]')
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _format_number(value):
+    if float(value).is_integer() and abs(value) < 1e15:
+        return f"{int(value):,}"
+    return f"{value:,.6g}"
+
+
+def _format_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        text = _format_number(value)
+    elif isinstance(value, datetime.datetime) and value.time() == datetime.time():
+        text = value.date().isoformat()
+    else:
+        text = str(value)
+    text = ' '.join(text.split())
+    return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS - 1] + '…'
+
+
+class ColumnProfile:
+    """Running statistics for one column, updated a batch of values at a time."""
+
+    def __init__(self, name):
+        self.name = name
+        self.filled = 0
+        self.empty = 0
+        self.kinds = Counter()
+        self.numeric_count = 0
+        self.numeric_sum = 0.0
+        self.numeric_min = None
+        self.numeric_max = None
+        self.date_min = None
+        self.date_max = None
+        self.distinct = set()
+        self.distinct_overflow = False
+        self.top = Counter()
+
+    def update(self, values):
+        present = [value for value in values if value not in _EMPTY]
+        self.empty += len(values) - len(present)
+        if not present:
+            return
+        self.filled += len(present)
+
+        booleans = [value for value in present if isinstance(value, bool)]
+        present = [value for value in present if not isinstance(value, bool)]
+        if booleans:
+            self.kinds['boolean'] += len(booleans)
+            self.top.update(str(value) for value in booleans)
+            self._track_distinct(booleans)
+
+        numbers = _as_floats(present) if present else np.empty(0)
+        numeric_mask = ~np.isnan(numbers)
+        numeric = numbers[numeric_mask]
+        if numeric.size:
+            self.kinds['number'] += int(numeric.size)
+            self.numeric_count += int(numeric.size)
+            self.numeric_sum += float(numeric.sum())
+            low, high = float(numeric.min()), float(numeric.max())
+            self.numeric_min = low if self.numeric_min is None else min(self.numeric_min, low)
+            self.numeric_max = high if self.numeric_max is None else max(self.numeric_max, high)
+            unique, counts = np.unique(numeric, return_counts=True)
+            self._track_distinct(unique.tolist())
+            self.top.update(dict(zip(unique.tolist(), counts.tolist())))
+
+        rest = [value for value, is_number in zip(present, numeric_mask) if not is_number]
+        times = [value for value in rest if isinstance(value, datetime.time)]
+        dates = [value for value in rest if isinstance(value, datetime.date)]
+        texts = [value for value in rest if not isinstance(value, (datetime.date, datetime.time))]
+        stamps = np.array(dates, dtype='datetime64[s]')
+        if texts:
+            parsed = _as_dates([str(value).strip() for value in texts])
+            if parsed is not None:
+                stamps = np.concatenate([stamps, parsed])
+                texts = []
+        if times:
+            self.kinds['time'] += len(times)
+            self._track_distinct(times)
+        if stamps.size:
+            self.kinds['date'] += int(stamps.size)
+            low, high = stamps.min(), stamps.max()
+            self.date_min = low if self.date_min is None else min(self.date_min, low)
+            self.date_max = high if self.date_max is None else max(self.date_max, high)
+            self._track_distinct(np.unique(stamps).tolist())
+        if texts:
+            self.kinds['text'] += len(texts)
+            strings = [' '.join(str(value).split()) for value in texts]
+            self._track_distinct(strings)
+            self.top.update(strings)
+            if len(self.top) > 2 * TOP_VALUE_KEYS:
+                # Bounded memory for high-cardinality columns; counts become approximate
+                self.top = Counter(dict(self.top.most_common(TOP_VALUE_KEYS)))
+
+    def _track_distinct(self, values):
+        if self.distinct_overflow:
+            return
+        self.distinct.update(values)
+        if len(self.distinct) > DISTINCT_LIMIT:
+            self.distinct_overflow = True
+            self.distinct = set()
+
+    @property
+    def kind(self):
+        if not self.kinds:
+            return 'empty'
+        kind, count = self.kinds.most_common(1)[0]
+        return kind if count >= 0.9 * self.filled else 'mixed'
+
+    def describe(self, top_values=5):
+        parts = [f"{self.kind}", f"{self.filled:,} filled"]
+        if self.empty:
+            parts.append(f"{self.empty:,} empty")
+        if not self.filled:
+            return f"- {self.name}: " + "; ".join(parts)
+
+        parts.append(f"{DISTINCT_LIMIT:,}+ distinct" if self.distinct_overflow else f"{len(self.distinct):,} distinct")
+        if self.numeric_count:
+            mean = self.numeric_sum / self.numeric_count
+            parts.append(
+                f"range {_format_number(self.numeric_min)} to {_format_number(self.numeric_max)}, "
+                f"mean {_format_number(mean)}"
+            )
+        if self.date_min is not None:
+            low, high = str(self.date_min), str(self.date_max)
+            if low.endswith('T00:00:00') and high.endswith('T00:00:00'):
+                low, high = low[:10], high[:10]
+            parts.append(f"dates {low} to {high}")
+
+        # Top values only say something when values repeat
+        unique_share = len(self.distinct) / self.filled if not self.distinct_overflow else 1.0
+        if self.top and unique_share < 0.5:
+            top = ", ".join(
+                f"{_format_cell(value)} ({count:,})" for value, count in self.top.most_common(top_values)
+            )
+            parts.append(f"top: {top}")
+        return f"- {self.name}: " + "; ".join(parts)
+
+
+class TableProfiler:
+    """
+    Streaming profile of one table (a worksheet or CSV file).
+
+    Rows are fed in batches; every column keeps running statistics (type,
+    range, mean, distinct count, most common values) computed with numpy on
+    each batch, and a reservoir keeps a uniform sample of rows alongside the
+    first few. Memory stays bounded by the batch size, whatever the row
+    count. describe() renders a compact text summary within a character
+    budget for the LLM prompt.
+    """
+
+    def __init__(self, name, settings=None):
+        self.name = name
+        self.settings = table_settings(settings)
+        self.header = None
+        self.columns = []
+        self.extra_columns = 0
+        self.row_count = 0
+        self.head = []
+        self.reservoir = []
+        self._random = random.Random(0)
+
+    def add_rows(self, rows):
+        """Profile a batch of row tuples; blank rows are ignored."""
+        rows = [row for row in rows if row and any(cell not in _EMPTY for cell in row)]
+        if not rows:
+            return
+        if self.header is None:
+            self.header = self._header_names(rows[0])
+            if self.header:
+                rows = rows[1:]
+            self.columns = [ColumnProfile(name) for name in self.header[:self.settings['max_columns']]]
+            self.extra_columns = max(0, len(self.header) - self.settings['max_columns'])
+
+        previous = self.row_count
+        for row in rows:
+            self.row_count += 1
+            self._sample(row)
+
+        width = self.settings['max_columns']
+        columns = list(zip_longest(*rows))
+        self.extra_columns = max(self.extra_columns, len(columns) - width)
+        for index, values in enumerate(columns[:width]):
+            if index >= len(self.columns):
+                profile = ColumnProfile(f"Column {index + 1}")
+                # A column that first appears now was empty in every earlier row
+                profile.empty = previous
+                self.columns.append(profile)
+            self.columns[index].update(values)
+
+    @staticmethod
+    def _header_names(row):
+        """Column names when `row` is a header (all text), else []."""
+        if not all(isinstance(cell, str) or cell is None for cell in row):
+            return []
+        names = [_format_cell(cell) for cell in row]
+        return [name or f"Column {index + 1}" for index, name in enumerate(names)] if any(names) else []
+
+    def _sample(self, row):
+        """Keep the first rows, then a uniform reservoir sample of the rest."""
+        head_rows = self.settings['head_rows']
+        if len(self.head) < head_rows:
+            self.head.append(row)
+            return
+        size = max(0, self.settings['sample_rows'] - head_rows)
+        if len(self.reservoir) < size:
+            self.reservoir.append((self.row_count, row))
+            return
+        slot = self._random.randrange(self.row_count - head_rows)
+        if slot < size:
+            self.reservoir[slot] = (self.row_count, row)
+
+    def describe(self, max_chars=None):
+        """Text description of the table, at most `max_chars` long."""
+        max_chars = max_chars or self.settings['max_chars']
+        if not self.row_count and not self.header:
+            return f"Table: {self.name} (empty)"
+
+        width = len(self.columns) + self.extra_columns
+        title = f"Table: {self.name} ({self.row_count:,} rows x {width:,} columns)"
+        column_lines = [column.describe(self.settings['top_values']) for column in self.columns]
+        omitted_columns = self.extra_columns
+
+        sampled = self.head + [row for _, row in sorted(self.reservoir, key=lambda item: item[0])]
+        rows = [" | ".join(_format_cell(cell) for cell in row[:self.settings['max_columns']]) for row in sampled]
+        if self.header:
+            rows.insert(0, " | ".join(self.header[:self.settings['max_columns']]))
+
+        # Shrink the sample first, then the column list, to fit the budget
+        while True:
+            text = self._render(title, column_lines, omitted_columns, rows)
+            if len(text) <= max_chars:
+                return text
+            if len(rows) > 4:
+                rows = rows[:len(rows) // 2 + 1]
+            elif len(column_lines) > 1:
+                keep = len(column_lines) // 2
+                omitted_columns += len(column_lines) - keep
+                column_lines = column_lines[:keep]
+            else:
+                return text[:max_chars]
+
+    def _render(self, title, column_lines, omitted_columns, rows):
+        parts = [title, "Column statistics:"]
+        parts.extend(column_lines)
+        if omitted_columns:
+            parts.append(f"- ({omitted_columns:,} more columns not described)")
+        if rows:
+            sample_count = len(rows) - (1 if self.header else 0)
+            parts.append(f"Sample rows ({sample_count} of {self.row_count:,}):")
+            parts.extend(rows)
+        return "\n".join(parts)
@@ -0,0 +1,65 @@
+import re
+
+# Rough average for English text across the tokenizers we route to
+CHARS_PER_TOKEN = 4
+
+_BLOCK_SPLIT = re.compile(r'\n\s*\n')
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local token estimate; good enough for budgeting prompts."""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class TextChunker:
+    """
+    Splits document text into chunks of at most `max_tokens` estimated tokens.
+
+    Chunks are packed greedily from blank-line separated blocks (sections and
+    paragraphs). A block that is too large on its own is split on sentence
+    boundaries, and a single oversized sentence is hard-wrapped as a last resort.
+    """
+
+    def __init__(self, max_tokens=3000):
+        self.max_tokens = max_tokens
+        self.max_chars = max_tokens * CHARS_PER_TOKEN
+
+    def split(self, text: str) -> list:
+        chunks = []
+        current = []
+        current_len = 0
+
+        for piece, separator in self._pieces(text):
+            added = len(piece) + (len(separator) if current else 0)
+            if current and current_len + added > self.max_chars:
+                chunks.append(''.join(current).strip())
+                current, current_len = [], 0
+                added = len(piece)
+            if current:
+                current.append(separator)
+            current.append(piece)
+            current_len += added
+
+        if current:
+            chunks.append(''.join(current).strip())
+
+        return [chunk for chunk in chunks if chunk]
+
+    def _pieces(self, text):
+        """Yield (piece, separator) pairs, each piece fitting in one chunk."""
+        for block in _BLOCK_SPLIT.split(text):
+            block = block.strip()
+            if not block:
+                continue
+            if len(block) <= self.max_chars:
+                yield block, '\n\n'
+                continue
+            for sentence in _SENTENCE_SPLIT.split(block):
+                if len(sentence) <= self.max_chars:
+                    yield sentence, ' '
+                    continue
+                for start in range(0, len(sentence), self.max_chars):
+                    yield sentence[start:start + self.max_chars], ' '
@@ -0,0 +1,209 @@
+import re
+import logging
+from collections import Counter
+from app.utils.text_chunker import estimate_tokens
+
+# Lines this close to the top or bottom of a page are header/footer candidates
+EDGE_LINES = 3
+# Paragraphs shorter than this are never treated as duplicates
+MIN_DEDUPE_CHARS = 40
+# Word-set overlap at which two paragraphs count as near-identical
+NEAR_DUPLICATE_JACCARD = 0.9
+TABULAR_TYPES = frozenset(('xlsx', 'xls', 'csv'))
+
+_SPACES = re.compile('[ \t\u00a0\u2000-\u200b\u3000]+')
+_CONTROL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+_HYPHEN_BREAK = re.compile(r'(\w)-\n(\w)')
+_EXTRA_NEWLINES = re.compile(r'\n{3,}')
+_BLOCK_SPLIT = re.compile(r'\n\s*\n')
+_DIGITS = re.compile(r'\d+')
+_NON_WORD = re.compile(r'[\W_]+')
+_PAGE_NUMBER = re.compile(
+    r'^[\s\-–—\[\(]*(?:page|p\.|pg\.?)?\s*(?:\d{1,4}|(?=[ivx])x{0,3}(?:ix|iv|v?i{0,3}))'
+    r'(?:\s*(?:of|/)\s*\d{1,4})?[\s\-–—\]\)]*$',
+    re.IGNORECASE
+)
+_TABLE_ROW = re.compile(r'\t|\||\S {2,}\S.* {2,}\S')
+
+
+def normalize_whitespace(text):
+    """Collapse layout whitespace, re-join hyphenated line breaks and drop control characters."""
+    text = _CONTROL.sub('', text.replace('\r\n', '\n').replace('\r', '\n'))
+    text = _HYPHEN_BREAK.sub(r'\1\2', text)
+    lines = [_SPACES.sub(' ', line).strip() for line in text.split('\n')]
+    return _EXTRA_NEWLINES.sub('\n\n', '\n'.join(lines)).strip()
+
+
+def _edge_key(line):
+    # Running headers/footers often differ only by the page number or date
+    return _DIGITS.sub('#', _SPACES.sub(' ', line).strip().lower())
+
+
+def _edge_indexes(lines):
+    # Short pages get a narrower edge zone so their body text is never a candidate
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    width = max(1, min(EDGE_LINES, len(content) // 4))
+    return content[:width] + content[-width:]
+
+
+def strip_running_lines(pages, min_share=0.5, min_pages=3):
+    """
+    Remove page numbers and lines repeated near the top or bottom of most
+    pages (running headers and footers). Returns (pages, removed line count).
+    """
+    page_lines = [page.split('\n') for page in pages]
+    removed = 0
+
+    repeated = set()
+    if len(pages) >= min_pages:
+        counts = Counter()
+        for lines in page_lines:
+            counts.update({_edge_key(lines[i]) for i in _edge_indexes(lines)})
+        needed = max(min_pages, int(len(pages) * min_share))
+        repeated = {key for key, count in counts.items() if count >= needed and key}
+
+    result = []
+    for lines in page_lines:
+        edges = set(_edge_indexes(lines))
+        kept = []
+        for i, line in enumerate(lines):
+            if i in edges and (_PAGE_NUMBER.match(line) or _edge_key(line) in repeated):
+                removed += 1
+                continue
+            kept.append(line)
+        result.append('\n'.join(kept))
+    return result, removed
+
+
+def sample_table_rows(rows, max_rows, head=None):
+    """
+    Keep the first rows (header included), an evenly spaced sample from the
+    middle and the last rows, with a marker saying how many were omitted.
+    """
+    if len(rows) <= max_rows:
+        return rows, 0
+    head = head if head is not None else max(1, max_rows // 3)
+    tail = max(1, max_rows // 6)
+    middle_budget = max(0, max_rows - head - tail)
+    middle = rows[head:len(rows) - tail]
+    step = len(middle) / middle_budget if middle_budget else 0
+    sampled = [middle[int(i * step)] for i in range(middle_budget)] if middle_budget else []
+    omitted = len(rows) - head - tail - len(sampled)
+    return rows[:head] + sampled + [f"[... {omitted} similar rows omitted ...]"] + rows[-tail:], omitted
+
+
+def sample_tables(page, max_rows):
+    """
+    Sample runs of more than `max_rows` consecutive table-like lines (tab,
+    pipe or column-aligned), e.g. tables inside PDFs and Word documents.
+    """
+    lines = page.split('\n')
+    output, run = [], []
+    omitted = 0
+
+    def flush():
+        nonlocal omitted
+        if run:
+            kept, dropped = sample_table_rows(run, max_rows)
+            output.extend(kept)
+            omitted += dropped
+            run.clear()
+
+    for line in lines:
+        if line.strip() and _TABLE_ROW.search(line):
+            run.append(line)
+        else:
+            flush()
+            output.append(line)
+    flush()
+    return '\n'.join(output), omitted
+
+
+def _paragraph_key(paragraph):
+    return _NON_WORD.sub(' ', paragraph.lower()).strip()
+
+
+def dedupe_paragraphs(text):
+    """
+    Drop paragraphs that repeat an earlier one, ignoring case and
+    punctuation, or that share at least NEAR_DUPLICATE_JACCARD of their
+    words with an earlier paragraph starting or ending the same way.
+    Returns (text, removed count).
+    """
+    seen = set()
+    candidates = {}
+    kept = []
+    removed = 0
+    for paragraph in _BLOCK_SPLIT.split(text):
+        key = _paragraph_key(paragraph)
+        if len(key) < MIN_DEDUPE_CHARS:
+            kept.append(paragraph)
+            continue
+        if key in seen:
+            removed += 1
+            continue
+
+        words = key.split()
+        word_set = frozenset(words)
+        anchors = (('head', tuple(words[:5])), ('tail', tuple(words[-5:])))
+        duplicate = False
+        for anchor in anchors:
+            for other in candidates.get(anchor, ()):
+                if len(word_set & other) / len(word_set | other) >= NEAR_DUPLICATE_JACCARD:
+                    duplicate = True
+                    break
+            if duplicate:
+                break
+        if duplicate:
+            removed += 1
+            continue
+
+        seen.add(key)
+        for anchor in anchors:
+            candidates.setdefault(anchor, []).append(word_set)
+        kept.append(paragraph)
+    return '\n\n'.join(kept), removed
+
+
+def compact_pages(pages, file_type=None, table_max_rows=60, header_min_share=0.5, dedupe=True):
+    """
+    Shrink extracted pages before they reach a prompt: running headers,
+    footers and page numbers, oversized tables, layout whitespace and
+    repeated paragraphs are removed. Returns (text, stats) with estimated
+    token counts before and after.
+    """
+    before = sum(estimate_tokens(page) for page in pages)
+    edge_lines = 0
+    # Spreadsheet pages are per-sheet table profiles with no running headers
+    if (file_type or '').lower() not in TABULAR_TYPES:
+        pages, edge_lines = strip_running_lines(pages, min_share=header_min_share)
+
+    omitted_rows = 0
+    if table_max_rows:
+        sampled = []
+        for page in pages:
+            page, omitted = sample_tables(page, table_max_rows)
+            sampled.append(page)
+            omitted_rows += omitted
+        pages = sampled
+
+    text = '\n\n'.join(normalize_whitespace(page) for page in pages if page.strip())
+    duplicates = 0
+    if dedupe:
+        text, duplicates = dedupe_paragraphs(text)
+
+    after = estimate_tokens(text)
+    stats = {
+        'tokens_before': before,
+        'tokens_after': after,
+        'header_lines_removed': edge_lines,
+        'table_rows_omitted': omitted_rows,
+        'duplicate_paragraphs_removed': duplicates
+    }
+    logging.info(
+        f"Compacted text: {stats['tokens_before']} -> {after} tokens "
+        f"(-{100 * (1 - after / max(before, 1)):.0f}%; {edge_lines} header/footer lines, "
+        f"{omitted_rows} table rows, {duplicates} duplicate paragraphs removed)"
+    )
+    return text, stats
+
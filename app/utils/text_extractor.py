@@ -1,80 +1,489 @@
 import io
-from PIL import Image
-import pytesseract
-from pdfminer.high_level import extract_text as extract_pdf_text
-import docx
-from pptx import Presentation
-from openpyxl import load_workbook
+import os
+import math
+import time
+import csv
+import codecs
+import shutil
 import logging
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from app.utils.metrics import stage
+from app.utils.ocr import ocr_settings, ocr_image_file, ocr_pdf_page, needs_ocr
+
+# Format parsers (pdfminer, python-docx, python-pptx, openpyxl, numpy) are
+# imported by the reader that needs them, so workers that never see a
+# given format never pay for loading it. See app/utils/startup.py.
+
+# Paragraphs / rows grouped into one "page" for formats without real pages
+DOCX_PARAGRAPHS_PER_PAGE = 50
+TEXT_BLOCK_BYTES = 256 * 1024
+CSV_SNIFF_BYTES = 64 * 1024
+
+_pool_lock = threading.Lock()
+_process_pool = None
+
+
+def _cgroup_cpu_quota():
+    """CPU limit from the cgroup (v2 cpu.max, v1 cfs quota), or None when unlimited."""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota == 'max':
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        return quota / period if quota > 0 and period > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus():
+    """
+    CPUs this process may use: the scheduler affinity, capped by the
+    container's cgroup CPU quota (affinity alone reports the host's cores).
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0)) or 1
+    else:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+def _get_process_pool(workers):
+    global _process_pool
+    if _process_pool is None:
+        with _pool_lock:
+            if _process_pool is None:
+                # spawn: forking a multi-threaded gunicorn worker is unsafe
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _process_pool
+
+
+@contextmanager
+def open_source(source):
+    """
+    Yield a seekable binary handle for `source`: raw bytes, an open binary
+    file, or an object with an open() method such as SpooledUpload.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    elif hasattr(source, 'open'):
+        with source.open() as handle:
+            yield handle
+    else:
+        source.seek(0)
+        yield source
+
+
+@contextmanager
+def source_path(source, suffix=''):
+    """
+    Yield a filesystem path holding `source`, reusing the spooled file when
+    the upload already lives on disk and copying to a temp file otherwise.
+    """
+    path = getattr(source, 'path', None) or getattr(source, 'name', None)
+    if isinstance(path, str) and os.path.isfile(path):
+        yield path
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        with open_source(source) as handle:
+            shutil.copyfileobj(handle, tmp)
+        path = tmp.name
+    try:
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _iter_pdf_pages(fp, pagenos=None):
+    """Yield (text, seconds) for each PDF page, parsing lazily."""
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+    from pdfminer.pdfpage import PDFPage
+
+    rsrcmgr = PDFResourceManager(caching=True)
+    output = io.StringIO()
+    device = TextConverter(rsrcmgr, output, laparams=LAParams())
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+    try:
+        for page in PDFPage.get_pages(fp, pagenos, caching=True):
+            started = time.perf_counter()
+            interpreter.process_page(page)
+            text = output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+            yield text, time.perf_counter() - started
+    finally:
+        device.close()
+
+
+def _extract_pdf_range(path, start, stop):
+    """Process-pool task: extract pages [start, stop) of the PDF at `path`."""
+    with open(path, 'rb') as fp:
+        return list(_iter_pdf_pages(fp, set(range(start, stop))))
+
+
+def _pdf_page_count(fp):
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+
+    try:
+        document = PDFDocument(PDFParser(fp))
+        return int(resolve1(document.catalog['Pages']).get('Count', 0))
+    except Exception as e:
+        logging.warning(f"Could not read PDF page count: {str(e)}")
+        return 0
+    finally:
+        fp.seek(0)
+
+
+def _detect_encoding(sample):
+    """UTF-8 unless `sample` fails to decode as UTF-8, in which case latin-1."""
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return 'latin-1'
+    return 'utf-8'
+
 
 class TextExtractor:
+    """
+    Text extraction for every supported upload format.
+
+    Every entry point accepts a `source`: raw bytes, a seekable binary file
+    handle, or a SpooledUpload. Sources are read through file handles, so
+    large uploads spooled to disk are never loaded as one byte string.
+    """
+
     @staticmethod
-    def extract(file_content: bytes, file_type: str) -> str:
+    def extract(source, file_type: str, max_pages: int = None, max_chars: int = None) -> str:
+        result = TextExtractor.extract_pages(source, file_type, max_pages=max_pages, max_chars=max_chars)
+        return "\n\n".join(result['pages'])
+
+    @staticmethod
+    def extract_pages(source, file_type: str, max_pages: int = None, max_chars: int = None,
+                      workers: int = None, parallel_min_pages: int = 40, pages_per_task: int = 10,
+                      ocr: dict = None, table: dict = None) -> dict:
+        """
+        Extract text page by page, stopping once either budget is reached.
+
+        Returns {'pages': [...], 'page_timings': [...], 'truncated': bool}.
+        PDFs with at least `parallel_min_pages` pages are fanned out across a
+        process pool of `workers` processes in batches of `pages_per_task`.
+        `ocr` overrides DEFAULT_OCR_SETTINGS for images and scanned pages;
+        `table` overrides DEFAULT_TABLE_SETTINGS for spreadsheets and CSV.
+        """
         file_type = file_type.lower()
-        
+        iterator = TextExtractor.iter_pages(
+            source, file_type,
+            workers=workers,
+            parallel_min_pages=parallel_min_pages,
+            pages_per_task=pages_per_task,
+            ocr=ocr,
+            table=table
+        )
+        with stage('extract') as record:
+            try:
+                result = TextExtractor._collect(iterator, max_pages, max_chars)
+            except Exception as e:
+                logging.error(f"Failed to extract text from {file_type}: {str(e)}")
+                # Fallback to simple decoding if specific parser fails
+                record.outcome = 'fallback'
+                result = TextExtractor._collect(TextExtractor._iter_text(source), max_pages, max_chars)
+            record.size = sum(len(page) for page in result['pages'])
+        return result
+
+    @staticmethod
+    def _collect(iterator, max_pages, max_chars):
+        pages = []
+        timings = []
+        chars = 0
+        truncated = False
+
         try:
-            if file_type == 'pdf':
-                return TextExtractor._extract_pdf(file_content)
-            elif file_type in ['docx', 'doc']: # Note: doc may not work with python-docx, but we try
-                return TextExtractor._extract_docx(file_content)
-            elif file_type in ['pptx', 'ppt']:
-                return TextExtractor._extract_pptx(file_content)
-            elif file_type in ['xlsx', 'xls', 'csv']:
-                return TextExtractor._extract_xlsx(file_content)
-            elif file_type in ['png', 'jpg', 'jpeg', 'tiff', 'gif']:
-                return TextExtractor._extract_image(file_content)
+            for text, seconds in iterator:
+                if max_pages and len(pages) >= max_pages:
+                    truncated = True
+                    break
+                if max_chars and chars + len(text) > max_chars:
+                    pages.append(text[:max_chars - chars])
+                    timings.append(round(seconds, 4))
+                    truncated = True
+                    break
+                pages.append(text)
+                timings.append(round(seconds, 4))
+                chars += len(text)
+        except Exception:
+            if not pages:
+                raise
+            logging.warning(f"Extraction failed after {len(pages)} pages, keeping partial text")
+            truncated = True
+        finally:
+            iterator.close()
+
+        if truncated:
+            logging.info(f"Extraction budget reached after {len(pages)} pages / {chars} chars")
+
+        return {'pages': pages, 'page_timings': timings, 'truncated': truncated}
+
+    @staticmethod
+    def iter_pages(source, file_type: str, workers: int = None,
+                   parallel_min_pages: int = 40, pages_per_task: int = 10, ocr: dict = None,
+                   table: dict = None):
+        """Yield (text, seconds) per page (slide, sheet, ...) lazily."""
+        file_type = file_type.lower()
+        ocr = ocr_settings(ocr)
+
+        if file_type == 'pdf':
+            yield from TextExtractor._iter_pdf(source, workers, parallel_min_pages, pages_per_task, ocr)
+        elif file_type in ['docx', 'doc']: # Note: doc may not work with python-docx, but we try
+            yield from TextExtractor._iter_docx(source)
+        elif file_type in ['pptx', 'ppt']:
+            yield from TextExtractor._iter_pptx(source)
+        elif file_type in ['xlsx', 'xls']:
+            yield from TextExtractor._iter_xlsx(source, table)
+        elif file_type == 'csv':
+            yield from TextExtractor._iter_csv(source, table)
+        elif file_type in ['png', 'jpg', 'jpeg', 'tiff', 'gif']:
+            started = time.perf_counter()
+            workers = workers or available_cpus()
+            # Tiles are OCR'd by tesseract subprocesses, so threads are enough;
+            # the process pool is not spun up for a single image
+            with open_source(source) as stream, ThreadPoolExecutor(max_workers=workers) as pool:
+                text = ocr_image_file(stream, ocr, pool=pool if workers > 1 else None)
+            yield text, time.perf_counter() - started
+        else:
+            yield from TextExtractor._iter_text(source)
+
+    @staticmethod
+    def _iter_pdf(source, workers=None, parallel_min_pages=40, pages_per_task=10, ocr=None):
+        workers = workers or available_cpus()
+        with open_source(source) as pdf_file:
+            page_count = _pdf_page_count(pdf_file) if workers > 1 else 0
+            path_context = []
+
+            def get_path():
+                # Process-pool workers and poppler read the PDF from disk
+                # rather than having the document pickled into every task
+                if not path_context:
+                    context = source_path(source, suffix='.pdf')
+                    path_context.append((context, context.__enter__()))
+                return path_context[0][1]
+
+            if page_count < max(parallel_min_pages, 2):
+                pages = _iter_pdf_pages(pdf_file)
             else:
-                return TextExtractor._extract_text(file_content)
-        except Exception as e:
-            logging.error(f"Failed to extract text from {file_type}: {str(e)}")
-            # Fallback to simple decoding if specific parser fails
-            return TextExtractor._extract_text(file_content)
+                pages = TextExtractor._iter_pdf_parallel(get_path(), page_count, workers, pages_per_task)
+
+            try:
+                if ocr and ocr['enabled']:
+                    pool = _get_process_pool(workers) if workers > 1 else None
+                    yield from TextExtractor._ocr_image_pages(pages, get_path, ocr, pool, workers)
+                else:
+                    yield from pages
+            finally:
+                pages.close()
+                if path_context:
+                    path_context[0][0].__exit__(None, None, None)
+
+    @staticmethod
+    def _iter_pdf_parallel(path, page_count, workers, pages_per_task):
+        pool = _get_process_pool(workers)
+        ranges = iter(range(0, page_count, pages_per_task))
+        in_flight = deque()
+
+        def submit_next():
+            start = next(ranges, None)
+            if start is not None:
+                in_flight.append(pool.submit(
+                    _extract_pdf_range, path, start, min(start + pages_per_task, page_count)
+                ))
+
+        try:
+            # Keep a bounded window of batches in flight so an early stop
+            # (budget reached) does not leave the whole document queued
+            for _ in range(workers * 2):
+                submit_next()
+            while in_flight:
+                batch = in_flight.popleft().result()
+                submit_next()
+                yield from batch
+        finally:
+            for future in in_flight:
+                future.cancel()
 
     @staticmethod
-    def _extract_pdf(file_content: bytes) -> str:
-        pdf_file = io.BytesIO(file_content)
-        return extract_pdf_text(pdf_file)
+    def _ocr_image_pages(pages, get_path, ocr, pool, workers):
+        """
+        Pass text pages through; pages without a text layer (scanned) are
+        rasterized and OCR'd, up to `workers` pages at a time in parallel.
+        """
+        pending = []
+
+        def flush():
+            if not pending:
+                return
+            started = time.perf_counter()
+            indices = list(pending)
+            pending.clear()
+            path = get_path()
+            if pool is not None and len(indices) > 1:
+                texts = list(pool.map(ocr_pdf_page, [path] * len(indices), indices, [ocr] * len(indices)))
+            else:
+                texts = [ocr_pdf_page(path, index, ocr) for index in indices]
+            per_page = (time.perf_counter() - started) / len(indices)
+            logging.info(f"OCR'd {len(indices)} image-only PDF pages")
+            for text in texts:
+                yield text, per_page
+
+        for index, (text, seconds) in enumerate(pages):
+            if needs_ocr(text, ocr):
+                pending.append(index)
+                if len(pending) >= workers:
+                    yield from flush()
+                continue
+            yield from flush()
+            yield text, seconds
+        yield from flush()
 
     @staticmethod
-    def _extract_docx(file_content: bytes) -> str:
-        doc_file = io.BytesIO(file_content)
-        doc = docx.Document(doc_file)
-        return "\n".join([paragraph.text for paragraph in doc.paragraphs])
+    def _iter_docx(source):
+        import docx
+
+        started = time.perf_counter()
+        with open_source(source) as doc_file:
+            doc = docx.Document(doc_file)
+        block = []
+        for paragraph in doc.paragraphs:
+            block.append(paragraph.text)
+            if len(block) >= DOCX_PARAGRAPHS_PER_PAGE:
+                yield "\n".join(block), time.perf_counter() - started
+                block = []
+                started = time.perf_counter()
+        if block:
+            yield "\n".join(block), time.perf_counter() - started
 
     @staticmethod
-    def _extract_pptx(file_content: bytes) -> str:
-        ppt_file = io.BytesIO(file_content)
-        prs = Presentation(ppt_file)
-        text = []
+    def _iter_pptx(source):
+        from pptx import Presentation
+
+        with open_source(source) as ppt_file:
+            prs = Presentation(ppt_file)
         for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text.append(shape.text)
-        return "\n".join(text)
+            started = time.perf_counter()
+            text = "\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text"))
+            yield text, time.perf_counter() - started
 
     @staticmethod
-    def _extract_xlsx(file_content: bytes) -> str:
-        excel_file = io.BytesIO(file_content)
-        wb = load_workbook(excel_file, data_only=True)
-        text = []
-        for sheet in wb.worksheets:
-            for row in sheet.iter_rows(values_only=True):
-                row_text = " ".join([str(cell) for cell in row if cell is not None])
-                if row_text:
-                    text.append(row_text)
-        return "\n".join(text)
+    def _iter_xlsx(source, settings):
+        """
+        One page per worksheet: a TableProfiler description (column
+        statistics plus sampled rows) instead of every cell. The workbook is
+        opened read-only, so rows stream from the file in batches of
+        `chunk_rows` rather than being loaded into memory at once.
+        """
+        from openpyxl import load_workbook
+        from app.utils.table_profiler import TableProfiler, table_settings
 
-    @staticmethod
-    def _extract_image(file_content: bytes) -> str:
-        image = Image.open(io.BytesIO(file_content))
-        return pytesseract.image_to_string(image)
+        settings = table_settings(settings)
+        with open_source(source) as excel_file:
+            wb = load_workbook(excel_file, read_only=True, data_only=True)
+            try:
+                for sheet in wb.worksheets:
+                    started = time.perf_counter()
+                    profiler = TableProfiler(sheet.title, settings)
+                    batch = []
+                    for row in sheet.iter_rows(values_only=True):
+                        batch.append(row)
+                        if len(batch) >= settings['chunk_rows']:
+                            profiler.add_rows(batch)
+                            batch = []
+                    profiler.add_rows(batch)
+                    if profiler.row_count or profiler.header:
+                        yield profiler.describe(), time.perf_counter() - started
+            finally:
+                wb.close()
 
     @staticmethod
-    def _extract_text(file_content: bytes) -> str:
-        try:
-            return file_content.decode('utf-8')
-        except UnicodeDecodeError:
+    def _iter_csv(source, settings):
+        """CSV counterpart of _iter_xlsx: rows are read and profiled in chunks."""
+        from app.utils.table_profiler import TableProfiler, table_settings
+
+        settings = table_settings(settings)
+        started = time.perf_counter()
+        with open_source(source) as stream:
+            sample = stream.read(CSV_SNIFF_BYTES)
+            stream.seek(0)
+            encoding = _detect_encoding(sample)
+            if encoding == 'utf-8' and sample.startswith(codecs.BOM_UTF8):
+                encoding = 'utf-8-sig'
+            text = io.TextIOWrapper(stream, encoding=encoding, errors='replace', newline='')
             try:
-                return file_content.decode('latin-1')
-            except Exception:
-                return ""
+                try:
+                    dialect = csv.Sniffer().sniff(
+                        sample.decode(text.encoding, errors='replace'), delimiters=',;\t|'
+                    )
+                except csv.Error:
+                    dialect = csv.excel
+                profiler = TableProfiler('CSV', settings)
+                batch = []
+                for row in csv.reader(text, dialect):
+                    batch.append(row)
+                    if len(batch) >= settings['chunk_rows']:
+                        profiler.add_rows(batch)
+                        batch = []
+                profiler.add_rows(batch)
+            finally:
+                # The caller owns the underlying handle
+                text.detach()
+        if profiler.row_count or profiler.header:
+            yield profiler.describe(), time.perf_counter() - started
+
+    @staticmethod
+    def _iter_text(source):
+        """
+        Decode plain text in blocks so the character budget can stop reading
+        early. UTF-8 is assumed unless the first block fails to decode, in
+        which case the whole file is read as latin-1.
+        """
+        with open_source(source) as stream:
+            first = stream.read(TEXT_BLOCK_BYTES)
+            decoder = codecs.getincrementaldecoder(_detect_encoding(first))(errors='replace')
+
+            block = first
+            carry = ''
+            while block:
+                started = time.perf_counter()
+                text = carry + decoder.decode(block)
+                block = stream.read(TEXT_BLOCK_BYTES)
+                if block:
+                    # Keep the trailing partial line for the next block
+                    cut = text.rfind('\n') + 1
+                    text, carry = text[:cut], text[cut:]
+                else:
+                    text += decoder.decode(b'', final=True)
+                if text:
+                    yield text, time.perf_counter() - started
@@ -0,0 +1,124 @@
+import io
+import os
+import shutil
+import hashlib
+import tempfile
+import logging
+
+READ_BLOCK_SIZE = 1024 * 1024
+
+
+class SpooledUpload:
+    """
+    An uploaded document held in memory while small and spooled to a named
+    temp file once it grows past `threshold` bytes.
+
+    The SHA-256 and size are computed while spooling, so callers never need
+    the whole file as one byte string. Use open() to get an independent
+    read handle; extractors and process-pool workers can use `path` directly
+    when the upload lives on disk. Call close() (or use it as a context
+    manager) to delete the temp file.
+    """
+
+    def __init__(self, threshold=5 * 1024 * 1024, spool_dir=None):
+        self.threshold = threshold
+        self.spool_dir = spool_dir
+        self.size = 0
+        self.path = None
+        self._buffer = io.BytesIO()
+        self._data = b''
+        self._file = None
+        self._digest = hashlib.sha256()
+
+    @classmethod
+    def from_stream(cls, stream, threshold=5 * 1024 * 1024, spool_dir=None):
+        upload = cls(threshold=threshold, spool_dir=spool_dir)
+        try:
+            while True:
+                block = stream.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                upload._write(block)
+            upload._finish()
+        except Exception:
+            upload.close()
+            raise
+        return upload
+
+    @classmethod
+    def from_bytes(cls, data, threshold=None):
+        upload = cls(threshold=threshold or max(len(data), 1))
+        upload._write(data)
+        upload._finish()
+        return upload
+
+    @property
+    def sha256(self):
+        return self._digest.hexdigest()
+
+    @property
+    def in_memory(self):
+        return self.path is None
+
+    def _write(self, block):
+        self._digest.update(block)
+        self.size += len(block)
+        if self._file is None and self.size > self.threshold:
+            if self.spool_dir:
+                os.makedirs(self.spool_dir, exist_ok=True)
+            self._file = tempfile.NamedTemporaryFile(
+                prefix='sycx_upload_', dir=self.spool_dir, delete=False
+            )
+            self.path = self._file.name
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        if self._file is not None:
+            self._file.write(block)
+        else:
+            self._buffer.write(block)
+
+    def _finish(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logging.info(f"Upload of {self.size} bytes spooled to disk")
+        elif self._buffer is not None:
+            # BytesIO over a bytes object shares it instead of copying
+            self._data = self._buffer.getvalue()
+            self._buffer = None
+
+    def open(self):
+        """Return a new seekable binary read handle positioned at 0."""
+        if self.path:
+            return open(self.path, 'rb')
+        return io.BytesIO(self._data)
+
+    def read(self):
+        """Whole content as bytes; avoid for large uploads."""
+        with self.open() as f:
+            return f.read()
+
+    def copy_to(self, fileobj):
+        with self.open() as f:
+            shutil.copyfileobj(f, fileobj, READ_BLOCK_SIZE)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+        self._data = b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.size
@@ -0,0 +1,5 @@
+from run import app as flask_app
+from app.asgi import create_asgi_app
+
+# Optional async serving mode: uvicorn asgi:app (see app/asgi.py)
+app = create_asgi_app(flask_app)
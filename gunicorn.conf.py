@@ -0,0 +1,29 @@
+# Gunicorn loads this file automatically from the working directory.
+import os
+import shutil
+
+# Share Prometheus metrics between workers: prometheus_client writes each
+# worker's values to this directory and /metrics merges them. Must be set
+# before any worker imports prometheus_client.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/sycx/prometheus')
+
+# Import the app in the master and fork workers from it. Workers then start
+# in milliseconds and share the imported modules' memory copy-on-write;
+# PRELOAD_MODULES makes create_app import the lazily loaded libraries too.
+# Thread pools, SQLite handles and HTTP clients are all created on first
+# use inside a worker, so nothing fork-unsafe exists in the master.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'False').lower() in ('true', '1', 't')
+if preload_app:
+    os.environ.setdefault('PRELOAD_MODULES', 'True')
+
+
+def on_starting(server):
+    # Stale files from a previous run would be merged into the new totals
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,90 @@
+"""
+Micro-benchmark: per-request PDF setup cost before and after the shared
+rendering context.
+
+"before" repeats what every /summarize request used to do: build a new
+stylesheet, re-register the TTF font, re-run cloudinary.config and create a
+ParagraphStyle per section. "after" is what a request does now: fetch the
+shared pipeline and look up the palette's cached template.
+
+    python scripts/bench_render_setup.py [--iterations 200] [--sections 8]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+import cloudinary
+
+from app import create_app
+from app.config.config import TestingConfig
+from app.services.summarizer import get_pipeline
+from app.utils.pdf_generator import get_render_context
+
+STYLE = {'colors': {'primary': '#1A237E', 'headers': '#283593'}}
+
+
+def legacy_setup(app, sections):
+    styles = getSampleStyleSheet()
+    font_path = os.path.join(
+        os.path.dirname(app.root_path), 'assets/fonts/Coming_Soon/ComingSoon-Regular.ttf'
+    )
+    font_name = 'Helvetica'
+    if os.path.exists(font_path):
+        pdfmetrics.registerFont(TTFont('ComingSoon', font_path))
+        font_name = 'ComingSoon'
+    ParagraphStyle('CustomStyle', parent=styles['Normal'], fontName=font_name, fontSize=12)
+    cloudinary.config(
+        cloud_name=app.config['CLOUDINARY_CLOUD_NAME'],
+        api_key=app.config['CLOUDINARY_API_KEY'],
+        api_secret=app.config['CLOUDINARY_API_SECRET']
+    )
+    ParagraphStyle('CustomTitle', parent=styles['Title'], fontName=font_name,
+                   textColor=colors.HexColor(STYLE['colors']['primary']))
+    ParagraphStyle('AuthorStyle', parent=styles['Normal'], fontName=font_name)
+    for _ in range(sections):
+        ParagraphStyle('SectionHeader', parent=styles['Heading2'], fontName=font_name,
+                       textColor=colors.HexColor(STYLE['colors']['headers']))
+
+
+def shared_setup(app, sections):
+    get_pipeline()
+    get_render_context().template(STYLE)
+
+
+def measure(func, app, iterations, sections):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func(app, sections)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--sections', type=int, default=8)
+    args = parser.parse_args()
+
+    app = create_app(TestingConfig)
+    with app.app_context():
+        for name, func in (('before', legacy_setup), ('after', shared_setup)):
+            func(app, args.sections)  # warm-up
+            samples = measure(func, app, args.iterations, args.sections)
+            print(
+                f"{name:>6}: mean {statistics.mean(samples):8.3f} ms  "
+                f"p50 {statistics.median(samples):8.3f} ms  "
+                f"max {max(samples):8.3f} ms  ({args.iterations} runs, {args.sections} sections)"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Micro-benchmark: splitting a summary into sections before and after the
+single-pass segmenter.
+
+"before" repeats what FileProcessor used to do: sentence-tokenize the
+summary and test every sentence with `any(marker in sentence)` over the
+default and LLM-supplied markers. "after" runs segment_sections with the
+same markers, once on plain prose and once on text with its own headings.
+
+    python scripts/bench_sections.py [--iterations 50] [--sentences 2000] [--markers 20]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.section_segmenter import DEFAULT_MARKERS, segment_sections, split_sentences
+
+WORDS = (
+    "cell membrane protein energy transport model analysis result method data "
+    "structure function process system study network signal rate value theory"
+).split()
+
+
+def sentence_tokenizer():
+    try:
+        import nltk
+        nltk.data.find('tokenizers/punkt')
+        return nltk.sent_tokenize
+    except Exception:
+        return split_sentences
+
+
+def make_summary(rng, sentences, headings=False):
+    lines, paragraph = [], []
+    for index in range(sentences):
+        words = rng.choices(WORDS, k=rng.randint(8, 20))
+        if rng.random() < 0.05:
+            words.insert(0, rng.choice(DEFAULT_MARKERS))
+        paragraph.append(" ".join(words).capitalize() + ".")
+        if len(paragraph) == 6:
+            if headings:
+                lines.append(f"## Part {index // 6}")
+            lines.append(" ".join(paragraph))
+            paragraph = []
+    if paragraph:
+        lines.append(" ".join(paragraph))
+    return "\n\n".join(lines)
+
+
+def legacy_sections(text, markers, tokenize):
+    all_markers = list(DEFAULT_MARKERS) + list(markers)
+    sections = []
+    title, content = "Introduction", []
+    for sentence in tokenize(text):
+        if any(marker.lower() in sentence.lower() for marker in all_markers):
+            if content:
+                sections.append({'title': title, 'content': ' '.join(content)})
+            title, content = sentence, []
+        else:
+            content.append(sentence)
+    if content:
+        sections.append({'title': title, 'content': ' '.join(content)})
+    return sections
+
+
+def measure(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--sentences', type=int, default=2000)
+    parser.add_argument('--markers', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    prose = make_summary(rng, args.sentences)
+    structured = make_summary(rng, args.sentences, headings=True)
+    markers = [" ".join(rng.sample(WORDS, 2)) for _ in range(args.markers)]
+    tokenize = sentence_tokenizer()
+
+    runs = (
+        ('before', lambda: legacy_sections(prose, markers, tokenize)),
+        ('after', lambda: segment_sections(prose, markers)),
+        ('headings', lambda: segment_sections(structured, markers)),
+    )
+    for name, func in runs:
+        func()  # warm-up
+        samples = measure(func, args.iterations)
+        print(
+            f"{name:>8}: mean {statistics.mean(samples):8.3f} ms  "
+            f"p50 {statistics.median(samples):8.3f} ms  "
+            f"max {max(samples):8.3f} ms  "
+            f"({args.iterations} runs, {args.sentences} sentences, "
+            f"{len(DEFAULT_MARKERS) + args.markers} markers)"
+        )
+
+
+if __name__ == '__main__':
+    main()
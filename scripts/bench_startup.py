@@ -0,0 +1,139 @@
+"""
+Worker cold-start benchmark: boot time and memory per worker.
+
+Each run starts a fresh interpreter that imports run:app the way gunicorn
+does, serves GET /api/v1/health, then forks once to stand in for a gunicorn
+worker forked from a preloaded master. Reported per mode:
+
+- boot: seconds to import the app (create_app included)
+- health: seconds for the first /health request
+- rss: resident memory after boot, in MB
+- worker_uss: memory private to a forked worker after one /health request,
+  i.e. what each extra worker costs under preload_app
+- first_use: seconds the first PDF and CSV extractions take, mostly spent
+  importing parsers unless they were preloaded
+
+    python scripts/bench_startup.py [--runs 5] [--top 15]
+
+Modes: "lazy" (default, libraries load on first use) and "preload"
+(PRELOAD_MODULES=True, as set by GUNICORN_PRELOAD). --top also lists the
+slowest imports from python -X importtime.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MODES = {
+    'lazy': {'PRELOAD_MODULES': 'False'},
+    'preload': {'PRELOAD_MODULES': 'True'},
+}
+
+
+def child():
+    """Runs in the measured interpreter; prints one JSON line."""
+    import time
+    started = time.perf_counter()
+    from run import app
+    boot = time.perf_counter() - started
+
+    import psutil
+    process = psutil.Process()
+    rss = process.memory_info().rss
+
+    client = app.test_client()
+    started = time.perf_counter()
+    client.get('/api/v1/health')
+    health = time.perf_counter() - started
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        app.test_client().get('/api/v1/health')
+        uss = psutil.Process().memory_full_info().uss
+        os.write(write, str(uss).encode())
+        os._exit(0)
+    os.close(write)
+    worker_uss = int(os.read(read, 64) or 0)
+    os.waitpid(pid, 0)
+
+    from app.utils.text_extractor import TextExtractor
+    started = time.perf_counter()
+    TextExtractor.extract_pages(b'a,b\n1,2\n', 'csv')
+    try:
+        TextExtractor.extract_pages(b'%PDF-1.4\n%%EOF\n', 'pdf', workers=1)
+    except Exception:
+        pass
+    first_use = time.perf_counter() - started
+
+    print(json.dumps({
+        'boot': boot,
+        'health': health,
+        'rss': rss / (1024 * 1024),
+        'worker_uss': worker_uss / (1024 * 1024),
+        'first_use': first_use
+    }))
+
+
+def measure(mode, runs):
+    env = dict(os.environ, **MODES[mode])
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child'],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def slowest_imports(top):
+    """Import self-time summed per top-level package, slowest first."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import run'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + int(self_us) / 1e6
+    return sorted(((seconds, name) for name, seconds in totals.items()), reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=0)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    print(f"{'mode':<10}{'boot s':>9}{'health s':>10}{'rss MB':>9}{'worker uss MB':>15}{'first use s':>13}")
+    for mode in MODES:
+        result = measure(mode, args.runs)
+        print(
+            f"{mode:<10}{result['boot']:>9.2f}{result['health']:>10.3f}{result['rss']:>9.0f}"
+            f"{result['worker_uss']:>15.1f}{result['first_use']:>13.2f}"
+        )
+
+    if args.top:
+        print("\nSlowest packages to import (lazy mode):")
+        for seconds, name in slowest_imports(args.top):
+            print(f"  {seconds:>6.2f}s  {name}")
+
+
+if __name__ == '__main__':
+    main()
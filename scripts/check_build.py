@@ -0,0 +1,40 @@
+"""
+Build-time dependency check.
+
+Heavy libraries are imported on first use (app/utils/startup.py), so a
+missing package would otherwise only surface on the first upload of that
+format. Run during the image build:
+
+    python scripts/check_build.py [--require-binaries]
+
+Exits non-zero if a module fails to import. Missing OCR binaries
+(tesseract, pdftoppm) are reported as warnings unless --require-binaries
+is given, since hosts without them can still serve text documents.
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.startup import check_modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--require-binaries', action='store_true')
+    args = parser.parse_args()
+
+    failed = False
+    for problem in check_modules():
+        fatal = problem.startswith('module') or args.require_binaries
+        failed = failed or fatal
+        print(f"{'ERROR' if fatal else 'WARNING'}: {problem}")
+
+    if failed:
+        sys.exit(1)
+    print("All lazily imported dependencies are available")
+
+
+if __name__ == '__main__':
+    main()
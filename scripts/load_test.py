@@ -0,0 +1,187 @@
+"""
+Summarize throughput: gunicorn (run:app) against uvicorn (asgi:app).
+
+Starts scripts/stub_llm_server.py as the only LLM provider, then each
+server in turn with local storage and no Unsplash key, so every request
+costs one stub completion plus extraction and rendering. Each request
+uploads a different small text file, so no cache answers it. Reported per
+server:
+
+- ok / failed: responses with and without status 200
+- req/s: completed summaries per second of wall time
+- p50, p95, max: request latency in seconds
+
+    python scripts/load_test.py [--requests 400] [--concurrency 200] [--latency 2]
+                                [--workers 2] [--threads 8] [--modes wsgi,asgi]
+
+The ASGI server needs requirements-asgi.txt. With a 2 s stub latency a
+gunicorn worker with T threads tops out near workers * T / 2 req/s, while
+the event loop is bounded by AI_ASYNC_MAX_CONCURRENCY and the offload pool.
+"""
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(mode, port, args):
+    if mode == 'wsgi':
+        return [sys.executable, '-m', 'gunicorn', 'run:app', '--bind', f'127.0.0.1:{port}',
+                '--workers', str(args.workers), '--threads', str(args.threads), '--timeout', '300']
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(args.workers), '--log-level', 'warning']
+
+
+def server_env(stub_port, scratch):
+    return dict(
+        os.environ,
+        FLASK_ENV='production',
+        LOG_LEVEL='WARNING',
+        OPENAI_API_KEY='stub',
+        OPENAI_BASE_URL=f'http://127.0.0.1:{stub_port}/v1',
+        GOOGLE_API_KEY='',
+        HUGGINGFACE_API_KEY='',
+        UNSPLASH_ACCESS_KEY='',
+        STORAGE_BACKEND='local',
+        STORAGE_LOCAL_DIR=os.path.join(scratch, 'files'),
+        SUMMARY_CACHE_BACKEND='none',
+        DOCUMENT_CACHE_BACKEND='none',
+        RATE_LIMIT_BACKEND='memory',
+        RATE_LIMIT_ROUTES='summarize=1000000,health=1000000',
+        RATE_LIMIT_USER='0',
+        AI_MAX_CONCURRENCY='0',
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(scratch, 'prometheus'),
+    )
+
+
+async def wait_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with status {process.returncode}")
+            try:
+                if (await client.get(f'{base_url}/api/v1/health')).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"Server at {base_url} not ready after {timeout}s")
+
+
+def document(index):
+    # Unique per request so neither the summary nor the document cache hits
+    lines = [f"Load test document {index}, paragraph {n}: measurements of system {index * 31 + n}." for n in range(40)]
+    return "\n\n".join(lines).encode('utf-8')
+
+
+async def run_load(base_url, total, concurrency):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    slots = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def one(index):
+            nonlocal failures
+            async with slots:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        '/api/v1/summarize',
+                        files={'file': (f'doc{index}.txt', document(index), 'text/plain')},
+                        data={'summary_depth': '1', 'user_id': f'load-{index}'}
+                    )
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'ok': len(latencies),
+        'failed': failures,
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) if latencies else 0.0,
+        'p95': latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        'max': latencies[-1] if latencies else 0.0,
+    }
+
+
+def stop(process):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=2.0, help='stub LLM seconds per completion')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--modes', default='wsgi,asgi')
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'scripts', 'stub_llm_server.py'),
+         '--port', str(stub_port), '--latency', str(args.latency)],
+        cwd=ROOT
+    )
+    results = {}
+    try:
+        for mode in args.modes.split(','):
+            port = free_port()
+            with tempfile.TemporaryDirectory(prefix=f'sycx-load-{mode}-') as scratch:
+                os.makedirs(os.path.join(scratch, 'prometheus'))
+                process = subprocess.Popen(
+                    server_command(mode, port, args), cwd=ROOT, env=server_env(stub_port, scratch)
+                )
+                try:
+                    base_url = f'http://127.0.0.1:{port}'
+                    asyncio.run(wait_ready(base_url, process))
+                    print(f"Running {args.requests} requests at concurrency {args.concurrency} against {mode}...")
+                    results[mode] = asyncio.run(run_load(base_url, args.requests, args.concurrency))
+                except RuntimeError as e:
+                    print(f"Skipping {mode}: {str(e)}")
+                finally:
+                    stop(process)
+    finally:
+        stop(stub)
+
+    print(f"\n{'mode':<8}{'ok':>6}{'failed':>8}{'req/s':>9}{'p50 s':>8}{'p95 s':>8}{'max s':>8}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<8}{result['ok']:>6}{result['failed']:>8}{result['rps']:>9.1f}"
+            f"{result['p50']:>8.2f}{result['p95']:>8.2f}{result['max']:>8.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Local OpenAI-compatible LLM stub for load tests.
+
+Serves POST /v1/chat/completions with canned answers after a configurable
+delay, so a load test measures how many summaries the API keeps in flight
+rather than provider speed or cost. JSON mode (response_format
+json_object) gets a valid structured summary; title prompts get a title.
+Standard library only, one asyncio loop, HTTP/1.1 keep-alive.
+
+    python scripts/stub_llm_server.py [--port 8900] [--latency 2.0] [--jitter 0.2]
+
+Point the API at it with OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+
+SUMMARY = (
+    "Overview\nThe document describes a system and the results of testing it under load.\n\n"
+    "Findings\nThroughput scaled with concurrency until the provider became the bottleneck."
+)
+STRUCTURED = {
+    "title": "Load Test Summary",
+    "sections": [
+        {"title": "Overview", "content": "The document describes a system and the results of testing it under load."},
+        {"title": "Findings", "content": "Throughput scaled with concurrency until the provider became the bottleneck."}
+    ],
+    "image_keywords": ["server", "network", "chart"]
+}
+
+
+def completion(body):
+    prompt = body.get('messages', [{}])[-1].get('content', '')
+    if (body.get('response_format') or {}).get('type') == 'json_object':
+        content = json.dumps(STRUCTURED)
+    elif prompt.startswith('Suggest a short'):
+        content = "Load Test Summary"
+    elif prompt.startswith('Suggest a list'):
+        content = "Overview, Findings"
+    else:
+        content = SUMMARY
+    return {
+        'id': f"stub-{random.getrandbits(48):x}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': body.get('model', 'stub'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop'
+        }],
+        'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4,
+                  'total_tokens': (len(prompt) + len(content)) // 4}
+    }
+
+
+async def handle(reader, writer, latency, jitter):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+            if method == 'POST' and path.rstrip('/').endswith('/chat/completions'):
+                await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+                status, payload = '200 OK', completion(json.loads(body or b'{}'))
+            else:
+                status, payload = '404 Not Found', {'error': {'message': f"No route for {method} {path}"}}
+
+            data = json.dumps(payload).encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data
+            )
+            await writer.drain()
+            if headers.get('connection', '').lower() == 'close':
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host, port, latency, jitter):
+    server = await asyncio.start_server(
+        lambda reader, writer: handle(reader, writer, latency, jitter), host, port, backlog=4096
+    )
+    print(f"Stub LLM listening on http://{host}:{port}/v1 (latency {latency}s ± {jitter}s)", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=2.0, help='seconds per completion')
+    parser.add_argument('--jitter', type=float, default=0.2)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.latency, args.jitter))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
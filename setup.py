@@ -1,7 +0,0 @@
-import nltk
-
-# Download necessary NLTK resources
-nltk.download('punkt')
-nltk.download('punkt_tab')
-
-print("NLTK resources downloaded successfully!")
\ No newline at end of file
@@ -0,0 +1,10 @@
+import pytest
+from app import create_app
+from app.config.config import TestingConfig
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    with app.app_context():
+        yield app
@@ -0,0 +1,205 @@
+import asyncio
+import time
+import threading
+import pytest
+from app.utils import ai_router as ai_router_module
+from app.utils.ai_router import AIRouter, AIProviderError
+from app.utils.provider_stats import get_provider_stats
+
+
+@pytest.fixture
+def app(app, monkeypatch):
+    app.config.update(AI_TOKEN_BUDGETS='', AI_MAX_CONCURRENCY=1, AI_BREAKER_FAILURE_THRESHOLD=2)
+    # Worker-wide slots are created from the config on first use
+    monkeypatch.setattr(ai_router_module, '_provider_slots', None)
+    return app
+
+
+def stub(name, reply=None, pieces=None, error=None):
+    calls = []
+
+    def func(prompt, key, json_mode=False):
+        calls.append(prompt)
+        if error:
+            raise RuntimeError(error)
+        return reply
+
+    provider = {'name': name, 'func': func, 'key': None, 'calls': calls}
+    if pieces is not None:
+        def stream(prompt, key):
+            calls.append(prompt)
+            for piece in pieces:
+                if isinstance(piece, Exception):
+                    raise piece
+                yield piece
+        provider['stream'] = stream
+    return provider
+
+
+def open_circuit(name):
+    stats = get_provider_stats()
+    while stats.allow(name):
+        stats.record(name, 1.0, False, 'down')
+
+
+class TestStreamContent:
+    def test_pieces_come_from_the_first_provider(self, app):
+        router = AIRouter(providers=[stub('a', pieces=['Hel', '', 'lo']), stub('b', pieces=['no'])])
+        assert list(router.stream_content('p')) == ['Hel', 'lo']
+
+    def test_failure_before_the_first_piece_falls_back(self, app):
+        failing = stub('a', pieces=[RuntimeError('boom')])
+        router = AIRouter(providers=[failing, stub('b', reply='whole')])
+        assert list(router.stream_content('p')) == ['whole']
+        assert get_provider_stats().snapshot()['a']['failures'] == 1
+
+    def test_failure_mid_stream_is_raised(self, app):
+        router = AIRouter(providers=[stub('a', pieces=['part', RuntimeError('cut')]), stub('b', reply='x')])
+        stream = router.stream_content('p')
+        assert next(stream) == 'part'
+        with pytest.raises(AIProviderError, match='mid-stream'):
+            next(stream)
+
+    def test_every_provider_is_tried_when_all_circuits_are_open(self, app):
+        app.config['AI_ROUTER_ADAPTIVE'] = True
+        open_circuit('a')
+        open_circuit('b')
+        router = AIRouter(providers=[stub('a', pieces=[RuntimeError('down')]), stub('b', pieces=['up'])])
+        assert list(router.stream_content('p')) == ['up']
+
+    def test_slot_is_free_while_the_consumer_holds_a_piece(self, app):
+        router = AIRouter(providers=[stub('a', pieces=['one', 'two'])])
+        stream = router.stream_content('p')
+        assert next(stream) == 'one'
+
+        slots = ai_router_module._get_provider_slots()
+        assert slots.acquire(blocking=False)
+        slots.release()
+        assert list(stream) == ['two']
+
+
+def test_unlimited_async_slot_supports_async_with(app):
+    app.config['AI_ASYNC_MAX_CONCURRENCY'] = 0
+
+    async def reply(prompt, key, json_mode=False):
+        return 'async ok'
+
+    router = AIRouter(providers=[{'name': 'a', 'func': None, 'afunc': reply, 'key': None}])
+    assert asyncio.run(router.agenerate_content('p')) == 'async ok'
+
+
+class TestHedging:
+    @pytest.fixture
+    def app(self, app, monkeypatch):
+        app.config.update(
+            AI_HEDGING_ENABLED=True, AI_MAX_CONCURRENCY=4, AI_HEDGE_BUDGET=1,
+            AI_HEDGE_DEFAULT_DELAY=0.02, AI_HEDGE_MIN_DELAY=0.02, AI_ROUTER_ADAPTIVE=False
+        )
+        monkeypatch.setattr(ai_router_module, '_hedge_pool', None)
+        monkeypatch.setattr(ai_router_module, '_hedge_budget', None)
+        return app
+
+    @staticmethod
+    def budget():
+        return ai_router_module._get_hedge_resources()[1]
+
+    @staticmethod
+    def budget_free():
+        budget = TestHedging.budget()
+        if budget.acquire(blocking=False):
+            budget.release()
+            return True
+        return False
+
+    @staticmethod
+    def slow(name, gate, calls):
+        def func(prompt, key, json_mode=False):
+            calls.append(name)
+            gate.wait(5)
+            return f"from {name}"
+        return {'name': name, 'func': func, 'key': None}
+
+    @staticmethod
+    def fast(name, calls):
+        def func(prompt, key, json_mode=False):
+            calls.append(name)
+            return f"from {name}"
+        return {'name': name, 'func': func, 'key': None}
+
+    def test_fast_primary_never_hedges(self, app):
+        calls = []
+        router = AIRouter(providers=[self.fast('a', calls), self.fast('b', calls)])
+        assert router.generate_content('p') == 'from a'
+        assert calls == ['a']
+        assert self.budget_free()
+
+    def test_budget_is_held_until_the_abandoned_call_finishes(self, app):
+        gate, calls = threading.Event(), []
+        router = AIRouter(providers=[self.slow('a', gate, calls), self.fast('b', calls)])
+
+        assert router.generate_content('p') == 'from b'
+        # The slow primary is still running, so the hedge unit stays taken
+        assert not self.budget_free()
+
+        gate.set()
+        wait_until(self.budget_free)
+        assert calls == ['a', 'b']
+
+    def test_budget_is_held_while_a_losing_hedge_runs(self, app):
+        gate, calls = threading.Event(), []
+        slow_primary = {'name': 'a', 'func': lambda prompt, key, json_mode=False: (time.sleep(0.1), 'from a')[1],
+                        'key': None}
+        router = AIRouter(providers=[slow_primary, self.slow('b', gate, calls)])
+
+        assert router.generate_content('p') == 'from a'
+        assert calls == ['b']
+        assert not self.budget_free()
+
+        gate.set()
+        wait_until(self.budget_free)
+
+    def test_exhausted_budget_disables_hedging(self, app):
+        budget = self.budget()
+        assert budget.acquire(blocking=False)
+        try:
+            calls = []
+            slow_primary = {'name': 'a', 'func': lambda prompt, key, json_mode=False: (time.sleep(0.1), 'from a')[1],
+                            'key': None}
+            router = AIRouter(providers=[slow_primary, self.fast('b', calls)])
+            assert router.generate_content('p') == 'from a'
+            assert calls == []
+        finally:
+            budget.release()
+
+    def test_loser_waiting_for_a_slot_gives_up_without_calling(self, app):
+        app.config['AI_MAX_CONCURRENCY'] = 1
+        calls = []
+        slow_primary = {'name': 'a', 'func': lambda prompt, key, json_mode=False: (time.sleep(0.1), 'from a')[1],
+                        'key': None}
+        router = AIRouter(providers=[slow_primary, self.fast('b', calls)])
+
+        assert router.generate_content('p') == 'from a'
+        wait_until(self.budget_free)
+        assert calls == []
+
+    def test_async_hedge_releases_budget_when_the_loser_is_cancelled(self, app):
+        async def slow(prompt, key, json_mode=False):
+            await asyncio.sleep(5)
+            return 'from a'
+
+        async def fast(prompt, key, json_mode=False):
+            return 'from b'
+
+        router = AIRouter(providers=[
+            {'name': 'a', 'func': None, 'afunc': slow, 'key': None},
+            {'name': 'b', 'func': None, 'afunc': fast, 'key': None},
+        ])
+        assert asyncio.run(router.agenerate_content('p')) == 'from b'
+        assert self.budget_free()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met in time'
+        time.sleep(0.01)
@@ -0,0 +1,164 @@
+import pytest
+from app.utils import cache as cache_module
+from app.utils.cache import (
+    MemoryCacheBackend, SQLiteCacheBackend, TieredCacheBackend, DocumentCache, summary_cache
+)
+from app.services.summarizer import SummaryPipeline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        self.now += 1
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module, 'time', clock)
+    return clock
+
+
+class TestDocumentKey:
+    @pytest.mark.parametrize('name, value', [
+        ('EXTRACT_MAX_PAGES', 3),
+        ('EXTRACT_MAX_CHARS', 1000),
+        ('OCR_ENABLED', False),
+        ('OCR_DPI', 150),
+        ('OCR_LANG', 'deu'),
+        ('TABLE_SAMPLE_ROWS', 2),
+        ('TABLE_MAX_COLUMNS', 3),
+        ('COMPACT_ENABLED', False),
+        ('COMPACT_DEDUPE', False),
+    ])
+    def test_extraction_settings_change_the_key(self, app, name, value):
+        before = DocumentCache.document_key('abc', 'pdf')
+        assert app.config.get(name) != value
+        app.config[name] = value
+        assert DocumentCache.document_key('abc', 'pdf') != before
+
+    @pytest.mark.parametrize('name, value', [
+        ('EXTRACT_WORKERS', 7),
+        ('EXTRACT_PARALLEL_MIN_PAGES', 1),
+        ('EXTRACT_PAGES_PER_TASK', 99),
+        ('OCR_CACHE_PATH', '/elsewhere/ocr.sqlite3'),
+    ])
+    def test_pool_settings_keep_the_key(self, app, name, value):
+        before = DocumentCache.document_key('abc', 'pdf')
+        app.config[name] = value
+        assert DocumentCache.document_key('abc', 'pdf') == before
+
+    def test_key_names_the_upload_and_type(self, app):
+        assert DocumentCache.document_key('abc', 'pdf').startswith('abc:pdf:')
+        assert DocumentCache.document_key('abc', 'pdf') != DocumentCache.document_key('abc', 'docx')
+
+
+def value(size):
+    # json.dumps adds the two quotes
+    return 'x' * (size - 2)
+
+
+class TestSQLiteEviction:
+    @pytest.fixture
+    def backend(self, tmp_path, clock):
+        return SQLiteCacheBackend(str(tmp_path / 'cache.sqlite3'), max_entries=100, max_bytes=300)
+
+    def test_byte_budget_evicts_least_recently_read(self, backend):
+        for key in ('a', 'b', 'c'):
+            backend.set(key, value(100))
+        assert backend.get('a') is not None
+
+        backend.set('d', value(100))
+
+        assert backend.get('b') is None
+        assert [backend.get(key) is not None for key in ('a', 'c', 'd')] == [True, True, True]
+
+    def test_large_value_evicts_several_rows(self, backend):
+        for key in ('a', 'b', 'c'):
+            backend.set(key, value(100))
+        backend.set('big', value(250))
+        assert [key for key in ('a', 'b', 'c', 'big') if backend.get(key) is not None] == ['big']
+
+    def test_entry_limit_evicts_least_recently_read(self, tmp_path, clock):
+        backend = SQLiteCacheBackend(str(tmp_path / 'cache.sqlite3'), max_entries=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        assert (backend.get('a'), backend.get('b'), backend.get('c')) == (1, None, 3)
+
+    def test_expired_rows_are_misses(self, tmp_path, clock):
+        backend = SQLiteCacheBackend(str(tmp_path / 'cache.sqlite3'), ttl=10)
+        backend.set('a', 1)
+        clock.now += 20
+        assert backend.get('a') is None
+
+
+def test_memory_byte_budget_skips_oversized_values():
+    backend = MemoryCacheBackend(max_bytes=100)
+    backend.set('small', value(50))
+    backend.set('huge', value(500))
+    assert backend.get('small') is not None
+    assert backend.get('huge') is None
+
+
+def test_tiered_promotes_shared_hits(tmp_path):
+    back = SQLiteCacheBackend(str(tmp_path / 'cache.sqlite3'))
+    back.set('k', {'v': 1})
+    tiered = TieredCacheBackend(MemoryCacheBackend(), back)
+
+    assert tiered.get('k') == {'v': 1}
+    back.clear()
+    assert tiered.get('k') == {'v': 1}
+
+
+class StubProcessor:
+    def __init__(self):
+        self.calls = 0
+
+    def process_file(self, upload, file_type, summary_depth, on_stage=None):
+        self.calls += 1
+        return {
+            'summary': 'A short summary of the document.',
+            'title': 'Doc',
+            'display_format': 'paragraph',
+            'stats': {
+                'chunk_count': 2,
+                'chunk_timings': [0.1, 0.2],
+                'page_count': 3,
+                'page_timings': [0.01, 0.01, 0.02],
+                'extraction_truncated': False,
+                'map_passes': 1
+            }
+        }
+
+
+class StubPDF:
+    def create_pdf(self, **kwargs):
+        return 'https://cdn.test/doc.pdf'
+
+
+@pytest.fixture
+def fresh_summary_cache(app):
+    summary_cache.reset()
+    yield summary_cache
+    summary_cache.reset()
+
+
+def test_cache_hit_returns_the_same_keys_as_a_miss(fresh_summary_cache):
+    pipeline = SummaryPipeline()
+    pipeline.file_processor = StubProcessor()
+    pipeline.pdf_generator = StubPDF()
+
+    fresh = pipeline.run(b'same bytes', 'pdf', 2.0, 'u1', filename='doc.pdf')
+    cached = pipeline.run(b'same bytes', 'pdf', 2.0, 'u2', filename='doc.pdf')
+
+    assert pipeline.file_processor.calls == 1
+    assert (fresh['cached'], cached['cached']) == (False, True)
+    assert set(cached) == set(fresh)
+    assert {k: v for k, v in cached.items() if k not in ('cached', 'user_id')} == \
+        {k: v for k, v in fresh.items() if k not in ('cached', 'user_id')}
+    assert cached['user_id'] == 'u2'
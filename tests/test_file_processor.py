@@ -0,0 +1,139 @@
+import re
+import pytest
+from app.utils.ai_router import AIRouter
+from app.utils.cache import document_cache
+from app.utils.file_processor import FileProcessor
+from app.utils.images import image_service
+
+
+@pytest.fixture
+def processor(app, monkeypatch):
+    # Partial summaries must come from the stub, not an earlier test's cache
+    monkeypatch.setattr(document_cache, '_get_backend', lambda: None)
+    app.config.update(AI_TOKEN_BUDGETS='', SUMMARY_MAX_WORKERS=2)
+    return FileProcessor()
+
+
+def use_provider(processor, func):
+    calls = []
+
+    def record(prompt, key, json_mode=False):
+        calls.append(prompt)
+        return func(prompt)
+
+    processor.router = AIRouter(providers=[{'name': 'stub', 'func': record, 'key': None}])
+    return calls
+
+
+def chunk_text(prompt):
+    return prompt.split('Text:\n', 1)[1]
+
+
+def document(paragraphs, words=50):
+    return '\n\n'.join(' '.join(f"p{n}w{i}" for i in range(words)) for n in range(paragraphs))
+
+
+class TestLengthParams:
+    @pytest.mark.parametrize('summary_depth, depth', [(0, 0.0), (1.4, 1.0), (1.6, 2.0), (2.0, 2.0), (3.9, 4.0)])
+    def test_depth_is_bucketed(self, processor, summary_depth, depth):
+        assert processor._optimize_length_params(1000, summary_depth)['depth'] == depth
+
+    def test_word_targets_follow_the_depth_ratios(self, processor):
+        config = processor._optimize_length_params(1000, 2.0)
+        assert (config['min_words'], config['max_words'], config['title_length']) == (100, 300, 4)
+
+    def test_short_documents_get_a_floor(self, processor):
+        config = processor._optimize_length_params(50, 0.0)
+        assert config['min_words'] == 30
+        assert config['max_words'] == 30
+
+    def test_long_documents_are_capped(self, app, processor):
+        app.config['SUMMARY_MAX_WORDS'] = 500
+        config = processor._optimize_length_params(100000, 4.0)
+        assert config['min_words'] == 500
+        assert config['max_words'] == 500
+
+
+class TestCondenseSource:
+    def test_text_within_the_limit_is_not_mapped(self, app, processor):
+        app.config['SUMMARY_CHUNK_TOKENS'] = 6000
+        calls = use_provider(processor, lambda prompt: 'unused')
+        text = document(5)
+
+        source, stats = processor._condense_source(text, {})
+
+        assert source == text
+        assert stats == {'chunk_count': 1, 'chunk_timings': [], 'map_passes': 0}
+        assert calls == []
+
+    def test_one_map_pass_when_partials_fit(self, app, processor):
+        app.config['SUMMARY_CHUNK_TOKENS'] = 500
+        calls = use_provider(processor, lambda prompt: 'partial ' + chunk_text(prompt).split()[0])
+        text = document(40)
+
+        source, stats = processor._condense_source(text, {})
+
+        assert stats['map_passes'] == 1
+        assert stats['chunk_count'] == len(calls) > 1
+        assert len(stats['chunk_timings']) == len(calls)
+        # Partials are joined in document order
+        firsts = re.findall(r'partial (p\d+)w0', source)
+        assert firsts == sorted(firsts, key=lambda p: int(p[1:]))
+
+    def test_map_passes_stop_at_three(self, app, processor):
+        app.config['SUMMARY_CHUNK_TOKENS'] = 500
+        # A provider that does not shrink its input never gets under the limit
+        calls = use_provider(processor, chunk_text)
+
+        source, stats = processor._condense_source(document(40), {})
+
+        assert stats['map_passes'] == 3
+        assert stats['chunk_count'] == len(calls)
+
+    def test_token_budget_lowers_the_limit(self, app, processor):
+        app.config.update(SUMMARY_CHUNK_TOKENS=6000, AI_TOKEN_BUDGETS='stub=2000', AI_PROMPT_RESERVE_TOKENS=1000)
+        use_provider(processor, lambda prompt: 'short')
+        assert processor._condense_limit() == 1000
+
+
+STRUCTURED = (
+    '{"title": "Coral Reefs", "sections": [{"title": "Overview", "content": "Reefs are declining."}],'
+    ' "image_keywords": ["coral", "reef", "ocean"]}'
+)
+
+
+class TestImageQuery:
+    @pytest.fixture
+    def queries(self, processor, monkeypatch):
+        queries = []
+        monkeypatch.setattr(image_service, 'prefetch', queries.append)
+        monkeypatch.setattr(processor, '_extract_stage', lambda source, file_type, summary_depth, on_stage: (
+            source, {}, processor._optimize_length_params(len(source.split()), summary_depth), None
+        ))
+        return queries
+
+    def test_structured_draft_keywords_drive_the_lookup(self, app, processor, queries):
+        app.config['AI_STRUCTURED_OUTPUT'] = True
+        use_provider(processor, lambda prompt: STRUCTURED)
+
+        processor.process_file(document(3), 'pdf')
+
+        assert queries == ['coral reef ocean']
+
+    def test_document_text_is_used_without_structured_output(self, app, processor, queries):
+        app.config.update(AI_STRUCTURED_OUTPUT=False, IMAGE_QUERY_SAMPLE_CHARS=40)
+        use_provider(processor, lambda prompt: 'A plain summary.')
+        text = document(3)
+
+        processor.process_file(text, 'pdf')
+
+        assert queries == [text[:40]]
+
+    def test_document_text_is_used_when_the_structured_call_fails(self, app, processor, queries):
+        app.config.update(AI_STRUCTURED_OUTPUT=True, IMAGE_QUERY_SAMPLE_CHARS=40)
+        use_provider(processor, lambda prompt: 'not json')
+        text = document(3)
+
+        processor.process_file(text, 'pdf')
+
+        assert queries == [text[:40]]
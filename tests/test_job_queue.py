@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+import subprocess
+import psutil
+import pytest
+from app.utils import job_queue as job_queue_module
+from app.utils.job_queue import (
+    owner_alive, process_token, SQLiteJobStore, JobQueue, QueueFullError, JOB_QUEUED, JOB_FAILED
+)
+
+
+@pytest.fixture
+def other_process():
+    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    yield child
+    child.kill()
+    child.wait()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteJobStore(str(tmp_path / 'jobs.db'))
+
+
+def as_worker(monkeypatch, token):
+    monkeypatch.setattr(job_queue_module, '_process_token', token)
+
+
+def set_owner(store, job_id, pid, token, updated_at=None):
+    conn = store._connect()
+    conn.execute(
+        "UPDATE jobs SET owner_pid = ?, owner_token = ?, updated_at = COALESCE(?, updated_at) WHERE id = ?",
+        (pid, token, updated_at, job_id)
+    )
+    conn.commit()
+
+
+class TestOwnerAlive:
+    def test_same_token_is_alive(self):
+        assert owner_alive(12345, process_token(), 0)
+
+    def test_earlier_process_with_our_pid_is_dead(self):
+        assert not owner_alive(os.getpid(), 'previous-worker', time.time())
+
+    def test_running_owner_is_alive(self, other_process):
+        assert owner_alive(other_process.pid, 'other-worker', time.time())
+
+    def test_reused_pid_started_after_the_row_is_dead(self, other_process):
+        started = psutil.Process(other_process.pid).create_time()
+        assert not owner_alive(other_process.pid, 'other-worker', started - 60)
+
+    def test_exited_owner_is_dead(self, monkeypatch):
+        def gone(pid):
+            raise psutil.NoSuchProcess(pid)
+        monkeypatch.setattr(job_queue_module.psutil, 'Process', gone)
+        assert not owner_alive(4242, 'other-worker', time.time())
+
+
+def test_pending_count_is_per_worker(store, monkeypatch):
+    as_worker(monkeypatch, 'worker-a')
+    store.create('a1')
+    store.create('a2')
+    as_worker(monkeypatch, 'worker-b')
+    store.create('b1')
+    store.update('b1', status=JOB_FAILED)
+    store.create('b2')
+
+    assert store.count_pending() == 1
+    as_worker(monkeypatch, 'worker-a')
+    assert store.count_pending() == 2
+
+
+def test_fail_orphaned_only_touches_dead_owners(store, other_process):
+    store.create('orphan')
+    set_owner(store, 'orphan', os.getpid(), 'previous-worker')
+    store.create('live')
+    set_owner(store, 'live', other_process.pid, 'other-worker', time.time())
+    store.create('mine')
+
+    store.fail_orphaned()
+
+    orphan = store.get('orphan')
+    assert orphan['status'] == JOB_FAILED
+    assert orphan['error'] == 'Job was interrupted by a worker restart'
+    assert store.get('live')['status'] == JOB_QUEUED
+    assert store.get('mine')['status'] == JOB_QUEUED
+
+
+def test_orphaned_jobs_fail_when_the_queue_starts(app, tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    previous = SQLiteJobStore(path)
+    previous.create('orphan')
+    set_owner(previous, 'orphan', os.getpid(), 'previous-worker')
+    app.config.update(JOB_STORE_BACKEND='sqlite', JOB_STORE_PATH=path, JOB_MAX_PENDING=1)
+
+    queue = JobQueue()
+    assert queue.get('orphan')['status'] == JOB_FAILED
+    # Orphans no longer count against this worker's pending limit
+    assert queue.store.count_pending() == 0
+
+
+def test_full_queue_rejects_new_jobs(app, tmp_path):
+    app.config.update(JOB_STORE_BACKEND='sqlite', JOB_STORE_PATH=str(tmp_path / 'jobs.db'), JOB_MAX_PENDING=1)
+    queue = JobQueue()
+    queue.store.create('waiting')
+
+    with pytest.raises(QueueFullError):
+        queue.submit(lambda on_stage=None: None)
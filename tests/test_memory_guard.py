@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import pytest
+from flask import current_app
+from app.utils.memory_guard import MemoryAdmissionController, MemoryPressureError
+
+
+@pytest.fixture
+def guard(app, monkeypatch):
+    app.config.update(
+        MAX_MEMORY_MB=1000, MEMORY_WORKERS=2, MEMORY_HIGH_WATERMARK=1.0,
+        MEMORY_REQUEST_BASE_MB=50, MEMORY_UPLOAD_FACTOR=4.0
+    )
+    guard = MemoryAdmissionController()
+    monkeypatch.setattr(guard, 'rss_mb', lambda: 100.0)
+    return guard
+
+
+def test_budget_is_split_across_workers(app, guard):
+    assert guard.limit_mb() == 500
+    app.config['MEMORY_WORKERS'] = 1
+    assert guard.limit_mb() == 1000
+    app.config['MEMORY_WORKERS'] = 0
+    assert guard.limit_mb() == 1000
+
+
+def test_estimate_scales_with_upload_size(guard):
+    assert guard.estimate_mb(10 * 1024 * 1024) == 90
+
+
+def test_work_within_the_limit_is_admitted(guard):
+    with guard.admit(200, wait=0):
+        with guard.admit(200, wait=0):
+            assert guard.status() == {'rss_mb': 100.0, 'reserved_mb': 400.0, 'limit_mb': 500.0}
+    assert guard.status()['reserved_mb'] == 0
+
+
+def test_work_past_the_limit_is_rejected(guard):
+    with guard.admit(300, wait=0):
+        with pytest.raises(MemoryPressureError) as info:
+            with guard.admit(200, wait=0):
+                pass
+    assert info.value.status_code == 503
+    assert info.value.retry_after == 1
+
+
+def test_oversized_work_runs_alone(guard):
+    with guard.admit(2000, wait=0):
+        assert guard.status()['reserved_mb'] == 2000
+
+
+def test_waiting_work_is_admitted_once_memory_is_released(guard):
+    release = threading.Event()
+    admitted = threading.Event()
+
+    def hold(app):
+        with app.app_context():
+            with guard.admit(300, wait=0):
+                admitted.set()
+                release.wait(5)
+
+    holder = threading.Thread(target=hold, args=(current_app._get_current_object(),))
+    holder.start()
+    assert admitted.wait(5)
+
+    threading.Timer(0.05, release.set).start()
+    with guard.admit(300, wait=5):
+        assert guard.status()['reserved_mb'] == 300
+    holder.join(5)
+
+
+def test_async_admission(guard):
+    async def scenario():
+        async with guard.admit_async(300, wait=0):
+            with pytest.raises(MemoryPressureError):
+                async with guard.admit_async(300, wait=0):
+                    pass
+        async with guard.admit_async(300, wait=0):
+            return guard.status()['reserved_mb']
+
+    assert asyncio.run(scenario()) == 300
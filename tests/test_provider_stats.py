@@ -0,0 +1,184 @@
+import pytest
+from app.utils import provider_stats as provider_stats_module
+from app.utils.ai_router import AIRouter, AIProviderError
+from app.utils.provider_stats import (
+    LatencyStats, CircuitBreaker, ProviderStatsRegistry, get_provider_stats,
+    BREAKER_CLOSED, BREAKER_OPEN, BREAKER_HALF_OPEN
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(provider_stats_module, 'time', clock)
+    return clock
+
+
+class TestLatencyStats:
+    def test_ewma_and_error_rate(self):
+        stats = LatencyStats(alpha=0.5)
+        stats.record(2.0, True)
+        stats.record(4.0, False, 'timeout')
+        assert stats.ewma_latency == 3.0
+        assert stats.ewma_error == 0.5
+        assert (stats.successes, stats.failures, stats.last_error) == (1, 1, 'timeout')
+
+    def test_percentile_over_the_window(self):
+        stats = LatencyStats(window=5)
+        for latency in range(1, 11):
+            stats.record(float(latency), True)
+        assert stats.percentile(0) == 6.0
+        assert stats.percentile(100) == 10.0
+        assert LatencyStats().percentile(95) is None
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+        breaker.record(False)
+        breaker.record(True)
+        breaker.record(False)
+        breaker.record(False)
+        assert breaker.state == BREAKER_CLOSED
+        breaker.record(False)
+        assert breaker.state == BREAKER_OPEN
+        assert not breaker.allow()
+
+    def test_half_open_lets_a_single_trial_through(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+        breaker.record(False)
+        clock.now += 60
+
+        assert breaker.allow()
+        assert breaker.state == BREAKER_HALF_OPEN
+        assert not breaker.allow()
+
+        breaker.record(True)
+        assert breaker.state == BREAKER_CLOSED
+        assert breaker.allow()
+
+    def test_failed_trial_reopens(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3, cooldown=60)
+        for _ in range(3):
+            breaker.record(False)
+        clock.now += 60
+        assert breaker.allow()
+        breaker.record(False)
+        assert breaker.state == BREAKER_OPEN
+        assert not breaker.allow()
+
+    def test_trial_that_never_reports_does_not_wedge(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+        breaker.record(False)
+        clock.now += 60
+        assert breaker.allow()
+        clock.now += 59
+        assert not breaker.allow()
+        clock.now += 1
+        assert breaker.allow()
+
+
+def test_order_puts_failures_behind_slower_providers():
+    registry = ProviderStatsRegistry(prior_latency=5.0, failure_penalty=30.0)
+    registry.record('fast', 1.0, True)
+    registry.record('flaky', 0.5, False)
+    registry.record('slow', 8.0, True)
+    assert registry.order(['flaky', 'slow', 'unknown', 'fast']) == ['fast', 'unknown', 'slow', 'flaky']
+
+
+def break_circuit(provider):
+    router = AIRouter(providers=[provider])
+    while get_provider_stats().snapshot().get(provider['name'], {}).get('circuit') != BREAKER_OPEN:
+        with pytest.raises(AIProviderError):
+            router.generate_content('p')
+
+
+def stub(name, calls, error=None):
+    def func(prompt, key, json_mode=False):
+        calls.append(name)
+        if error:
+            raise RuntimeError(error)
+        return f"from {name}"
+    return {'name': name, 'func': func, 'key': None}
+
+
+class TestRouterOrdering:
+    @pytest.fixture
+    def app(self, app, clock):
+        app.config.update(
+            AI_TOKEN_BUDGETS='', AI_HEDGING_ENABLED=False, AI_ROUTER_ADAPTIVE=True,
+            AI_BREAKER_FAILURE_THRESHOLD=2, AI_BREAKER_COOLDOWN=60
+        )
+        return app
+
+    def test_fastest_provider_is_tried_first(self, app):
+        stats = get_provider_stats()
+        stats.record('a', 9.0, True)
+        stats.record('b', 1.0, True)
+        calls = []
+        router = AIRouter(providers=[stub('a', calls), stub('b', calls)])
+
+        assert router.generate_content('p') == 'from b'
+        assert calls == ['b']
+
+    def test_open_circuit_is_skipped_until_cooldown(self, app, clock):
+        calls = []
+        failing = stub('a', calls, error='down')
+        break_circuit(failing)
+        router = AIRouter(providers=[failing, stub('b', calls)])
+
+        calls.clear()
+        router.generate_content('p')
+        assert calls == ['b']
+
+        # After the cooldown exactly one trial call reaches the provider
+        clock.now += 60
+        calls.clear()
+        router = AIRouter(providers=[failing, stub('b', calls, error='also down')])
+        for _ in range(2):
+            with pytest.raises(AIProviderError):
+                router.generate_content('p')
+        assert calls == ['b', 'a', 'b']
+        assert get_provider_stats().snapshot()['a']['circuit'] == BREAKER_OPEN
+
+    def test_recovered_provider_closes_its_circuit(self, app, clock):
+        calls = []
+        failing = {'error': 'down'}
+
+        def flaky(prompt, key, json_mode=False):
+            calls.append('a')
+            if failing['error']:
+                raise RuntimeError(failing['error'])
+            return 'from a'
+
+        provider = {'name': 'a', 'func': flaky, 'key': None}
+        break_circuit(provider)
+        clock.now += 60
+        failing['error'] = None
+
+        # Only provider left in the race, so its half-open trial is what runs
+        router = AIRouter(providers=[provider])
+        assert router.generate_content('p') == 'from a'
+        assert get_provider_stats().snapshot()['a']['circuit'] == BREAKER_CLOSED
+        assert router.generate_content('p') == 'from a'
+
+    def test_adaptive_off_keeps_configured_order_and_ignores_circuits(self, app):
+        app.config['AI_ROUTER_ADAPTIVE'] = False
+        stats = get_provider_stats()
+        stats.record('a', 9.0, True)
+        stats.record('b', 1.0, True)
+        for _ in range(2):
+            stats.record('a', 1.0, False)
+        calls = []
+        router = AIRouter(providers=[stub('a', calls), stub('b', calls)])
+
+        assert router.generate_content('p') == 'from a'
+        assert calls == ['a']
@@ -0,0 +1,158 @@
+from types import SimpleNamespace
+import pytest
+from app.utils import rate_limiter as rate_limiter_module
+from app.utils.rate_limiter import (
+    sliding_window, retry_after, parse_route_limits, MemoryRateLimitBackend, SQLiteRateLimitBackend, RateLimiter
+)
+
+PERIOD = 60
+
+
+class TestSlidingWindow:
+    def test_same_window_weights_previous_by_overlap(self):
+        assert sliding_window(0, 5, 3, 30, PERIOD) == (0, 5, 3, 6.5)
+
+    def test_rollover_moves_current_to_previous(self):
+        start, current, previous, estimate = sliding_window(0, 5, 3, 70, PERIOD)
+        assert (start, current, previous) == (60, 0, 5)
+        assert estimate == pytest.approx(5 * (1 - 10 / PERIOD))
+
+    def test_gap_of_two_periods_resets_both_windows(self):
+        assert sliding_window(0, 5, 3, 130, PERIOD) == (120, 0, 0, 0)
+
+    def test_window_start_exactly_on_boundary(self):
+        assert sliding_window(0, 4, 0, 60, PERIOD) == (60, 0, 4, 4)
+
+
+class TestRetryAfter:
+    def test_fits_without_previous_window(self):
+        assert retry_after(0, 2, 0, 10, PERIOD, limit=5) == 0.0
+
+    def test_waits_for_previous_window_to_decay(self):
+        # At t=96 the previous window weighs 0.4: 10 * 0.4 + 1 == limit
+        assert retry_after(60, 0, 10, 60, PERIOD, limit=5) == pytest.approx(36)
+
+    def test_full_current_window_waits_into_next(self):
+        # Next window starts at 60; the 5 carried over decay to 4 by t=72
+        assert retry_after(0, 5, 0, 20, PERIOD, limit=5) == pytest.approx(52)
+
+    @pytest.mark.parametrize('cost, expected', [(1, 0.0), (2, 0.0), (3, 80.0)])
+    def test_cost_above_one(self, cost, expected):
+        assert retry_after(0, 3, 0, 0, PERIOD, limit=5, cost=cost) == pytest.approx(expected)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(rate_limiter_module, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryRateLimitBackend(shards=2)
+    return SQLiteRateLimitBackend(str(tmp_path / 'limits.sqlite3'))
+
+
+class TestBackends:
+    def test_limit_and_retry_after(self, backend, clock):
+        for remaining in (4, 3, 2, 1, 0):
+            result = backend.hit('k', 5, PERIOD)
+            assert result.allowed and result.remaining == remaining
+
+        denied = backend.hit('k', 5, PERIOD)
+        assert not denied.allowed
+        assert denied.retry_after == 72
+
+    def test_cost_counts_as_several_requests(self, backend, clock):
+        assert backend.hit('k', 5, PERIOD, cost=3).remaining == 2
+        denied = backend.hit('k', 5, PERIOD, cost=3)
+        assert not denied.allowed
+        assert denied.retry_after == 80
+        # A denied hit does not consume the budget
+        assert backend.hit('k', 5, PERIOD, cost=2).allowed
+
+    def test_rollover_carries_weighted_previous(self, backend, clock):
+        for _ in range(5):
+            backend.hit('k', 5, PERIOD)
+        clock[0] = 90.0
+        # Previous window still weighs 0.5 -> estimate 2.5, room for 2 more
+        assert backend.hit('k', 5, PERIOD).allowed
+        assert backend.hit('k', 5, PERIOD).allowed
+        assert not backend.hit('k', 5, PERIOD).allowed
+
+    def test_gap_of_two_periods_starts_fresh(self, backend, clock):
+        for _ in range(5):
+            backend.hit('k', 5, PERIOD)
+        clock[0] = 2 * PERIOD + 1
+        assert backend.hit('k', 5, PERIOD, cost=5).allowed
+
+    def test_keys_are_independent(self, backend, clock):
+        backend.hit('a', 1, PERIOD)
+        assert not backend.hit('a', 1, PERIOD).allowed
+        assert backend.hit('b', 1, PERIOD).allowed
+
+    def test_refund_gives_back_a_hit(self, backend, clock):
+        backend.hit('k', 1, PERIOD)
+        backend.refund('k', PERIOD)
+        assert backend.hit('k', 1, PERIOD).allowed
+        # Never below zero, and unknown keys are ignored
+        backend.refund('k', PERIOD, cost=5)
+        backend.refund('unknown', PERIOD)
+        assert backend.hit('k', 1, PERIOD).allowed
+        assert not backend.hit('k', 1, PERIOD).allowed
+
+    def test_refund_after_rollover_is_ignored(self, backend, clock):
+        backend.hit('k', 2, PERIOD)
+        clock[0] = PERIOD + 1
+        backend.refund('k', PERIOD)
+        assert backend.hit('k', 2, PERIOD).allowed
+        assert not backend.hit('k', 2, PERIOD).allowed
+
+
+def test_parse_route_limits():
+    assert parse_route_limits('summarize=100/15, health=600,bad,x=y', 900) == {
+        'summarize': (100, 900.0),
+        'health': (600, 900)
+    }
+
+
+class TestUserQuota:
+    @pytest.fixture
+    def limiter(self, app, clock):
+        app.config.update(RATE_LIMIT_USER=1, RATE_LIMIT_USER_HEADER='X-Authenticated-User')
+        # Routes use the process-wide limiter; start it with empty counters
+        rate_limiter_module.rate_limiter.reset()
+        yield RateLimiter()
+        rate_limiter_module.rate_limiter.reset()
+
+    def test_identity_comes_only_from_the_trusted_header(self, app, limiter):
+        assert limiter.trusted_user_id({'X-Authenticated-User': 'alice'}) == 'alice'
+        assert limiter.trusted_user_id({'X-Other': 'alice'}) is None
+        app.config['RATE_LIMIT_USER_HEADER'] = ''
+        assert limiter.trusted_user_id({'X-Authenticated-User': 'alice'}) is None
+
+    def test_user_budget_is_separate_from_ip_budget(self, limiter):
+        assert limiter.check('summarize', '10.0.0.1', user_id='alice').allowed
+        assert not limiter.check('summarize', '10.0.0.2', user_id='alice').allowed
+        assert limiter.check('summarize', '10.0.0.2', user_id='bob').allowed
+
+    def test_user_rejection_does_not_cost_the_ip_budget(self, app, limiter):
+        app.config['RATE_LIMIT_ROUTES'] = 'summarize=2'
+        assert limiter.check('summarize', '10.0.0.1', user_id='alice').allowed
+        for _ in range(3):
+            assert not limiter.check('summarize', '10.0.0.1', user_id='alice').allowed
+        # One IP hit used by alice, one left for bob
+        assert limiter.check('summarize', '10.0.0.1', user_id='bob').allowed
+        assert not limiter.check('summarize', '10.0.0.1').allowed
+
+    def test_form_user_id_is_not_counted(self, app, limiter):
+        client = app.test_client()
+        for _ in range(3):
+            response = client.post('/api/v1/summarize', data={'user_id': 'alice'})
+            assert response.status_code == 400
+        response = client.post('/api/v1/summarize', headers={'X-Authenticated-User': 'alice'})
+        assert response.status_code == 400
+        response = client.post('/api/v1/summarize', headers={'X-Authenticated-User': 'alice'})
+        assert response.status_code == 429
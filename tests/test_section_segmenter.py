@@ -0,0 +1,136 @@
+import pytest
+from app.utils.file_processor import FileProcessor
+from app.utils.section_segmenter import is_heading, has_structure, segment_sections, compile_markers, DEFAULT_MARKERS
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('# Title', True),
+    ('### Deep Heading', True),
+    ('1. Scope', True),
+    ('a) Cost', True),
+    ('II. Methods', True),
+    ('Key findings:', True),
+    ('**Bold Heading**', True),
+    ('EXECUTIVE SUMMARY', True),
+    ('Results and Discussion', True),
+    ('This is a sentence.', False),
+    ('results and discussion', False),
+    ('Revenue, growth', False),
+    ('Revenue grew. Costs fell', False),
+    ('2024', False),
+    ('A' * 81, False),
+    ('', False),
+])
+def test_is_heading(line, expected):
+    assert is_heading(line) is expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    (
+        '# Results\n\nRevenue grew.\n\n## Outlook\n\nStable.',
+        [{'title': 'Results', 'content': 'Revenue grew.'}, {'title': 'Outlook', 'content': 'Stable.'}]
+    ),
+    (
+        '1. Scope\nWe test things.\n\n2. Method\nWe measure.',
+        [{'title': 'Scope', 'content': 'We test things.'}, {'title': 'Method', 'content': 'We measure.'}]
+    ),
+    (
+        'Key Findings:\nA lot.\n\nNext Steps\nMore work.',
+        [{'title': 'Key Findings', 'content': 'A lot.'}, {'title': 'Next Steps', 'content': 'More work.'}]
+    ),
+    (
+        'Opening words.\n\n# Scope\n\nOne.\n\nTwo.\n\n# Method\n\nThree.',
+        [
+            {'title': 'Introduction', 'content': 'Opening words.'},
+            {'title': 'Scope', 'content': 'One.\nTwo.'},
+            {'title': 'Method', 'content': 'Three.'}
+        ]
+    ),
+])
+def test_structural_headings(text, expected):
+    assert has_structure(text)
+    assert segment_sections(text) == expected
+
+
+def test_single_heading_is_not_trusted():
+    assert not has_structure('Only one.\n\n# Heading\n\nbody.')
+
+
+@pytest.mark.parametrize('text, markers, expected', [
+    (
+        'Cats sleep. First, they eat. Then they play.',
+        None,
+        [{'title': 'Introduction', 'content': 'Cats sleep.'}, {'title': 'First, they eat.', 'content': 'Then they play.'}]
+    ),
+    # Whole words only: "firstly" and "Nextgen" do not contain a marker
+    (
+        'The firstly rated item. Nextgen tools matter. Finally we stop. Done.',
+        None,
+        [
+            {'title': 'Introduction', 'content': 'The firstly rated item. Nextgen tools matter.'},
+            {'title': 'Finally we stop.', 'content': 'Done.'}
+        ]
+    ),
+    (
+        'Plain text. A custom marker appears here. After.',
+        ['Custom Marker'],
+        [{'title': 'Introduction', 'content': 'Plain text.'}, {'title': 'A custom marker appears here.', 'content': 'After.'}]
+    ),
+    # Consecutive marker sentences: the second becomes content, not a lost title
+    (
+        'First we plan. Second we build.',
+        None,
+        [{'title': 'First we plan.', 'content': 'Second we build.'}]
+    ),
+    # A trailing marker sentence joins the previous section
+    (
+        'Cats sleep. Finally.',
+        None,
+        [{'title': 'Introduction', 'content': 'Cats sleep. Finally.'}]
+    ),
+])
+def test_marker_sections(text, markers, expected):
+    assert segment_sections(text, markers) == expected
+
+
+def test_marker_pattern_matches_every_default_marker_as_a_word():
+    pattern = compile_markers(DEFAULT_MARKERS)
+    for marker in DEFAULT_MARKERS:
+        assert pattern.search(f"and {marker} then")
+        assert not pattern.search(f"and {marker}ish then")
+
+
+def test_empty_text_has_no_sections():
+    assert segment_sections('   ') == []
+
+
+STRUCTURED = '# Scope\n\nOne.\n\n# Method\n\nTwo.'
+UNSTRUCTURED = 'Cats sleep. First, they eat. Then they play.'
+
+
+class StubRouter:
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, json_mode=False):
+        self.prompts.append(prompt)
+        return 'they eat, they play'
+
+
+@pytest.mark.parametrize('mode, text, asks_llm', [
+    ('auto', UNSTRUCTURED, True),
+    ('auto', STRUCTURED, False),
+    ('always', UNSTRUCTURED, True),
+    ('always', STRUCTURED, True),
+    ('never', UNSTRUCTURED, False),
+    ('never', STRUCTURED, False),
+])
+def test_section_markers_llm_modes(app, mode, text, asks_llm):
+    app.config['SECTION_MARKERS_LLM'] = mode
+    processor = FileProcessor()
+    processor.router = StubRouter()
+
+    markers = processor._section_markers(text)
+
+    assert bool(processor.router.prompts) is asks_llm
+    assert markers == (['they eat', 'they play'] if asks_llm else [])
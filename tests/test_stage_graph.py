@@ -0,0 +1,140 @@
+import time
+import threading
+import pytest
+from app.utils.stage_graph import StageGraph, StageTimeoutError, parse_timeouts, build_graph
+
+
+def test_parse_timeouts_skips_malformed_items():
+    assert parse_timeouts('title=30, image = 2.5,bad,oops=x') == {'title': 30.0, 'image': 2.5}
+
+
+def test_build_graph_reads_the_config(app):
+    app.config.update(STAGE_TIMEOUTS='title=5', STAGE_TIMEOUT_DEFAULT=20)
+    graph = build_graph('doc').add('title', lambda: 't').add('image', lambda: 'i')
+    assert (graph._stages['title'].timeout, graph._stages['image'].timeout) == (5.0, 20)
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError, match="unknown stage 'missing'"):
+        StageGraph('g').add('b', lambda x: x, deps=('missing',))
+
+
+def test_dependencies_feed_results_in_order(app):
+    graph = StageGraph('g')
+    graph.add('text', lambda: 'doc')
+    graph.add('summary', lambda text: f"summary of {text}", deps=('text',))
+    graph.add('title', lambda text: f"title of {text}", deps=('text',))
+    graph.add('pdf', lambda summary, title: (title, summary), deps=('summary', 'title'))
+
+    results = graph.run()
+
+    assert results['pdf'] == ('title of doc', 'summary of doc')
+    assert set(graph.timings) == {'text', 'summary', 'title', 'pdf'}
+
+
+def test_independent_stages_overlap(app):
+    barrier = threading.Barrier(2, timeout=5)
+
+    def meet():
+        # Deadlocks (and times out) unless both stages run at once
+        barrier.wait()
+        return True
+
+    graph = StageGraph('g').add('a', meet).add('b', meet)
+    assert graph.run() == {'a': True, 'b': True}
+
+
+def test_stage_waits_for_every_dependency(app):
+    order = []
+
+    def step(name, delay=0):
+        def run(*args):
+            time.sleep(delay)
+            order.append(name)
+            return name
+        return run
+
+    graph = StageGraph('g')
+    graph.add('slow', step('slow', 0.05)).add('fast', step('fast'))
+    graph.add('join', step('join'), deps=('fast', 'slow'))
+    graph.run()
+    assert order[-1] == 'join'
+
+
+def test_failed_optional_stage_passes_its_default_to_dependents(app):
+    def broken():
+        raise RuntimeError('no image')
+
+    graph = StageGraph('g')
+    graph.add('image', broken, required=False, default='placeholder')
+    graph.add('pdf', lambda image: f"pdf with {image}", deps=('image',))
+
+    assert graph.run() == {'image': 'placeholder', 'pdf': 'pdf with placeholder'}
+
+
+def test_failed_required_stage_raises_and_skips_dependents(app):
+    called = []
+
+    def broken():
+        raise KeyError('summary')
+
+    graph = StageGraph('g')
+    graph.add('summary', broken)
+    graph.add('pdf', lambda summary: called.append('pdf'), deps=('summary',))
+
+    with pytest.raises(KeyError):
+        graph.run()
+    assert called == []
+    assert graph.cancelled.is_set()
+
+
+def test_required_failure_cancels_running_stages(app):
+    seen = threading.Event()
+
+    def polling():
+        while not graph.cancelled.wait(0.01):
+            pass
+        seen.set()
+        return 'stopped'
+
+    def broken():
+        time.sleep(0.02)
+        raise RuntimeError('boom')
+
+    graph = StageGraph('g').add('poller', polling, required=False).add('broken', broken)
+    with pytest.raises(RuntimeError, match='boom'):
+        graph.run()
+    assert seen.wait(5)
+
+
+def test_optional_timeout_uses_the_default(app):
+    release = threading.Event()
+    graph = StageGraph('g')
+    graph.add('image', lambda: release.wait(5), required=False, default=None, timeout=0.05)
+    graph.add('title', lambda: 'title')
+
+    started = time.monotonic()
+    results = graph.run()
+    release.set()
+
+    assert results == {'image': None, 'title': 'title'}
+    assert time.monotonic() - started < 2
+
+
+def test_required_timeout_raises(app):
+    release = threading.Event()
+    graph = StageGraph('g', timeouts={'summary': 0.05})
+    graph.add('summary', lambda: release.wait(5))
+
+    with pytest.raises(StageTimeoutError, match="'summary' timed out") as info:
+        graph.run()
+    release.set()
+    assert info.value.stage == 'summary'
+    assert graph.cancelled.is_set()
+
+
+def test_stage_started_after_cancellation_does_not_run(app):
+    graph = StageGraph('g')
+    graph.cancelled.set()
+    with pytest.raises(RuntimeError, match="'a' cancelled"):
+        graph._call(graph.add('a', lambda: 'ran')._stages['a'], [])
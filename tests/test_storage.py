@@ -0,0 +1,191 @@
+import io
+import os
+import time
+import threading
+import pytest
+from app.utils import storage as storage_module
+from app.utils.storage import (
+    StorageService, UploadOutbox, LocalStorage, StorageError, UPLOAD_PENDING, UPLOAD_DONE, UPLOAD_FAILED
+)
+
+BASE_URL = 'http://api.test/'
+
+
+class FakeRemote:
+    name = 'fake'
+    remote = True
+
+    def __init__(self, failures=0, gate=None):
+        self.failures = failures
+        self.gate = gate
+        self.calls = []
+
+    def put(self, path, key):
+        self.calls.append(key)
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.failures > 0:
+            self.failures -= 1
+            raise StorageError('CDN unavailable')
+        return f"https://cdn.test/{key}.pdf"
+
+
+@pytest.fixture
+def app(app, tmp_path):
+    app.config.update(
+        STORAGE_BACKEND='cloudinary',
+        STORAGE_PUBLIC_URL='',
+        STORAGE_STAGING_DIR=str(tmp_path / 'staging'),
+        STORAGE_OUTBOX_PATH=str(tmp_path / 'outbox.sqlite3'),
+        STORAGE_ASYNC_UPLOAD=False,
+        STORAGE_ORPHAN_SWEEP_INTERVAL=0,
+        STORAGE_RETRY_BASE=0.01,
+        STORAGE_RETRY_MAX_DELAY=0.05,
+        STORAGE_MAX_ATTEMPTS=4
+    )
+    return app
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    backend = FakeRemote()
+    monkeypatch.setattr(storage_module, 'build_storage_backend', lambda config: backend)
+    return backend
+
+
+def pdf():
+    return io.BytesIO(b'%PDF-1.4 test')
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met in time'
+        time.sleep(0.01)
+
+
+def status(service, key):
+    return service._outbox.get(key)['status']
+
+
+class TestSave:
+    def test_inline_upload_returns_the_cdn_url(self, app, remote):
+        service = StorageService()
+        assert service.save(pdf(), 'Report', base_url=BASE_URL) == 'https://cdn.test/Report.pdf'
+
+        row = service._outbox.get('Report')
+        assert (row['status'], row['attempts']) == (UPLOAD_DONE, 1)
+        assert not os.path.exists(row['path'])
+
+    def test_failed_inline_upload_returns_the_stable_url_and_retries(self, app, remote):
+        remote.failures = 2
+        service = StorageService()
+
+        assert service.save(pdf(), 'Report', base_url=BASE_URL) == 'http://api.test/api/v1/files/Report.pdf'
+        wait_until(lambda: status(service, 'Report') == UPLOAD_DONE)
+        assert service._outbox.get('Report')['attempts'] == 3
+        assert service.resolve('Report') == ('redirect', 'https://cdn.test/Report.pdf')
+
+    def test_upload_gives_up_after_max_attempts(self, app, remote):
+        remote.failures = 10
+        service = StorageService()
+        service.save(pdf(), 'Report', base_url=BASE_URL)
+
+        wait_until(lambda: status(service, 'Report') == UPLOAD_FAILED)
+        assert len(remote.calls) == 4
+        assert service._outbox.get('Report')['error'] == 'CDN unavailable'
+
+    def test_async_upload_returns_the_stable_url_at_once(self, app, remote):
+        app.config['STORAGE_ASYNC_UPLOAD'] = True
+        remote.gate = threading.Event()
+        service = StorageService()
+
+        url = service.save(pdf(), 'Report', base_url=BASE_URL)
+
+        assert url == 'http://api.test/api/v1/files/Report.pdf'
+        # The staged copy is served until the upload lands
+        kind, path = service.resolve('Report')
+        assert kind == 'file' and os.path.exists(path)
+        assert service.refresh_url(url) == url
+
+        remote.gate.set()
+        wait_until(lambda: status(service, 'Report') == UPLOAD_DONE)
+        assert service.resolve('Report') == ('redirect', 'https://cdn.test/Report.pdf')
+        assert service.refresh_url(url) == 'https://cdn.test/Report.pdf'
+
+
+def test_retry_delays_back_off_exponentially_up_to_the_cap(app, remote, monkeypatch):
+    app.config.update(STORAGE_RETRY_BASE=2.0, STORAGE_RETRY_MAX_DELAY=10, STORAGE_MAX_ATTEMPTS=8)
+    monkeypatch.setattr(storage_module.random, 'uniform', lambda low, high: high)
+    service = StorageService()
+    service.backend
+    service._outbox.add('Report', '/nowhere.pdf')
+
+    delays = [service._failed('Report', {'attempts': attempts}, StorageError('down')) for attempts in range(6)]
+
+    assert delays == [2.0, 4.0, 8.0, 10, 10, 10]
+    assert service._failed('Report', {'attempts': 7}, StorageError('down')) is None
+    assert status(service, 'Report') == UPLOAD_FAILED
+
+
+class TestRefreshUrl:
+    def test_other_urls_are_unchanged(self, app, remote):
+        assert StorageService().refresh_url('https://cdn.test/a.pdf') == 'https://cdn.test/a.pdf'
+
+    def test_unknown_stable_url_is_gone(self, app, remote):
+        assert StorageService().refresh_url('http://api.test/api/v1/files/missing.pdf') is None
+
+    def test_local_file_keeps_its_url(self, app, tmp_path, monkeypatch):
+        local = LocalStorage(str(tmp_path / 'files'))
+        monkeypatch.setattr(storage_module, 'build_storage_backend', lambda config: local)
+        service = StorageService()
+
+        url = service.save(pdf(), 'Report', base_url=BASE_URL)
+
+        assert url == 'http://api.test/api/v1/files/Report.pdf'
+        assert service.refresh_url(url) == url
+        os.remove(local.path_for('Report'))
+        assert service.refresh_url(url) is None
+
+
+def orphan(outbox, key, tmp_path):
+    path = str(tmp_path / f"{key}.pdf")
+    with open(path, 'wb') as f:
+        f.write(b'%PDF')
+    outbox.add(key, path)
+    # Same pid, different token: an earlier worker process that has exited
+    outbox.update(key, owner_token='previous-worker')
+    return path
+
+
+class TestOrphanedUploads:
+    def test_claim_takes_over_dead_owners_once(self, tmp_path):
+        outbox = UploadOutbox(str(tmp_path / 'outbox.sqlite3'))
+        orphan(outbox, 'dead', tmp_path)
+        outbox.add('mine', str(tmp_path / 'mine.pdf'))
+
+        assert outbox.claim_orphaned() == ['dead']
+        assert outbox.get('dead')['owner_token'] == storage_module.process_token()
+        assert outbox.claim_orphaned() == []
+
+    def test_finished_uploads_are_not_claimed(self, tmp_path):
+        outbox = UploadOutbox(str(tmp_path / 'outbox.sqlite3'))
+        orphan(outbox, 'dead', tmp_path)
+        outbox.update('dead', status=UPLOAD_DONE, url='https://cdn.test/dead.pdf')
+        assert outbox.claim_orphaned() == []
+
+    def test_orphans_are_resumed_on_start(self, app, remote, tmp_path):
+        orphan(UploadOutbox(app.config['STORAGE_OUTBOX_PATH']), 'dead', tmp_path)
+        service = StorageService()
+        service.backend
+        wait_until(lambda: status(service, 'dead') == UPLOAD_DONE)
+
+    def test_orphans_are_swept_periodically(self, app, remote, tmp_path):
+        app.config['STORAGE_ORPHAN_SWEEP_INTERVAL'] = 0.05
+        service = StorageService()
+        service.backend
+
+        orphan(service._outbox, 'dead', tmp_path)
+        assert status(service, 'dead') == UPLOAD_PENDING
+        wait_until(lambda: status(service, 'dead') == UPLOAD_DONE)
+        assert remote.calls == ['dead']
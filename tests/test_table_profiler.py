@@ -0,0 +1,84 @@
+import datetime
+from app.utils.table_profiler import TableProfiler, ColumnProfile, table_settings, DEFAULT_TABLE_SETTINGS
+
+
+def sales_rows(count):
+    return [('North' if n % 3 else 'South', n, datetime.date(2024, 1, 1) + datetime.timedelta(days=n))
+            for n in range(1, count + 1)]
+
+
+def test_table_settings_ignores_unset_overrides():
+    settings = table_settings({'sample_rows': 8, 'max_chars': None})
+    assert settings['sample_rows'] == 8
+    assert settings['max_chars'] == DEFAULT_TABLE_SETTINGS['max_chars']
+
+
+def test_column_statistics():
+    profiler = TableProfiler('Sales')
+    profiler.add_rows([('Region', 'Units', 'Day')] + sales_rows(99))
+    text = profiler.describe()
+
+    assert text.startswith('Table: Sales (99 rows x 3 columns)')
+    assert '- Region: text; 99 filled; 2 distinct; top: North (66), South (33)' in text
+    assert '- Units: number; 99 filled; 99 distinct; range 1 to 99, mean 50' in text
+    assert '- Day: date; 99 filled; 99 distinct; dates 2024-01-02 to 2024-04-09' in text
+
+
+def test_batches_give_the_same_profile_as_one_pass():
+    rows = [('Region', 'Units', 'Day')] + sales_rows(500)
+    whole = TableProfiler('T', {'chunk_rows': 1000})
+    whole.add_rows(rows)
+    batched = TableProfiler('T')
+    for start in range(0, len(rows), 64):
+        batched.add_rows(rows[start:start + 64])
+
+    assert [c.describe() for c in batched.columns] == [c.describe() for c in whole.columns]
+    assert batched.row_count == whole.row_count == 500
+
+
+def test_sample_keeps_head_rows_and_a_bounded_reservoir():
+    profiler = TableProfiler('T', {'sample_rows': 6, 'head_rows': 2})
+    profiler.add_rows([('Region', 'Units', 'Day')] + sales_rows(1000))
+
+    assert profiler.head == sales_rows(2)
+    assert len(profiler.reservoir) == 4
+    assert 'Sample rows (6 of 1,000):' in profiler.describe()
+
+
+def test_rows_without_a_header_get_column_names():
+    profiler = TableProfiler('N')
+    profiler.add_rows([(1, 2), (3, 4)])
+    assert '- Column 1: number; 2 filled; 2 distinct; range 1 to 3, mean 2' in profiler.describe()
+
+
+def test_columns_appearing_later_count_earlier_rows_as_empty():
+    profiler = TableProfiler('T')
+    profiler.add_rows([('A',), (1,), (2,)])
+    profiler.add_rows([(3, 'x')])
+    assert profiler.columns[1].empty == 2
+    assert profiler.columns[1].filled == 1
+
+
+def test_wide_tables_profile_only_max_columns():
+    profiler = TableProfiler('Wide', {'max_columns': 3})
+    profiler.add_rows([tuple(f"c{n}" for n in range(10)), tuple(range(10))])
+    assert len(profiler.columns) == 3
+    assert '(1 rows x 10 columns)' in profiler.describe()
+
+
+def test_description_fits_the_character_budget():
+    profiler = TableProfiler('Big')
+    profiler.add_rows([tuple(f"Column {n}" for n in range(40))] + [tuple(range(n, n + 40)) for n in range(200)])
+    assert len(profiler.describe(max_chars=1500)) <= 1500
+
+
+def test_mixed_and_empty_columns():
+    column = ColumnProfile('m')
+    column.update([1, 'a', 'b', None, ''])
+    assert column.kind == 'mixed'
+    assert column.empty == 2
+    assert ColumnProfile('e').kind == 'empty'
+
+
+def test_empty_table():
+    assert TableProfiler('E').describe() == 'Table: E (empty)'
@@ -0,0 +1,44 @@
+import pytest
+from app.utils.text_chunker import TextChunker, estimate_tokens, CHARS_PER_TOKEN
+
+
+@pytest.mark.parametrize('text, tokens', [('', 0), ('a', 1), ('abcd', 1), ('abcde', 2), ('x' * 400, 100)])
+def test_estimate_tokens(text, tokens):
+    assert estimate_tokens(text) == tokens
+
+
+def test_short_text_is_one_chunk():
+    assert TextChunker(100).split('One paragraph.\n\nAnother one.') == ['One paragraph.\n\nAnother one.']
+
+
+def test_blank_text_has_no_chunks():
+    assert TextChunker(100).split('\n\n  \n') == []
+
+
+def test_blocks_are_packed_greedily_without_splitting():
+    blocks = [f"Paragraph {n} " + 'word ' * 15 for n in range(10)]
+    chunker = TextChunker(50)
+    chunks = chunker.split('\n\n'.join(blocks))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= chunker.max_chars for chunk in chunks)
+    # Every paragraph lands whole in exactly one chunk, in order
+    assert [b.strip() for chunk in chunks for b in chunk.split('\n\n')] == [b.strip() for b in blocks]
+
+
+def test_oversized_block_splits_on_sentences():
+    sentences = [f"Sentence number {n} has a few words in it." for n in range(20)]
+    chunker = TextChunker(30)
+    chunks = chunker.split(' '.join(sentences))
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= chunker.max_chars for chunk in chunks)
+    assert ' '.join(chunks).split() == ' '.join(sentences).split()
+
+
+def test_oversized_sentence_is_hard_wrapped():
+    text = 'x' * (10 * CHARS_PER_TOKEN * 3 + 5)
+    chunks = TextChunker(10).split(text)
+
+    assert [len(chunk) for chunk in chunks] == [40, 40, 40, 5]
+    assert ''.join(chunks) == text
@@ -0,0 +1,106 @@
+import pytest
+from app.utils.text_compactor import (
+    normalize_whitespace, strip_running_lines, sample_table_rows, sample_tables, dedupe_paragraphs, compact_pages
+)
+
+
+def report_pages(count):
+    return [
+        f"ACME Corp Annual Report {2020 + n}\nBody text of page {n} discussing results in detail.\nPage {n} of {count}"
+        for n in range(1, count + 1)
+    ]
+
+
+def test_normalize_whitespace():
+    text = 'Hello   wor-\nld\x07\r\n\n\n\nNext   line  '
+    assert normalize_whitespace(text) == 'Hello world\n\nNext line'
+
+
+@pytest.mark.parametrize('line, stripped', [
+    ('12', True),
+    ('Page 3', True),
+    ('- 4 -', True),
+    ('iv', True),
+    ('page 2 of 10', True),
+    ('[7]', True),
+    ('Chapter 3', False),
+    ('2024 results', False),
+])
+def test_page_numbers_at_page_edges(line, stripped):
+    pages, removed = strip_running_lines([f"{line}\nFirst body line.\nSecond body line.\nThird body line."])
+    assert (removed == 1) is stripped
+    assert pages[0].startswith(line) is not stripped
+
+
+def test_running_headers_differing_by_numbers_are_removed():
+    pages, removed = strip_running_lines(report_pages(5))
+    assert removed == 10
+    assert pages == [f"Body text of page {n} discussing results in detail." for n in range(1, 6)]
+
+
+def test_headers_need_enough_pages():
+    pages, removed = strip_running_lines(['Same header\nBody one.', 'Same header\nBody two.'])
+    assert removed == 0
+
+
+def test_repeated_body_lines_are_kept():
+    body = ['Intro line.', 'Shared sentence in the middle.', 'Closing line.', 'More text.', 'End text.']
+    pages = ['\n'.join([f"Unique top {n}."] + body + [f"Unique bottom {n}."]) for n in range(4)]
+    stripped, _ = strip_running_lines(pages)
+    assert all('Shared sentence in the middle.' in page for page in stripped)
+
+
+def test_sample_table_rows_keeps_head_middle_and_tail():
+    rows = [f"row {n}" for n in range(100)]
+    kept, omitted = sample_table_rows(rows, 12)
+    assert omitted == 88
+    assert kept[:4] == rows[:4]
+    assert kept[-2:] == rows[-2:]
+    assert kept[-3] == '[... 88 similar rows omitted ...]'
+    assert len(kept) == 13
+
+
+def test_small_tables_are_untouched():
+    rows = [f"row {n}" for n in range(5)]
+    assert sample_table_rows(rows, 12) == (rows, 0)
+
+
+def test_sample_tables_only_touches_table_runs():
+    rows = [f"a{n}\tb{n}" for n in range(100)]
+    text, omitted = sample_tables('intro\n' + '\n'.join(rows) + '\noutro', 12)
+    lines = text.split('\n')
+    assert omitted == 88
+    assert (lines[0], lines[-1]) == ('intro', 'outro')
+
+
+def test_dedupe_paragraphs():
+    text = '\n\n'.join([
+        'This paragraph is long enough to be considered for duplicate removal.',
+        'this PARAGRAPH is long enough, to be considered for duplicate removal!',
+        'Short.',
+        'Short.',
+        'This paragraph is long enough to be considered for duplicate removal today.',
+        'A different paragraph entirely, with no overlap in words whatsoever here.',
+    ])
+    deduped, removed = dedupe_paragraphs(text)
+    assert removed == 2
+    assert deduped.split('\n\n') == [
+        'This paragraph is long enough to be considered for duplicate removal.',
+        'Short.',
+        'Short.',
+        'A different paragraph entirely, with no overlap in words whatsoever here.',
+    ]
+
+
+def test_compact_pages_reports_savings():
+    text, stats = compact_pages(report_pages(5), 'pdf')
+    assert text.split('\n\n') == [f"Body text of page {n} discussing results in detail." for n in range(1, 6)]
+    assert stats['header_lines_removed'] == 10
+    assert stats['tokens_after'] < stats['tokens_before']
+
+
+def test_spreadsheet_profiles_keep_their_edges():
+    pages = ['Table: Sheet1 (3 rows x 2 columns)\nColumn statistics:\n- A: number\n- B: text'] * 4
+    text, stats = compact_pages(pages, 'xlsx', dedupe=False)
+    assert stats['header_lines_removed'] == 0
+    assert text.count('Table: Sheet1') == 4
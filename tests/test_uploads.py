@@ -0,0 +1,67 @@
+import io
+import os
+import hashlib
+import pytest
+from app.utils.uploads import SpooledUpload
+
+DATA = bytes(range(256)) * 64
+
+
+class Trickle(io.BytesIO):
+    """Returns at most 1000 bytes per read, like a network stream."""
+
+    def read(self, size=-1):
+        return super().read(min(size, 1000) if size and size > 0 else 1000)
+
+
+def test_small_upload_stays_in_memory():
+    with SpooledUpload.from_stream(io.BytesIO(DATA), threshold=len(DATA)) as upload:
+        assert upload.in_memory
+        assert upload.read() == DATA
+        assert upload.size == len(DATA)
+        assert upload.sha256 == hashlib.sha256(DATA).hexdigest()
+
+
+def test_large_upload_spools_to_disk(tmp_path):
+    upload = SpooledUpload.from_stream(Trickle(DATA), threshold=4096, spool_dir=str(tmp_path / 'spool'))
+    path = upload.path
+
+    assert not upload.in_memory
+    assert os.path.dirname(path) == str(tmp_path / 'spool')
+    assert upload.read() == DATA
+    assert upload.sha256 == hashlib.sha256(DATA).hexdigest()
+
+    copy = io.BytesIO()
+    upload.copy_to(copy)
+    assert copy.getvalue() == DATA
+
+    upload.close()
+    assert not os.path.exists(path)
+    upload.close()
+
+
+def test_open_returns_independent_handles(tmp_path):
+    with SpooledUpload.from_stream(io.BytesIO(DATA), threshold=10, spool_dir=str(tmp_path)) as upload:
+        first, second = upload.open(), upload.open()
+        first.read(100)
+        assert second.read(5) == DATA[:5]
+        first.close()
+        second.close()
+
+
+def test_failed_read_removes_the_spool_file(tmp_path):
+    class Broken(io.BytesIO):
+        def read(self, size=-1):
+            if self.tell() > 2000:
+                raise IOError('connection reset')
+            return super().read(1000)
+
+    with pytest.raises(IOError):
+        SpooledUpload.from_stream(Broken(DATA), threshold=100, spool_dir=str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_from_bytes_keeps_the_data_in_memory():
+    upload = SpooledUpload.from_bytes(DATA)
+    assert upload.in_memory
+    assert upload.read() == DATA